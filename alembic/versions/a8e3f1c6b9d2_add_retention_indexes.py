@@ -0,0 +1,32 @@
+"""add_retention_indexes
+
+Revision ID: a8e3f1c6b9d2
+Revises: f2a7c9d4e6b1
+Create Date: 2026-10-18 17:20:48.631950
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e3f1c6b9d2'
+down_revision: Union[str, None] = 'f2a7c9d4e6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_user_email_notification_logs_user_sent_at', 'user_email_notification_logs', ['user_id', 'sent_at'], unique=False)
+    op.create_index(op.f('ix_password_resets_expires'), 'password_resets', ['expires'], unique=False)
+    op.create_index(op.f('ix_email_verifications_expires'), 'email_verifications', ['expires'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_email_verifications_expires'), table_name='email_verifications')
+    op.drop_index(op.f('ix_password_resets_expires'), table_name='password_resets')
+    op.drop_index('ix_user_email_notification_logs_user_sent_at', table_name='user_email_notification_logs')
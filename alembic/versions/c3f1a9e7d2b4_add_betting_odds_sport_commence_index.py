@@ -0,0 +1,28 @@
+"""add_betting_odds_sport_commence_index
+
+Revision ID: c3f1a9e7d2b4
+Revises: 8bc7dcdedfde
+Create Date: 2026-10-18 10:12:41.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a9e7d2b4'
+down_revision: Union[str, None] = '8bc7dcdedfde'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_betting_odds_sport_commence', 'betting_odds', ['sport_key', 'commence_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_betting_odds_sport_commence', table_name='betting_odds')
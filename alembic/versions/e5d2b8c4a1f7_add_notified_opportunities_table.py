@@ -0,0 +1,40 @@
+"""add_notified_opportunities_table
+
+Revision ID: e5d2b8c4a1f7
+Revises: c3f1a9e7d2b4
+Create Date: 2026-10-18 13:05:22.518364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5d2b8c4a1f7'
+down_revision: Union[str, None] = 'c3f1a9e7d2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notified_opportunities',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('opportunity_key', sa.String(length=32), nullable=False),
+        sa.Column('notified_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'opportunity_key', name='uq_notified_opportunities_user_key')
+    )
+    op.create_index('ix_notified_opportunities_expires_at', 'notified_opportunities', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notified_opportunities_expires_at', table_name='notified_opportunities')
+    op.drop_table('notified_opportunities')
@@ -9,6 +9,7 @@ from pydantic import BaseModel, validator
 from app.core.database import SessionLocal
 from app.models.user import User
 from app.core.config import SECRET_KEY, ALGORITHM
+from app.services.identity_cache import CurrentPrincipal, get_principal, remember_identity, token_version
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 4  # 4 hours instead of 24 for better security
 
@@ -32,17 +33,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # `iat` doubles as the token version the identity cache is keyed by
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 # Token verification and user extraction
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str):
+    """Return (subject, token version) for a valid token"""
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -50,10 +56,15 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return username, token_version(payload)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    username, version = _decode_token(token)
         
     user = db.query(User).filter(User.username == username).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    remember_identity(username, version, user)
     return user
 
 # Active user check
@@ -62,6 +73,20 @@ def get_current_active_user(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+# Cached principal for routes that only need id/tier (no users query on a cache hit)
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> CurrentPrincipal:
+    username, version = _decode_token(token)
+
+    principal = get_principal(username, version, db)
+    if principal is None:
+        raise _credentials_exception()
+    return principal
+
+def get_current_active_principal(principal: CurrentPrincipal = Depends(get_current_principal)) -> CurrentPrincipal:
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     email: Optional[str] = None
@@ -5,7 +5,8 @@ import logging
 import aiohttp
 import os
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, func
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
@@ -19,14 +20,22 @@ from app.core.config import API_KEY, BASE_API_URL, SGO_API_KEY, SGO_BASE_URL, DE
 from app.services.sgo_service import sgo_service, polling_strategy
 # Import sports config dynamically to avoid caching issues
 # from sports_config import SUPPORTED_SPORTS, get_active_sports, get_priority_sports, get_sports_by_category
-from app.core.database import SessionLocal, BettingOdds
+from app.core.database import SessionLocal, BettingOdds, get_async_db, get_pool_metrics
 # from mock_data import generate_mock_odds  # No longer using mock data
 from .users import router as user_router
-from .auth import get_current_active_user, get_db
+from .auth import get_current_active_user, get_current_active_principal, get_db
 from .my_arbitrage import router as my_arbitrage_router
 from app.models.subscription import UserSubscription
-from app.models.user import User, UserProfile, UserArbitrage
-from scripts.email_verification import send_email  # Reusing existing email function
+from app.services.subscription_tier import get_tier_cache_stats
+from app.services.identity_cache import CurrentPrincipal, get_identity_cache_stats
+from app.models.user import User, UserProfile, UserArbitrage, UserEmailNotificationLog
+from app.services.email_dispatcher import send_email_async
+from app.services.email_outbox import get_outbox_metrics
+from app.services.maintenance import get_maintenance_status
+from app.core.password_hasher import password_hasher
+from app.core.tracing import tracer
+from app.services.email_templates import SIMPLE_ALERT_MULTI, SIMPLE_ALERT_ROW, SIMPLE_ALERT_SINGLE
+from app.services.opportunity_feed import opportunity_feed
 from app.services.market_arbitrage import find_arbitrage_in_market_enhanced, get_comprehensive_market_display_name
 from scripts.match_browser import get_upcoming_matches_summary, get_detailed_match_odds, get_match_browser_stats
 
@@ -37,7 +46,7 @@ router = APIRouter()
 @router.get("/arbitrage/opportunities")
 async def get_public_opportunities(
     sport_key: str = None,
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentPrincipal = Depends(get_current_active_principal)
 ):
     """Get arbitrage opportunities for the authenticated user"""
     try:
@@ -61,7 +70,65 @@ async def get_scheduler_status():
         return {
             "scheduler_running": scheduler.running if hasattr(scheduler, 'running') else False,
             "total_jobs": len(scheduler.get_jobs()) if hasattr(scheduler, 'get_jobs') else 0,
-            "jobs": [{"id": job.id, "next_run": str(job.next_run_time)} for job in scheduler.get_jobs()] if hasattr(scheduler, 'get_jobs') else []
+            "jobs": [{"id": job.id, "next_run": str(job.next_run_time)} for job in scheduler.get_jobs()] if hasattr(scheduler, 'get_jobs') else [],
+            "notification_feed": opportunity_feed.stats()
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+# Database connection pool metrics for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW
+@router.get("/admin/db-pool-status")
+async def get_db_pool_status():
+    """Connection checkout wait metrics and current pool occupancy"""
+    try:
+        return get_pool_metrics()
+    except Exception as e:
+        return {"error": str(e)}
+
+# Email outbox queue depth / age
+@router.get("/admin/email-outbox")
+def get_email_outbox_status(db: Session = Depends(get_db)):
+    """Outbox depth per status, oldest pending age and worker counters"""
+    try:
+        return get_outbox_metrics(db)
+    except Exception as e:
+        return {"error": str(e)}
+
+# Password hashing executor load and latency
+@router.get("/admin/password-hashing")
+async def get_password_hashing_status():
+    """Pending/shed counts, rehashes and hash/verify latency percentiles"""
+    try:
+        return password_hasher.stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+# Request tracing: sampling rate and export counters
+@router.get("/admin/tracing")
+async def get_tracing_status():
+    """Traces started/sampled out, spans exported, dropped and export errors"""
+    try:
+        return tracer.stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+# Retention job results (rows removed and duration per table)
+@router.get("/admin/maintenance-status")
+async def get_maintenance_job_status():
+    """Outcome of the last scheduled retention run"""
+    try:
+        return get_maintenance_status()
+    except Exception as e:
+        return {"error": str(e)}
+
+# In-process cache statistics (hit ratios etc.)
+@router.get("/admin/cache-stats")
+async def get_cache_stats():
+    """Hit/miss statistics for the in-process caches"""
+    try:
+        return {
+            "subscription_tier": get_tier_cache_stats(),
+            "identity": get_identity_cache_stats(),
         }
     except Exception as e:
         return {"error": str(e)}
@@ -246,7 +313,7 @@ async def get_live_odds(
     markets: str = "h2h,spreads,totals",
     regions: str = "us,uk", 
     bookmakers: str = None,
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentPrincipal = Depends(get_current_active_principal)
 ):
     """Get live odds for a specific sport from key bookmakers (optimized API usage)"""
     try:
@@ -528,119 +595,93 @@ async def fetch_sport_odds(session, sport_key: str, sport_info: dict):
 
 # Mock data functions removed - only using real API data
 
+# Window of commence times worth reading back; mirrors the staleness rules in detect_arbitrage_opportunities
+ODDS_DB_LOOKBACK = timedelta(hours=1)
+ODDS_DB_LOOKAHEAD = timedelta(days=30)
+ODDS_DB_BATCH_SIZE = 1000
+
 async def get_odds_from_database(db: Session, sport_key: str = None) -> List[Dict]:
-    """Get odds data from database (stored by background scheduler)"""
+    """Get odds data from database (stored by background scheduler)
+
+    Rows are streamed in match order so each match is assembled as soon as its
+    rows arrive, instead of loading the whole table and regrouping it in Python.
+    """
     try:
-        # DEBUG: Enhanced logging for database debugging
-        logging.info(f"🔍 DATABASE DEBUG: Querying odds from database (sport_key: {sport_key})")
-        
-        # Check total records in database first
-        total_records = db.query(BettingOdds).count()
-        logging.info(f"🔍 DATABASE DEBUG: Total records in betting_odds table: {total_records}")
-        
-        # Query stored odds
-        query = db.query(BettingOdds)
+        now = datetime.utcnow()
+        query = (
+            db.query(
+                BettingOdds.sport_key,
+                BettingOdds.sport_title,
+                BettingOdds.home_team,
+                BettingOdds.away_team,
+                BettingOdds.commence_time,
+                BettingOdds.sportsbook,
+                BettingOdds.outcome,
+                BettingOdds.odds,
+            )
+            .filter(BettingOdds.is_active.isnot(False))
+            .filter(
+                or_(
+                    BettingOdds.commence_time.is_(None),
+                    BettingOdds.commence_time.between(now - ODDS_DB_LOOKBACK, now + ODDS_DB_LOOKAHEAD),
+                )
+            )
+        )
         if sport_key:
             query = query.filter(BettingOdds.sport_key == sport_key)
-        
-        records = query.all()
-        logging.info(f"📊 Retrieved {len(records)} odds records from database")
-        
-        # DEBUG: Log sample records if available
-        if records:
-            sample_record = records[0]
-            logging.info(f"🔍 DATABASE DEBUG: Sample record - Sport: {sample_record.sport_key}, Teams: {sample_record.home_team} vs {sample_record.away_team}, Sportsbook: {sample_record.sportsbook}, Odds: {sample_record.odds}")
-            
-            # Log unique sports available
-            unique_sports = db.query(BettingOdds.sport_key).distinct().all()
-            sport_keys = [sport[0] for sport in unique_sports]
-            logging.info(f"🔍 DATABASE DEBUG: Available sports in database: {sport_keys}")
-            
-            # Log unique sportsbooks available
-            unique_books = db.query(BettingOdds.sportsbook).distinct().all()
-            book_names = [book[0] for book in unique_books]
-            logging.info(f"🔍 DATABASE DEBUG: Available sportsbooks in database: {book_names}")
-        else:
-            logging.warning(f"🔍 DATABASE DEBUG: No records found! Checking if table exists and has data...")
-            
-            # Check if table exists and is accessible (PostgreSQL compatible)
-            try:
-                from app.core.config import DATABASE_URL
-                if "postgresql" in DATABASE_URL:
-                    # PostgreSQL table check
-                    table_info = db.execute(text("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'betting_odds'")).fetchone()
-                else:
-                    # SQLite table check
-                    table_info = db.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name = 'betting_odds'")).fetchone()
-                
-                if table_info:
-                    logging.info("DATABASE DEBUG: betting_odds table exists")
-                else:
-                    logging.error("DATABASE DEBUG: betting_odds table does NOT exist!")
-            except Exception as table_check_error:
-                logging.error(f"DATABASE DEBUG: Error checking table existence: {table_check_error}")
-        
-        logging.info(f"📊 Retrieved {len(records)} odds records from database")
-        
-        if not records:
-            return []
-        
-        # Group records by match to create the same structure as API data
-        matches_dict = {}
-        
-        for record in records:
-            # Create unique match key
+
+        # Let the database do the grouping: ordering by the match key means a
+        # match is complete as soon as the key changes.
+        query = query.order_by(
+            BettingOdds.sport_key,
+            BettingOdds.commence_time,
+            BettingOdds.home_team,
+            BettingOdds.away_team,
+            BettingOdds.sportsbook,
+        ).execution_options(yield_per=ODDS_DB_BATCH_SIZE)
+
+        odds_data = []
+        current_key = None
+        match_data = None
+        bookmakers = None
+        record_count = 0
+
+        for record in query:
+            record_count += 1
             match_key = (record.sport_key, record.home_team, record.away_team, record.commence_time)
-            
-            if match_key not in matches_dict:
-                matches_dict[match_key] = {
+
+            if match_key != current_key:
+                bookmakers = {}
+                match_data = {
                     "sport_key": record.sport_key,
                     "sport_title": record.sport_title,
                     "commence_time": record.commence_time,
                     "home_team": record.home_team,
                     "away_team": record.away_team,
-                    "bookmakers": {}
+                    "bookmakers": [],
                 }
-            
-            match_data = matches_dict[match_key]
-            
-            # Group by bookmaker
-            if record.sportsbook not in match_data["bookmakers"]:
-                match_data["bookmakers"][record.sportsbook] = {
+                odds_data.append(match_data)
+                current_key = match_key
+
+            bookmaker_data = bookmakers.get(record.sportsbook)
+            if bookmaker_data is None:
+                # For now, assume all odds are h2h (head-to-head) market
+                # TODO: Store market type in database for better accuracy
+                bookmaker_data = {
                     "title": record.sportsbook,
-                    "markets": {}
+                    "markets": [{"key": "h2h", "outcomes": []}],
                 }
-            
-            bookmaker_data = match_data["bookmakers"][record.sportsbook]
-            
-            # For now, assume all odds are h2h (head-to-head) market
-            # TODO: Store market type in database for better accuracy
-            market_key = "h2h"
-            if market_key not in bookmaker_data["markets"]:
-                bookmaker_data["markets"][market_key] = {
-                    "key": market_key,
-                    "outcomes": []
-                }
-            
-            # Add outcome
-            bookmaker_data["markets"][market_key]["outcomes"].append({
+                bookmakers[record.sportsbook] = bookmaker_data
+                match_data["bookmakers"].append(bookmaker_data)
+
+            bookmaker_data["markets"][0]["outcomes"].append({
                 "name": record.outcome,
                 "price": record.odds
             })
-        
-        # Convert to list format expected by arbitrage detection
-        odds_data = []
-        for match_data in matches_dict.values():
-            # Convert bookmakers dict to list
-            match_data["bookmakers"] = list(match_data["bookmakers"].values())
-            # Convert markets dict to list for each bookmaker
-            for bookmaker in match_data["bookmakers"]:
-                bookmaker["markets"] = list(bookmaker["markets"].values())
-            odds_data.append(match_data)
-        
-        logging.info(f"📊 Converted to {len(odds_data)} matches for arbitrage detection")
+
+        logging.info(f"📊 Streamed {record_count} odds records into {len(odds_data)} matches (sport_key: {sport_key or 'all'})")
         return odds_data
-        
+
     except Exception as e:
         logging.error(f"Error fetching odds from database: {str(e)}")
         return []
@@ -1048,7 +1089,7 @@ async def get_odds(sport_key: Optional[str] = None):
 @router.get("/arbitrage")
 async def get_arbitrage_opportunities(
     sport_key: Optional[str] = None,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentPrincipal = Depends(get_current_active_principal),
     db: Session = Depends(get_db)
 ):
     """Get arbitrage opportunities from REAL API data ONLY - no mock data"""
@@ -1072,7 +1113,7 @@ async def get_arbitrage_opportunities(
             # Return empty results - no mock data for production
             return {
                 "arbitrage_opportunities": [],
-                "user_tier": _get_user_tier(current_user.id, db),
+                "user_tier": current_user.tier,
                 "total_found": 0,
                 "data_source": "database_no_data",
                 "message": "No current betting odds available from the database"
@@ -1084,7 +1125,7 @@ async def get_arbitrage_opportunities(
         opportunities = await detect_arbitrage_opportunities(odds_data)
         
         # Apply user tier filtering
-        user_tier = _get_user_tier(current_user.id, db)
+        user_tier = current_user.tier
         
         logging.info(f"📊 Returning {len(opportunities)} arbitrage opportunities for {user_tier} user (real API data)")
         
@@ -1129,8 +1170,7 @@ async def get_sgo_arbitrage_opportunities(
     min_profit: float = 1.0,
     live_only: bool = False,
     force_refresh: bool = False,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentPrincipal = Depends(get_current_active_principal)
 ):
     """Get arbitrage opportunities using SportsGameOdds API - Enhanced Version"""
     try:
@@ -1154,9 +1194,7 @@ async def get_sgo_arbitrage_opportunities(
         import time
         start_time_all = time.time()
         
-        user_tier = "basic"
-        if current_user:
-            user_tier = _get_user_tier(current_user.id, db)
+        user_tier = current_user.tier if current_user else "basic"
             
         logging.info(f"⏱️ PERF: User Tier Check took {time.time() - start_time_all:.4f}s")
         
@@ -1170,71 +1208,76 @@ async def get_sgo_arbitrage_opportunities(
             
             fetch_start = time.time()
             # Find arbitrage opportunities based on live_only parameter
-            if live_only:
-                logging.info("🔍 API: Fetching LIVE arbitrage opportunities from SGO")
-                opportunities = await sgo_service.get_live_arbitrage_opportunities()
-                logging.info(f"📊 API: SGO returned {len(opportunities)} LIVE opportunities")
-            else:
-                # Get only upcoming opportunities for arbitrage tab (live opportunities are for Odds tab only)
-                logging.info("🔍 API: Fetching UPCOMING arbitrage opportunities from SGO (Arbitrage tab)")
-                opportunities = await sgo_service.get_upcoming_arbitrage_opportunities(force_refresh=force_refresh)
-                logging.info(f"📊 API: SGO returned {len(opportunities)} UPCOMING opportunities")
+            with tracer.span("sgo.opportunities", live_only=live_only, force_refresh=force_refresh) as fetch_span:
+                if live_only:
+                    logging.info("🔍 API: Fetching LIVE arbitrage opportunities from SGO")
+                    opportunities = await sgo_service.get_live_arbitrage_opportunities()
+                    logging.info(f"📊 API: SGO returned {len(opportunities)} LIVE opportunities")
+                else:
+                    # Get only upcoming opportunities for arbitrage tab (live opportunities are for Odds tab only)
+                    logging.info("🔍 API: Fetching UPCOMING arbitrage opportunities from SGO (Arbitrage tab)")
+                    opportunities = await sgo_service.get_upcoming_arbitrage_opportunities(force_refresh=force_refresh)
+                    logging.info(f"📊 API: SGO returned {len(opportunities)} UPCOMING opportunities")
+                fetch_span.set_attribute("opportunities", len(opportunities))
             
             logging.info(f"⏱️ PERF: Data Fetch took {time.time() - fetch_start:.4f}s")
             
-            # Enhanced deduplication to handle duplicate teams/bets
-            seen_opportunities = set()
-            unique_opportunities = []
-            removed_count = 0
+            with tracer.span("arbitrage.filter", candidates=len(opportunities)) as filter_span:
+                # Enhanced deduplication to handle duplicate teams/bets
+                seen_opportunities = set()
+                unique_opportunities = []
+                removed_count = 0
             
-            for opp in opportunities:
-                # Create a more specific ID for better deduplication
-                opp_id = opp.get("id", "")
-                if not opp_id:
-                    # Enhanced fallback ID that includes more details
-                    opp_id = f"{opp.get('sport', 'unknown')}_{opp.get('home_team', 'home')}_{opp.get('away_team', 'away')}_{opp.get('market_type', 'unknown')}_{opp.get('line', '')}_{opp.get('bet_type', '')}"
+                for opp in opportunities:
+                    # Create a more specific ID for better deduplication
+                    opp_id = opp.get("id", "")
+                    if not opp_id:
+                        # Enhanced fallback ID that includes more details
+                        opp_id = f"{opp.get('sport', 'unknown')}_{opp.get('home_team', 'home')}_{opp.get('away_team', 'away')}_{opp.get('market_type', 'unknown')}_{opp.get('line', '')}_{opp.get('bet_type', '')}"
                 
-                if opp_id not in seen_opportunities:
-                    seen_opportunities.add(opp_id)
-                    unique_opportunities.append(opp)
-                else:
-                    removed_count += 1
-                    logging.info(f"🔍 Deduplication: Removed duplicate opportunity: {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')} - {opp.get('profit_percentage', 0):.2f}%")
+                    if opp_id not in seen_opportunities:
+                        seen_opportunities.add(opp_id)
+                        unique_opportunities.append(opp)
+                    else:
+                        removed_count += 1
+                        logging.info(f"🔍 Deduplication: Removed duplicate opportunity: {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')} - {opp.get('profit_percentage', 0):.2f}%")
             
-            logging.info(f"🔍 Deduplication: Removed {removed_count} duplicates, {len(unique_opportunities)} unique opportunities remain")
+                logging.info(f"🔍 Deduplication: Removed {removed_count} duplicates, {len(unique_opportunities)} unique opportunities remain")
             
-            # Data freshness validation - filter out stale opportunities
-            fresh_opportunities = []
-            stale_count = 0
+                # Data freshness validation - filter out stale opportunities
+                fresh_opportunities = []
+                stale_count = 0
             
-            for opp in unique_opportunities:
-                # Check if opportunity has a valid start time (SGO uses 'start_time', legacy uses 'commence_time')
-                start_time = opp.get('start_time', '') or opp.get('commence_time', '')
-                if start_time:
-                    try:
-                        # Parse the start time and check if it's in the future
-                        start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                        now = datetime.now(timezone.utc)
+                for opp in unique_opportunities:
+                    # Check if opportunity has a valid start time (SGO uses 'start_time', legacy uses 'commence_time')
+                    start_time = opp.get('start_time', '') or opp.get('commence_time', '')
+                    if start_time:
+                        try:
+                            # Parse the start time and check if it's in the future
+                            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                            now = datetime.now(timezone.utc)
                         
-                        # Only include opportunities that start within the next 7 days and haven't started yet
-                        time_until_start = (start_dt - now).total_seconds()
-                        if time_until_start > -1800 and time_until_start < (7 * 24 * 3600):  # From 30 min ago to 7 days from now
+                            # Only include opportunities that start within the next 7 days and haven't started yet
+                            time_until_start = (start_dt - now).total_seconds()
+                            if time_until_start > -1800 and time_until_start < (7 * 24 * 3600):  # From 30 min ago to 7 days from now
+                                fresh_opportunities.append(opp)
+                            else:
+                                stale_count += 1
+                                hours_diff = time_until_start / 3600
+                                logging.info(f"Data Freshness: Removed stale opportunity: {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')} - Start: {start_time} ({hours_diff:.1f}h from now)")
+                        except Exception as e:
+                            # If we can't parse the time, include it but log the issue
                             fresh_opportunities.append(opp)
-                        else:
-                            stale_count += 1
-                            hours_diff = time_until_start / 3600
-                            logging.info(f"Data Freshness: Removed stale opportunity: {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')} - Start: {start_time} ({hours_diff:.1f}h from now)")
-                    except Exception as e:
-                        # If we can't parse the time, include it but log the issue
+                            logging.warning(f"🔍 Data Freshness: Could not parse start time for {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')}: {e}")
+                    else:
+                        # If no start time, include it but log the issue
                         fresh_opportunities.append(opp)
-                        logging.warning(f"🔍 Data Freshness: Could not parse start time for {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')}: {e}")
-                else:
-                    # If no start time, include it but log the issue
-                    fresh_opportunities.append(opp)
-                    logging.warning(f"🔍 Data Freshness: No start time for {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')}")
+                        logging.warning(f"🔍 Data Freshness: No start time for {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')}")
             
-            opportunities = fresh_opportunities
-            logging.info(f"🔍 Data Freshness: Removed {stale_count} stale opportunities, {len(opportunities)} fresh opportunities remain")
+                opportunities = fresh_opportunities
+                logging.info(f"🔍 Data Freshness: Removed {stale_count} stale opportunities, {len(opportunities)} fresh opportunities remain")
+                filter_span.set_attribute("duplicates", removed_count)
+                filter_span.set_attribute("stale", stale_count)
             
             # DEBUG: Log start time availability for first few opportunities
             for i, opp in enumerate(opportunities[:3]):
@@ -1251,37 +1294,38 @@ async def get_sgo_arbitrage_opportunities(
                     logging.info(f"   - {opp.get('home_team', 'Unknown')} vs {opp.get('away_team', 'Unknown')} - {opp.get('profit_percentage', 0):.2f}% profit")
             
             # Convert to frontend format
-            formatted_opportunities = []
-            for opp in opportunities:
-                            formatted_opp = {
-                                "id": opp.get("id", f"sgo_{opp.get('sport', 'unknown')}_{opp.get('home_team', 'home')}_{opp.get('away_team', 'away')}"),
-                                "sport": opp.get("sport", "Unknown"),
-                                "league": opp.get("league", "Unknown"),
-                                "home_team": opp.get("home_team", "Home Team"),
-                                "away_team": opp.get("away_team", "Away Team"),
-                                "start_time": opp.get("start_time", ""),
-                                "market_type": opp.get("market_type", "moneyline"),
-                                "market_description": opp.get("market_description", ""),  # Add missing field!
-                                "detailed_market_description": opp.get("detailed_market_description", ""),
-                                "profit_percentage": opp.get("profit_percentage", 0),
-                                "profit": opp.get("profit", 0),
-                                "total_stake": opp.get("total_stake", 0),
-                                "confidence_score": opp.get("confidence_score", 0.5),
-                                "best_odds": opp.get("best_odds", {}),
-                                "bookmakers_involved": opp.get("bookmakers_involved", []),
-                                "implied_probability": opp.get("implied_probability", 0),
-                                "game_type": opp.get("game_type", "UPCOMING"),  # Add game_type field
-                            }
+            with tracer.span("response.format", opportunities=len(opportunities)):
+                formatted_opportunities = []
+                for opp in opportunities:
+                                formatted_opp = {
+                                    "id": opp.get("id", f"sgo_{opp.get('sport', 'unknown')}_{opp.get('home_team', 'home')}_{opp.get('away_team', 'away')}"),
+                                    "sport": opp.get("sport", "Unknown"),
+                                    "league": opp.get("league", "Unknown"),
+                                    "home_team": opp.get("home_team", "Home Team"),
+                                    "away_team": opp.get("away_team", "Away Team"),
+                                    "start_time": opp.get("start_time", ""),
+                                    "market_type": opp.get("market_type", "moneyline"),
+                                    "market_description": opp.get("market_description", ""),  # Add missing field!
+                                    "detailed_market_description": opp.get("detailed_market_description", ""),
+                                    "profit_percentage": opp.get("profit_percentage", 0),
+                                    "profit": opp.get("profit", 0),
+                                    "total_stake": opp.get("total_stake", 0),
+                                    "confidence_score": opp.get("confidence_score", 0.5),
+                                    "best_odds": opp.get("best_odds", {}),
+                                    "bookmakers_involved": opp.get("bookmakers_involved", []),
+                                    "implied_probability": opp.get("implied_probability", 0),
+                                    "game_type": opp.get("game_type", "UPCOMING"),  # Add game_type field
+                                }
                             
-                            # Debug logging for market descriptions
-                            if opp.get("market_description"):
-                                logging.info(f"🎯 API: Sending market description '{opp.get('market_description')}' for {opp.get('home_team')} vs {opp.get('away_team')}")
-                            elif opp.get("detailed_market_description"):
-                                logging.info(f"🎯 API: Sending detailed description '{opp.get('detailed_market_description')}' for {opp.get('home_team')} vs {opp.get('away_team')}")
-                            else:
-                                logging.warning(f"⚠️ API: No market description for {opp.get('home_team')} vs {opp.get('away_team')} - market_type: {opp.get('market_type')}")
+                                # Debug logging for market descriptions
+                                if opp.get("market_description"):
+                                    logging.info(f"🎯 API: Sending market description '{opp.get('market_description')}' for {opp.get('home_team')} vs {opp.get('away_team')}")
+                                elif opp.get("detailed_market_description"):
+                                    logging.info(f"🎯 API: Sending detailed description '{opp.get('detailed_market_description')}' for {opp.get('home_team')} vs {opp.get('away_team')}")
+                                else:
+                                    logging.warning(f"⚠️ API: No market description for {opp.get('home_team')} vs {opp.get('away_team')} - market_type: {opp.get('market_type')}")
                             
-                            formatted_opportunities.append(formatted_opp)
+                                formatted_opportunities.append(formatted_opp)
         
         # Apply user tier filtering
         if user_tier == "basic" and len(formatted_opportunities) > 5:
@@ -1318,7 +1362,7 @@ async def get_sgo_arbitrage_opportunities(
         
         return {
             "arbitrage_opportunities": [],
-            "user_tier": _get_user_tier(current_user.id, db),
+            "user_tier": current_user.tier,
             "total_found": 0,
             "data_source": "sgo_error",
             "message": f"SGO API Error: {str(e)}",
@@ -1326,26 +1370,6 @@ async def get_sgo_arbitrage_opportunities(
         }
 
 # ---- Premium/Basic gating for live odds ----
-def _get_user_tier(user_id: int, db: Session) -> str:
-    """Return 'premium' for active/trial premium plans; otherwise 'basic'."""
-    try:
-        sub = (
-            db.query(UserSubscription)
-            .filter(
-                UserSubscription.user_id == user_id,
-                UserSubscription.status.in_(["active", "trialing"]),
-            )
-            .first()
-        )
-        if not sub:
-            return "basic"
-        plan_name = (getattr(getattr(sub, "plan", None), "name", "") or "").lower()
-        if sub.status == "trialing" or "premium" in plan_name:
-            return "premium"
-        return "basic"
-    except Exception:
-        return "basic"
-
 def _filter_live_events(odds_data: List[Dict[str, Any]], include_live: bool) -> List[Dict[str, Any]]:
     if include_live:
         return odds_data
@@ -1370,8 +1394,7 @@ def _filter_live_events(odds_data: List[Dict[str, Any]], include_live: bool) ->
 async def get_odds_gated(
     sport_key: Optional[str] = None,
     include_live: Optional[bool] = True,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentPrincipal = Depends(get_current_active_principal),
 ):
     """Return odds with server-side enforcement of live access based on subscription.
 
@@ -1380,7 +1403,7 @@ async def get_odds_gated(
     """
     try:
         # Determine user tier
-        user_tier = _get_user_tier(current_user.id, db)
+        user_tier = current_user.tier
         allow_live = include_live if user_tier == "premium" else False
 
         # Fetch odds from real API only
@@ -1793,7 +1816,7 @@ async def get_matches_browser(sport_key: Optional[str] = None):
 @router.get("/matches/{match_id}/odds", tags=["Matches"])
 async def get_match_detailed_odds(
     match_id: str,
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentPrincipal = Depends(get_current_active_principal)
 ):
     """Get detailed odds for a specific match (on-demand loading)"""
     try:
@@ -1943,29 +1966,28 @@ async def debug_odds(db: Session = Depends(get_db)):
 #==================== NOTIFICATION SYSTEM ENDPOINTS ====================
 
 @router.post("/test-email-notification", tags=["Notifications"])
-async def send_test_email_notification(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def send_test_email_notification(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
     """Send a test email notification to the current user"""
     try:
-        from arbitrage_notifications import notification_service
-        from user_models import UserProfile
+        from scripts.arbitrage_notifications import notification_service
         
         # Get user profile  
-        profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+        profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id).limit(1))
         if not profile or not profile.notification_email:
             raise HTTPException(status_code=400, detail="Email notifications are not enabled in your profile")
         
         # Check if user already sent a test email today (rate limiting)
-        today = date.today()
-        from user_models import UserEmailNotificationLog
-        
-        # Check for existing test email today
-        test_log = db.query(UserEmailNotificationLog).filter(
-            UserEmailNotificationLog.user_id == current_user.id,
-            UserEmailNotificationLog.email_date == today
-        ).first()
+        today_start = datetime.combine(date.today(), datetime.min.time())
+        test_count = await db.scalar(
+            select(func.count(UserEmailNotificationLog.id)).where(
+                UserEmailNotificationLog.user_id == current_user.id,
+                UserEmailNotificationLog.email_type == 'test_alert',
+                UserEmailNotificationLog.sent_at >= today_start
+            )
+        )
         
         # Rate limit: Only 1 test email per day
-        if test_log and test_log.email_count >= 1:
+        if test_count and test_count >= 1:
             raise HTTPException(
                 status_code=429, 
                 detail="Test email limit reached. You can only send 1 test email per day to prevent abuse of the email service."
@@ -1996,8 +2018,15 @@ async def send_test_email_notification(current_user: User = Depends(get_current_
         )
         
         if success:
-            # Track the test email (but don't count it against daily limits)
-            notification_service.increment_daily_email_count(current_user.id, db)
+            # Track the test email (logged as 'test_alert' so it doesn't count against daily limits)
+            db.add(UserEmailNotificationLog(
+                user_id=current_user.id,
+                email_type='test_alert',
+                sent_at=datetime.utcnow(),
+                status='sent',
+                details='Test notification'
+            ))
+            await db.commit()
             
             return {"success": True, "message": "Test email sent successfully!"}
         else:
@@ -2016,68 +2045,38 @@ async def send_test_email_notification(current_user: User = Depends(get_current_
 async def send_arbitrage_notification_email(email: str, opportunities: List[Dict]):
     """Send an email notification about arbitrage opportunities"""
     
-    # Create email content
+    # Create email content from the precompiled templates
     if len(opportunities) == 1:
         opp = opportunities[0]
         subject = f"New Arbitrage Opportunity: {opp['profit_percentage']:.2f}% Profit"
-        
-        # Simple message for a single opportunity
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
-            <h1 style="color: #d4af37;">New Arbitrage Opportunity!</h1>
-            <p>We've found a new arbitrage opportunity with <strong>{opp['profit_percentage']:.2f}%</strong> profit.</p>
-            
-            <div style="background-color: #f8f9fa; border-radius: 5px; padding: 15px; margin: 20px 0;">
-                <h3 style="margin-top: 0;">{opp['match']['home_team']} vs {opp['match']['away_team']}</h3>
-                <p><strong>Sport:</strong> {opp['sport_title']}</p>
-                <p><strong>Start Time:</strong> {opp['match']['commence_time']}</p>
-                <p><strong>Profit:</strong> {opp['profit_percentage']:.2f}%</p>
-            </div>
-            
-            <p>We've found a new arbitrage opportunity that matches your preferences!</p>
-            <p><a href="http://localhost:8000/arbitrage" style="background-color: #d4af37; color: #fff; padding: 10px 15px; border-radius: 5px; text-decoration: none;">View Opportunity</a></p>
-            
-            <hr style="margin: 20px 0; border: none; border-top: 1px solid #eee;">
-            <p style="color: #777; font-size: 12px;">© 2025 Arbify - Arbitrage Betting Platform</p>
-        </div>
-        """
+        html_content = SIMPLE_ALERT_SINGLE.render(
+            profit=f"{opp['profit_percentage']:.2f}",
+            home_team=opp['match']['home_team'],
+            away_team=opp['match']['away_team'],
+            sport_title=opp['sport_title'],
+            commence_time=opp['match']['commence_time'],
+        )
     else:
         # Summary message for multiple opportunities
         subject = f"{len(opportunities)} New Arbitrage Opportunities"
         
-        opportunities_html = ""
-        for opp in opportunities[:5]:  # Limit to first 5
-            opportunities_html += f"""
-            <div style="margin-bottom: 15px; padding: 10px; border-left: 3px solid #d4af37; background-color: #f8f9fa;">
-                <p style="margin: 0;"><strong>{opp['match']['home_team']} vs {opp['match']['away_team']}</strong></p>
-                <p style="margin: 5px 0;"><strong>Profit:</strong> {opp['profit_percentage']:.2f}%</p>
-                <p style="margin: 0;"><strong>Sport:</strong> {opp['sport_title']}</p>
-            </div>
-            """
-        
+        opportunities_html = "".join(
+            SIMPLE_ALERT_ROW.render(
+                home_team=opp['match']['home_team'],
+                away_team=opp['match']['away_team'],
+                profit=f"{opp['profit_percentage']:.2f}",
+                sport_title=opp['sport_title'],
+            )
+            for opp in opportunities[:5]  # Limit to first 5
+        )
         if len(opportunities) > 5:
             opportunities_html += f"<p>Plus {len(opportunities) - 5} more opportunities...</p>"
         
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
-            <h1 style="color: #d4af37;">New Arbitrage Opportunities!</h1>
-            <p>We've found {len(opportunities)} new arbitrage opportunities for you.</p>
-            
-            <div style="margin: 20px 0;">
-                {opportunities_html}
-            </div>
-            
-            <p>We've found multiple new arbitrage opportunities that match your preferences!</p>
-            <p><a href="http://localhost:8000/#arbitrage" style="background-color: #d4af37; color: #fff; padding: 10px 15px; border-radius: 5px; text-decoration: none;">View All Opportunities</a></p>
-            
-            <hr style="margin: 20px 0; border: none; border-top: 1px solid #eee;">
-            <p style="color: #777; font-size: 12px;">© 2025 Arbify - Arbitrage Betting Platform</p>
-        </div>
-        """
+        html_content = SIMPLE_ALERT_MULTI.render(count=len(opportunities), opportunities_html=opportunities_html)
     
     # Send the email
     try:
-        return send_email(
+        return await send_email_async(
             to_email=email,
             subject=subject,
             html_content=html_content
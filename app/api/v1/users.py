@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -14,6 +15,7 @@ from app.models.user import User, UserProfile
 from app.api.v1.auth import get_db, get_current_active_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.core.config import DEV_MODE
 from app.core.security_logger import SecurityLogger
+from app.core.password_hasher import PasswordHashingBusy, password_hasher
 from scripts.password_reset import router as password_reset_router
 
 # Configure logging
@@ -103,29 +105,32 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
-def create_user(db: Session, user_data: UserCreate):
+def create_user(db: Session, user_data: UserCreate, hashed_password: Optional[str] = None):
     user = User(
         username=user_data.username,
         email=user_data.email,
         full_name=user_data.full_name,
         is_verified=False  # Default to not verified
     )
-    user.password = user_data.password
+    if hashed_password:
+        user.hashed_password = hashed_password
+    else:
+        user.password = user_data.password
     
     db.add(user)
     db.commit()
     db.refresh(user)
     return user
 
-# Authentication routes
-@router.post("/register", response_model=UserResponse)
-@limiter.limit("10/minute")  # 10 registration attempts per minute per IP
-def register_user(
-    request: Request,
-    user_data: UserCreate, 
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
+def hashing_unavailable(busy: PasswordHashingBusy) -> HTTPException:
+    """503 while the password hashing executor is saturated"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, please retry shortly",
+        headers={"Retry-After": str(busy.retry_after)},
+    )
+
+def check_registration_available(db: Session, user_data: UserCreate):
     # Check if username exists
     db_user = get_user_by_username(db, user_data.username)
     if db_user:
@@ -141,9 +146,10 @@ def register_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
+
+def register_new_user(db: Session, user_data: UserCreate, hashed_password: str) -> User:
     # Create user - automatically verified (no email verification needed)
-    user = create_user(db, user_data)
+    user = create_user(db, user_data, hashed_password)
     user.is_verified = True  # Auto-verify all new users
     db.commit()
     
@@ -157,7 +163,31 @@ def register_user(
         minimum_profit_threshold=1.0  # Default 1% minimum profit threshold
     )
     db.add(profile)
+    
+    # Welcome email goes through the outbox, committed together with the profile
+    from app.services.email_service import email_service
+    from app.services.email_outbox import enqueue_email
+    subject, html_content = email_service.render_welcome_email(user.username)
+    enqueue_email(db, user.email, subject, html_content, "welcome", user_id=user.id)
     db.commit()
+    db.refresh(user)
+    return user
+
+# Authentication routes
+# Both run bcrypt on the dedicated hashing executor; the DB work stays on the threadpool
+@router.post("/register", response_model=UserResponse)
+@limiter.limit("10/minute")  # 10 registration attempts per minute per IP
+async def register_user(
+    request: Request,
+    user_data: UserCreate, 
+    db: Session = Depends(get_db)
+):
+    await run_in_threadpool(check_registration_available, db, user_data)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHashingBusy as busy:
+        raise hashing_unavailable(busy)
+    user = await run_in_threadpool(register_new_user, db, user_data, hashed_password)
     
     # Log user registration for security monitoring
     client_ip = SecurityLogger.get_client_ip(request)
@@ -167,10 +197,6 @@ def register_user(
         ip_address=client_ip
     )
     
-    # Send welcome email in background
-    from app.services.email_service import email_service
-    background_tasks.add_task(email_service.send_welcome_email, user.email, user.username)
-    
     if DEV_MODE:
         print(f"📧 WELCOME EMAIL: Queued for {user.email} (username: {user.username})")
     
@@ -178,7 +204,7 @@ def register_user(
 
 @router.post("/token", response_model=Token)
 @limiter.limit("20/minute")  # 20 login attempts per minute per IP
-def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # Security: Only log non-sensitive info in production
     if not DEV_MODE:
         logger.info(f"Login attempt for user: {form_data.username}")
@@ -186,7 +212,7 @@ def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestFor
     client_ip = SecurityLogger.get_client_ip(request)
     user_agent = request.headers.get('user-agent', 'Unknown')
     
-    user = get_user_by_username(db, form_data.username)
+    user = await run_in_threadpool(get_user_by_username, db, form_data.username)
     if not user:
         # Log failed login attempt
         SecurityLogger.log_login_attempt(
@@ -202,7 +228,12 @@ def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestFor
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not user.verify_password(form_data.password):
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    except PasswordHashingBusy as busy:
+        raise hashing_unavailable(busy)
+    
+    if not valid:
         # Log failed login attempt
         SecurityLogger.log_login_attempt(
             username=user.username,
@@ -217,27 +248,33 @@ def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestFor
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    response = {
+        "token_type": "bearer",
+        "user_id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "full_name": user.full_name
+    }
+    
+    # Stored hash is legacy or uses an old cost - replace it now that we know the password
+    if new_hash:
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
+    
     # Log successful login
     SecurityLogger.log_login_attempt(
-        username=user.username,
+        username=response["username"],
         success=True,
         ip_address=client_ip,
         user_agent=user_agent
     )
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+    response["access_token"] = create_access_token(
+        data={"sub": response["username"]}, expires_delta=access_token_expires
     )
     
-    return {
-        "access_token": access_token, 
-        "token_type": "bearer",
-        "user_id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "full_name": user.full_name
-    }
+    return response
 
 @router.get("/users/me", response_model=UserResponse)
 def read_users_me(current_user: User = Depends(get_current_active_user)):
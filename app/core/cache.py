@@ -0,0 +1,179 @@
+# cache.py
+"""
+In-process TTL/LRU cache with an optional shared (Redis) second level.
+
+The in-process layer answers most lookups without leaving the worker. When
+REDIS_URL is configured, entries are also written to Redis so other workers
+can reuse them, and invalidations delete the shared copy; local entries then
+use a shorter TTL so a change made by another worker is picked up quickly.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from app.core.config import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+_shared_client = None
+_shared_client_checked = False
+_shared_client_lock = threading.Lock()
+
+def get_shared_cache():
+    """Return a Redis client when REDIS_URL is configured, otherwise None"""
+    global _shared_client, _shared_client_checked
+    if _shared_client_checked:
+        return _shared_client
+    with _shared_client_lock:
+        if not _shared_client_checked:
+            if REDIS_URL:
+                try:
+                    import redis
+                    _shared_client = redis.Redis.from_url(
+                        REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5, decode_responses=True
+                    )
+                    logger.info("✅ Shared cache enabled (Redis)")
+                except Exception as e:
+                    logger.warning(f"⚠️ Shared cache unavailable, using in-process caches only: {e}")
+                    _shared_client = None
+            _shared_client_checked = True
+    return _shared_client
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 300,
+        namespace: Optional[str] = None,
+        shared_local_ttl: float = 15,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.namespace = namespace
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Only namespaced caches with JSON-serialisable values use the shared level
+        self._shared = get_shared_cache() if namespace else None
+        self._local_ttl = min(ttl, shared_local_ttl) if self._shared is not None else ttl
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"arbify:{self.namespace}:{key}"
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+        if self._shared is not None:
+            try:
+                raw = self._shared.get(self._shared_key(key))
+            except Exception:
+                raw = None
+                self.shared_errors += 1
+            if raw is not None:
+                value = json.loads(raw)
+                self._set_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def _set_local(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, self._clock() + self._local_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key: Hashable, value: Any):
+        self._set_local(key, value)
+        if self._shared is not None:
+            try:
+                self._shared.setex(self._shared_key(key), int(self.ttl), json.dumps(value))
+            except Exception:
+                self.shared_errors += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value, calling `loader` (and caching its result) on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+            self.invalidations += 1
+        if self._shared is not None:
+            try:
+                self._shared.delete(self._shared_key(key))
+            except Exception:
+                self.shared_errors += 1
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every string key starting with `prefix`; returns the local count removed"""
+        with self._lock:
+            keys = [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            self.invalidations += 1
+        if self._shared is not None:
+            try:
+                stale = list(self._shared.scan_iter(match=f"{self._shared_key(prefix)}*", count=100))
+                if stale:
+                    self._shared.delete(*stale)
+            except Exception:
+                self.shared_errors += 1
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "shared_backend": self._shared is not None,
+                "shared_errors": self.shared_errors,
+            }
@@ -10,6 +10,14 @@ load_dotenv()
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL") or os.getenv("DATABASE_PRIVATE_URL") or "sqlite:///./arbitrage.db"
 
+# Connection pool tuning (see app/core/database.py and /api/admin/db-pool-status)
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))          # seconds to wait for a free connection
+DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))        # seconds before a connection is replaced
+DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 60000))
+DB_SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", 5000))
+
 # Railway deployment detection - look for Railway environment variables
 IS_RAILWAY_DEPLOYMENT = bool(
     os.getenv("RAILWAY_ENVIRONMENT") or 
@@ -53,9 +61,17 @@ SGO_RATE_LIMIT: int = 290       # Requests per minute (SGO Limit is 300, keep bu
 
 STALE_DATA_THRESHOLD_MINUTES: int = 15  # Reject odds older than 15 minutes
 
+# Optional shared cache (Redis) used across workers; in-process caches are used when unset
+REDIS_URL = os.getenv("REDIS_URL")
+
 # Email Configuration (Resend)
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
 FROM_EMAIL = os.getenv("EMAIL_FROM", "notifications@arbify.net")
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com")  # point at a local stand-in for tests
+EMAIL_RATE_LIMIT_PER_SECOND: float = float(os.getenv("EMAIL_RATE_LIMIT_PER_SECOND", 2))  # Resend default team limit
+EMAIL_MAX_CONCURRENCY: int = int(os.getenv("EMAIL_MAX_CONCURRENCY", 4))
+EMAIL_BATCH_SIZE: int = int(os.getenv("EMAIL_BATCH_SIZE", 100))  # Resend batch endpoint accepts up to 100
+EMAIL_MAX_RETRIES: int = int(os.getenv("EMAIL_MAX_RETRIES", 3))
 
 # Sentry Configuration
 SENTRY_DSN = os.getenv("SENTRY_DSN", "https://80ffc795adf5f0ed33917683608635ca@o4509956621139968.ingest.us.sentry.io/4509956632477696")
@@ -1,10 +1,22 @@
 # db.py
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+import bisect
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from datetime import datetime
-from .config import DATABASE_URL
+from .config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_STATEMENT_TIMEOUT_MS, DB_SQLITE_BUSY_TIMEOUT_MS
+)
 
 Base = declarative_base()
 
@@ -24,9 +36,163 @@ class BettingOdds(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
 
-engine = create_engine(DATABASE_URL)
+    __table_args__ = (
+        # Serves the sport/time-window reads in get_odds_from_database
+        Index("ix_betting_odds_sport_commence", "sport_key", "commence_time"),
+    )
+
+def to_async_database_url(database_url: str) -> str:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)"""
+    if database_url.startswith("postgresql+asyncpg://") or database_url.startswith("sqlite+aiosqlite://"):
+        return database_url
+    if database_url.startswith("postgresql://"):
+        return database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if database_url.startswith("postgresql+psycopg2://"):
+        return database_url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    if database_url.startswith("sqlite://"):
+        return database_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return database_url
+
+class PoolMetrics:
+    """Connection checkout wait statistics, so the pool can be sized from real data"""
+
+    # Upper bounds (seconds) of the wait-time histogram buckets
+    BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.histogram = [0] * (len(self.BUCKETS) + 1)
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.histogram[bisect.bisect_left(self.BUCKETS, wait)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            labels = [f"<={b}s" for b in self.BUCKETS] + [f">{self.BUCKETS[-1]}s"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "wait_histogram": dict(zip(labels, self.histogram)),
+            }
+
+class _MeteredCheckout:
+    """Pool mixin that records how long callers wait for a connection"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+class MeteredQueuePool(_MeteredCheckout, QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    metrics = PoolMetrics()
+
+class MeteredAsyncQueuePool(_MeteredCheckout, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long callers wait for a connection"""
+
+    metrics = PoolMetrics()
+
+def _engine_options(database_url: str, is_async: bool) -> Dict[str, Any]:
+    """Pool and driver options shared by the sync and async engines"""
+    if database_url.startswith("sqlite"):
+        if is_async:
+            # SQLite connections are cheap to open, and aiosqlite's worker threads must not
+            # outlive the event loop that created them, so they aren't pooled.
+            return {"poolclass": NullPool}
+        return {
+            "poolclass": MeteredQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "connect_args": {"check_same_thread": False},
+        }
+
+    if is_async:
+        connect_args = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS), "application_name": "arbify"}}
+    else:
+        connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}", "application_name": "arbify"}
+
+    return {
+        "poolclass": MeteredAsyncQueuePool if is_async else MeteredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "connect_args": connect_args,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets API reads proceed while the background odds writer holds a write lock"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def create_database_engine(database_url: str = DATABASE_URL, **overrides) -> Engine:
+    """Create a sync engine with the app's pool settings (overrides win)"""
+    engine = create_engine(database_url, **{**_engine_options(database_url, is_async=False), **overrides})
+    if database_url.startswith("sqlite"):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def create_async_database_engine(database_url: str = DATABASE_URL, **overrides) -> AsyncEngine:
+    """Create an async engine (asyncpg / aiosqlite) with the app's pool settings"""
+    async_url = to_async_database_url(database_url)
+    engine = create_async_engine(async_url, **{**_engine_options(database_url, is_async=True), **overrides})
+    if database_url.startswith("sqlite"):
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Checkout-wait metrics and current occupancy for both engines"""
+    return {
+        "sync": {**MeteredQueuePool.metrics.snapshot(), "status": engine.pool.status()},
+        "async": {**MeteredAsyncQueuePool.metrics.snapshot(), "status": async_engine.sync_engine.pool.status()},
+        "config": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "statement_timeout_ms": DB_STATEMENT_TIMEOUT_MS,
+        },
+    }
+
+engine = create_database_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for async endpoints and background tasks, so queries made from
+# `async def` code don't block the event loop. Shares the same database as `engine`.
+async_engine = create_async_database_engine()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -35,4 +201,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
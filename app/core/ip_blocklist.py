@@ -0,0 +1,267 @@
+# ip_blocklist.py
+"""
+Shared IP blocklist: single addresses, CIDR ranges and temporary blocks.
+
+SecurityMiddleware and SecurityMonitor both block and check IPs through the
+one `ip_blocklist` instance.
+
+- Single addresses (/32, /128) live in a dict keyed by the packed address -
+  one hash lookup.
+- Ranges live in a binary prefix trie per address family, so a lookup walks
+  at most 32 (IPv4) or 128 (IPv6) nodes however many ranges are loaded;
+  thousands of threat-feed ranges do not make requests slower.
+- Temporary blocks go into one expiry heap that is drained as checks happen
+  (and by expire()), instead of one sleeping task per block.
+
+IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) are matched as IPv4. Identifiers
+that are not IP addresses are kept as exact strings.
+"""
+
+import heapq
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Optional threat feed loaded at startup: one IP or CIDR per line, '#' comments
+SECURITY_BLOCKLIST_FILE = os.getenv("SECURITY_BLOCKLIST_FILE")
+
+_V4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+@dataclass
+class BlockEntry:
+    target: str
+    reason: str
+    source: str
+    created_at: float
+    expires_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Union[str, float, None]]:
+        return {
+            "target": self.target,
+            "reason": self.reason,
+            "source": self.source,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
+
+def _pack(ip: str) -> Optional[bytes]:
+    """Packed address bytes (4 or 16), IPv4-mapped IPv6 folded to IPv4; None if not an IP"""
+    try:
+        return socket.inet_pton(socket.AF_INET, ip)
+    except (OSError, TypeError):
+        pass
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, ip)
+    except (OSError, TypeError):
+        return None
+    return packed[12:] if packed[:12] == _V4_MAPPED_PREFIX else packed
+
+
+class _PrefixTrie:
+    """Binary trie over address bits; nodes are [zero_child, one_child, entry]"""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root: list = [None, None, None]
+        self.size = 0
+
+    def insert(self, address: int, prefix_len: int, entry: BlockEntry):
+        node = self.root
+        for shift in range(self.bits - 1, self.bits - 1 - prefix_len, -1):
+            bit = (address >> shift) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None, None]
+            node = child
+        if node[2] is None:
+            self.size += 1
+        node[2] = entry
+
+    def remove(self, address: int, prefix_len: int) -> bool:
+        node = self.root
+        for shift in range(self.bits - 1, self.bits - 1 - prefix_len, -1):
+            node = node[(address >> shift) & 1]
+            if node is None:
+                return False
+        if node[2] is None:
+            return False
+        node[2] = None
+        self.size -= 1
+        return True
+
+    def match(self, address: int) -> Optional[BlockEntry]:
+        """Longest covering range, walking at most `bits` nodes"""
+        node = self.root
+        found = node[2]
+        for shift in range(self.bits - 1, -1, -1):
+            node = node[(address >> shift) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found = node[2]
+        return found
+
+
+class IPBlocklist:
+    """Blocked addresses and ranges with expiry, shared by the security components"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._hosts: Dict[bytes, BlockEntry] = {}
+        self._others: Dict[str, BlockEntry] = {}
+        self._tries = {4: _PrefixTrie(32), 16: _PrefixTrie(128)}
+        self._expiry: List[Tuple[float, str]] = []
+        self._by_target: Dict[str, BlockEntry] = {}
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.hits = 0
+        self.expired = 0
+
+    @staticmethod
+    def normalize(target: str) -> str:
+        """Canonical key: '10.0.0.1', '10.0.0.0/8', '2001:db8::/32'; non-IP strings unchanged"""
+        target = target.strip()
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            return target
+        if network.version == 6 and network.prefixlen >= 96 and network.network_address.ipv4_mapped:
+            network = ipaddress.ip_network(f"{network.network_address.ipv4_mapped}/{network.prefixlen - 96}")
+        if network.prefixlen == network.max_prefixlen:
+            return str(network.network_address)
+        return str(network)
+
+    def block(self, target: str, reason: str = "Security violation", duration: Optional[float] = None,
+              source: str = "manual") -> BlockEntry:
+        """Block an address or CIDR range, permanently or for `duration` seconds"""
+        key = self.normalize(target)
+        now = self._clock()
+        entry = BlockEntry(key, reason, source, now, now + duration if duration else None)
+        with self._lock:
+            self._remove_locked(key)
+            self._by_target[key] = entry
+            packed = _pack(key)
+            if packed is not None:
+                self._hosts[packed] = entry
+            elif "/" in key:
+                network = ipaddress.ip_network(key)
+                trie = self._tries[4 if network.version == 4 else 16]
+                trie.insert(int(network.network_address), network.prefixlen, entry)
+            else:
+                self._others[key] = entry
+            if entry.expires_at is not None:
+                heapq.heappush(self._expiry, (entry.expires_at, key))
+        return entry
+
+    def unblock(self, target: str) -> bool:
+        with self._lock:
+            return self._remove_locked(self.normalize(target))
+
+    def _remove_locked(self, key: str) -> bool:
+        entry = self._by_target.pop(key, None)
+        if entry is None:
+            return False
+        packed = _pack(key)
+        if packed is not None:
+            self._hosts.pop(packed, None)
+        elif "/" in key:
+            network = ipaddress.ip_network(key)
+            self._tries[4 if network.version == 4 else 16].remove(int(network.network_address), network.prefixlen)
+        else:
+            self._others.pop(key, None)
+        return True
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Lift temporary blocks that are due - O(expired)"""
+        now = self._clock() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expiry)
+                entry = self._by_target.get(key)
+                # Re-blocked since (new expiry or permanent) - the heap item is stale
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove_locked(key)
+                    removed += 1
+                    logger.info(f"Temporary block expired for IP: {key}")
+        self.expired += removed
+        return removed
+
+    def lookup(self, ip: str) -> Optional[BlockEntry]:
+        """Entry blocking this address (exact or covering range), or None"""
+        if self._expiry and self._expiry[0][0] <= self._clock():
+            self.expire()
+        self.checks += 1
+        packed = _pack(ip)
+        if packed is None:
+            entry = self._others.get(ip)
+        else:
+            entry = self._hosts.get(packed)
+            if entry is None:
+                trie = self._tries[len(packed)]
+                if trie.size:
+                    entry = trie.match(int.from_bytes(packed, "big"))
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def is_blocked(self, ip: str) -> bool:
+        return self.lookup(ip) is not None
+
+    def load_ranges(self, lines: Iterable[str], reason: str = "Threat feed", source: str = "feed",
+                    duration: Optional[float] = None) -> int:
+        """Block every IP/CIDR in a feed (one per line, '#' comments); returns how many were loaded"""
+        loaded = invalid = 0
+        for line in lines:
+            target = line.split("#", 1)[0].strip()
+            if not target:
+                continue
+            try:
+                ipaddress.ip_network(target, strict=False)
+            except ValueError:
+                invalid += 1
+                continue
+            self.block(target, reason=reason, duration=duration, source=source)
+            loaded += 1
+        if invalid:
+            logger.warning(f"⚠️ Skipped {invalid} invalid blocklist entries from {source}")
+        return loaded
+
+    def load_file(self, path: str, reason: str = "Threat feed") -> int:
+        with open(path, encoding="utf-8") as f:
+            loaded = self.load_ranges(f, reason=reason, source=os.path.basename(path))
+        logger.info(f"✅ Loaded {loaded} blocklist entries from {path}")
+        return loaded
+
+    def entries(self) -> List[BlockEntry]:
+        with self._lock:
+            return list(self._by_target.values())
+
+    def __len__(self) -> int:
+        return len(self._by_target)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._by_target),
+            "addresses": len(self._hosts),
+            "ipv4_ranges": self._tries[4].size,
+            "ipv6_ranges": self._tries[16].size,
+            "expiry_queue": len(self._expiry),
+            "checks": self.checks,
+            "hits": self.hits,
+            "expired": self.expired,
+        }
+
+
+# Shared blocklist for the middleware and the security monitor
+ip_blocklist = IPBlocklist()
@@ -0,0 +1,161 @@
+# password_hasher.py
+"""
+Password hashing off the request threadpool.
+
+bcrypt is slow by design (~0.3 s per hash at cost 12). Login and registration
+used to run it inside FastAPI's threadpool, so a login storm tied up every
+pool thread and starved the other sync endpoints. PasswordHasher runs hashing
+and verification on a dedicated, size-capped executor - a process pool by
+default, so it scales past the GIL - and caps how many requests may wait on
+it: beyond PASSWORD_HASH_MAX_PENDING callers get PasswordHashingBusy, which the
+endpoints turn into 503 + Retry-After instead of an ever-growing queue.
+
+verify_and_update also returns a fresh hash when the stored one is a legacy
+SHA-256 hash or uses another bcrypt cost (BCRYPT_ROUNDS), so login upgrades
+it transparently.
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core.security_utils import BCRYPT_ROUNDS, hash_password, needs_rehash, verify_password
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")  # process | thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 8))
+
+
+class PasswordHashingBusy(Exception):
+    """Too many hashing requests waiting - shed with 503"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Password hashing capacity exceeded")
+        self.retry_after = retry_after
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Runs in the worker: verify, then rehash with the current cost if the stored hash is outdated"""
+    if not verify_password(password, hashed_password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, hash_password(password)
+    return True, None
+
+
+class PasswordHasher:
+    """Dedicated executor for bcrypt with a pending-request cap and latency metrics"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 executor: str = PASSWORD_HASH_EXECUTOR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+
+        self.pending = 0
+        self.shed = 0
+        self.rehashed = 0
+        self.failures = 0
+        self._latency: Dict[str, Deque[float]] = {"hash": deque(maxlen=1000), "verify": deque(maxlen=1000)}
+        self._completed: Dict[str, int] = {"hash": 0, "verify": 0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                try:
+                    # spawn: the server process has threads (scheduler, DB pools) that fork would copy mid-state
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                    logger.info(f"✅ Password hashing process pool started ({self.workers} workers)")
+                except Exception as e:
+                    logger.warning(f"⚠️ Password hashing process pool unavailable, using threads: {e}")
+                    self.executor_kind = "thread"
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, op: str, func, *args):
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            raise PasswordHashingBusy(self._retry_after())
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next request
+            self.failures += 1
+            self._executor = None
+            raise PasswordHashingBusy(1)
+        finally:
+            self.pending -= 1
+        self._latency[op].append(time.perf_counter() - start)
+        self._completed[op] += 1
+        return result
+
+    def _retry_after(self) -> int:
+        recent = self._latency["verify"] or self._latency["hash"]
+        average = sum(recent) / len(recent) if recent else 0.3
+        return max(1, math.ceil(self.pending * average / self.workers))
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash) - new_hash is set when the stored hash should be replaced"""
+        valid, new_hash = await self._run("verify", _verify_and_update, password, hashed_password)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    async def warm_up(self):
+        """Start the workers ahead of the first login (spawning one takes about a second)"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for _ in range(self.workers)))
+        except BrokenProcessPool:
+            # Don't keep a broken pool around for the first login; the next call starts a fresh one
+            self.failures += 1
+            self._executor = None
+            raise
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for op, samples in self._latency.items():
+            ordered = sorted(samples)
+            latency[op] = {
+                "completed": self._completed[op],
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1) if ordered else None,
+                "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+            }
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "shed": self.shed,
+            "rehashed": self.rehashed,
+            "failures": self.failures,
+            "latency": latency,
+        }
+
+
+# Shared hasher for the auth endpoints
+password_hasher = PasswordHasher()
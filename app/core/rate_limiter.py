@@ -0,0 +1,255 @@
+# rate_limiter.py
+"""
+Request rate limiting (GCRA) with bounded memory and an optional shared backend.
+
+Each key (client IP + endpoint category) stores a single float - its
+theoretical arrival time (TAT) - instead of a list/deque of timestamps:
+
+    interval = window / limit
+    tat      = max(stored_tat, now) + interval
+    allowed  = tat - window <= now        (else retry after tat - window - now)
+
+which admits a burst of `limit` requests and then one per `interval`, the same
+budget as "limit per window" without storing the requests.
+
+Keys live in an LRU-ordered dict capped at RATE_LIMIT_MAX_KEYS. A key whose TAT
+has passed is indistinguishable from a new one, so idle keys are dropped from
+the old end as new ones arrive and memory stays proportional to active clients.
+
+Limits come from security_config.RATE_LIMITS and are parsed once at import.
+When REDIS_URL is configured (and RATE_LIMIT_SHARED is on) the TAT lives in
+Redis and is updated by one atomic script, so every worker enforces the same
+budget; if Redis is unreachable the worker falls back to its local state.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import RATE_LIMIT_PER_USER, REDIS_URL
+from app.core.security_config import RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "true").lower() == "true"
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    window: float
+
+    @property
+    def interval(self) -> float:
+        return self.window / self.limit
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+_ALLOWED = RateLimitDecision(True)
+
+def parse_rate(spec: str) -> Rate:
+    """'10/minute' -> Rate(10, 60)"""
+    limit, period = spec.split("/")
+    if period not in _PERIODS:
+        raise ValueError(f"Unknown rate limit period: {spec}")
+    return Rate(int(limit), _PERIODS[period])
+
+
+# Parsed once - the request path only does dict lookups
+CATEGORY_RATES: Dict[str, Rate] = {name: parse_rate(spec) for name, spec in RATE_LIMITS.items()}
+DEFAULT_CATEGORY = "api_general"
+GLOBAL_RATE = Rate(RATE_LIMIT_PER_USER, 60)
+
+# Route prefix -> category, matched on whole path segments (longest prefix wins).
+# A method key applies only to that method; None applies to any method.
+ROUTE_CATEGORIES: Dict[str, Dict[Optional[str], str]] = {
+    "/api/auth/register": {None: "auth_register"},
+    "/api/auth/token": {None: "auth_login"},
+    "/api/auth/login": {None: "auth_login"},
+    "/api/auth/password": {None: "auth_password_reset"},
+    "/api/auth/user/profile": {None: "api_user_profile"},
+    "/api/odds": {None: "api_odds"},
+    "/api/odds-gated": {None: "api_odds"},
+    "/api/arbitrage": {None: "api_arbitrage"},
+    "/api/my-arbitrage": {"POST": "api_save_arbitrage"},
+    "/api/subscription": {None: "api_subscription"},
+    "/api/subscriptions": {None: "api_subscription"},
+    # Read-only monitoring endpoints are polled by dashboards; writes fall through to "admin"
+    "/api/admin/scheduler-status": {"GET": "admin_metrics"},
+    "/api/admin/db-pool-status": {"GET": "admin_metrics"},
+    "/api/admin/email-outbox": {"GET": "admin_metrics"},
+    "/api/admin/password-hashing": {"GET": "admin_metrics"},
+    "/api/admin/tracing": {"GET": "admin_metrics"},
+    "/api/admin/maintenance-status": {"GET": "admin_metrics"},
+    "/api/admin/cache-stats": {"GET": "admin_metrics"},
+    "/api/admin": {None: "admin"},
+    "/admin": {None: "admin"},
+}
+_ROUTE_DEPTH = max(prefix.count("/") for prefix in ROUTE_CATEGORIES)
+ROUTE_CATEGORY_CACHE_SIZE = int(os.getenv("ROUTE_CATEGORY_CACHE_SIZE", 4096))
+_category_cache: Dict[Tuple[str, str], str] = {}
+
+def endpoint_category(path: str, method: str) -> str:
+    """Categorize endpoint for rate limiting (cached per path and method)"""
+    key = (path, method)
+    category = _category_cache.get(key)
+    if category is None:
+        category = _resolve_category(path.lower(), method)
+        # Bounded: paths with ids beyond the cap are resolved each time instead
+        if len(_category_cache) < ROUTE_CATEGORY_CACHE_SIZE:
+            _category_cache[key] = category
+    return category
+
+def _resolve_category(path: str, method: str) -> str:
+    # Cut the path to the deepest rule's segment count, then try shorter prefixes
+    end = -1
+    for _ in range(_ROUTE_DEPTH + 1):
+        end = path.find("/", end + 1)
+        if end == -1:
+            end = len(path)
+            break
+    while end > 0:
+        rules = ROUTE_CATEGORIES.get(path[:end])
+        if rules is not None:
+            category = rules.get(method) or rules.get(None)
+            if category is not None:
+                return category
+        end = path.rfind("/", 0, end)
+    return DEFAULT_CATEGORY
+
+
+class GCRALimiter:
+    """In-process GCRA state: one TAT per key, LRU-bounded, idle keys evicted"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._tat: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    def hit(self, key: Hashable, rate: Rate, now: Optional[float] = None) -> RateLimitDecision:
+        now = self._clock() if now is None else now
+        with self._lock:
+            tat = self._tat.get(key)
+            if tat is None:
+                self._evict(now)
+                tat = now
+            elif tat < now:
+                tat = now
+            new_tat = tat + rate.interval
+            allow_at = new_tat - rate.window
+            if allow_at > now:
+                self.limited += 1
+                self._tat.move_to_end(key)
+                return RateLimitDecision(False, allow_at - now)
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            self.allowed += 1
+            return _ALLOWED
+
+    def _evict(self, now: float):
+        """Make room for a new key: drop idle keys from the LRU end, then the LRU key if still full"""
+        data = self._tat
+        # Bounded work per insert - idle keys at the old end are free to drop
+        for _ in range(2):
+            if not data:
+                return
+            key, tat = next(iter(data.items()))
+            if tat > now:
+                break
+            del data[key]
+            self.evictions += 1
+        while len(data) >= self.max_keys:
+            data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self._tat),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evictions": self.evictions,
+        }
+
+
+# KEYS[1] = limiter key; ARGV = interval, window (seconds). Uses the Redis clock so
+# every worker agrees on "now". Returns {allowed, retry_after_ms}.
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, math.ceil((allow_at - now) * 1000)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, 0}
+"""
+
+
+class RateLimiter:
+    """GCRA limiter used by SecurityMiddleware - shared (Redis) when configured, else per-process"""
+
+    def __init__(self, local: Optional[GCRALimiter] = None, shared_client: Any = None):
+        self.local = local or GCRALimiter()
+        self._shared = shared_client
+        self._script = None
+        self.shared_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        shared = None
+        if REDIS_URL and RATE_LIMIT_SHARED:
+            try:
+                import redis.asyncio as redis_asyncio
+                shared = redis_asyncio.Redis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+                logger.info("✅ Shared rate limiting enabled (Redis)")
+            except Exception as e:
+                logger.warning(f"⚠️ Shared rate limiting unavailable, using per-process limits: {e}")
+        return cls(shared_client=shared)
+
+    async def hit(self, key: tuple, rate: Rate) -> RateLimitDecision:
+        if self._shared is not None:
+            try:
+                if self._script is None:
+                    self._script = self._shared.register_script(_GCRA_SCRIPT)
+                allowed, retry_ms = await self._script(
+                    keys=["arbify:ratelimit:" + ":".join(key)], args=[rate.interval, rate.window]
+                )
+                return _ALLOWED if allowed else RateLimitDecision(False, retry_ms / 1000)
+            except Exception as e:
+                self.shared_errors += 1
+                if self.shared_errors == 1 or self.shared_errors % 1000 == 0:
+                    logger.warning(f"⚠️ Shared rate limiter error ({self.shared_errors}), using local state: {e}")
+        return self.local.hit(key, rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.local.stats(), shared=self._shared is not None, shared_errors=self.shared_errors)
+
+
+# Shared limiter for the app's middleware
+rate_limiter = RateLimiter.from_env()
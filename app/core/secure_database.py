@@ -13,10 +13,13 @@ import os
 import logging
 from datetime import datetime
 from typing import Any, Optional
-from sqlalchemy import event, create_engine, text
+from sqlalchemy import event, text
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.engine import Engine
-from sqlalchemy.pool import QueuePool
+
+from app.core.config import DB_STATEMENT_TIMEOUT_MS
+from app.core.database import create_database_engine
+from app.core.security_logger import security_log
 
 from security_config import security_config, DATABASE_SECURITY
 from user_models import User, UserProfile, UserArbitrage
@@ -42,31 +45,21 @@ class SecureDatabase:
     def _create_secure_engine(self) -> Engine:
         """Create database engine with security configurations"""
         
-        # Base engine configuration
+        # Pool sizing, pre-ping, recycle, statement timeouts and SQLite pragmas
+        # come from the shared engine factory
         engine_kwargs = {
-            "poolclass": QueuePool,
-            "pool_size": 10,
-            "max_overflow": 20,
-            "pool_pre_ping": True,  # Verify connections
-            "pool_recycle": 3600,   # Recycle connections every hour
+            "echo": False,  # Don't log SQL in production (set to True for SQL debugging)
         }
         
         # Production-specific security
-        if self.is_production:
-            engine_kwargs.update({
-                "echo": False,  # Don't log SQL in production
-                "connect_args": {
-                    "sslmode": "require",  # Require SSL for PostgreSQL
-                    "application_name": "arbify_secure",
-                }
-            })
-        else:
-            # Development configuration
-            engine_kwargs.update({
-                "echo": False,  # Set to True for SQL debugging
-            })
+        if self.is_production and "postgresql" in self.database_url:
+            engine_kwargs["connect_args"] = {
+                "sslmode": "require",  # Require SSL for PostgreSQL
+                "application_name": "arbify_secure",
+                "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS} -c timezone=UTC",
+            }
         
-        engine = create_engine(self.database_url, **engine_kwargs)
+        engine = create_database_engine(self.database_url, **engine_kwargs)
         
         # Add connection event listeners
         self._setup_connection_listeners(engine)
@@ -78,19 +71,7 @@ class SecureDatabase:
         
         @event.listens_for(engine, "connect")
         def set_connection_security(dbapi_connection, connection_record):
-            """Set security parameters on each connection"""
-            if "postgresql" in self.database_url:
-                # PostgreSQL security settings
-                with dbapi_connection.cursor() as cursor:
-                    # Set statement timeout (prevent long-running queries)
-                    cursor.execute("SET statement_timeout = '60s'")
-                    
-                    # Set timezone to UTC
-                    cursor.execute("SET timezone = 'UTC'")
-                    
-                    # Disable autocommit for explicit transaction control
-                    dbapi_connection.autocommit = False
-            
+            """Log each new connection (timeouts and pragmas are set by the engine factory)"""
             security_logger.info(f"Secure database connection established")
         
         @event.listens_for(engine, "checkout")
@@ -138,11 +119,11 @@ class SecureDatabase:
     def _log_audit_event(self, event_type: str, data: dict):
         """Log audit events"""
         audit_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "event_type": event_type,
             "data": data
         }
-        security_logger.info(f"AUDIT: {audit_data}")
+        security_log.submit(security_logger.name, logging.INFO, "AUDIT", audit_data)
     
     def get_session(self) -> Session:
         """Get a secure database session"""
@@ -20,7 +20,9 @@ from fastapi import Request, Response, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from cryptography.fernet import Fernet
 
-from security_config import SESSION_CONFIG, security_config
+from app.core.security_config import SESSION_CONFIG, security_config
+from app.core.session_store import SESSION_IDLE_SECONDS, create_session_store
+from app.services.identity_cache import invalidate_identity
 
 # Security logger
 security_logger = logging.getLogger("security.sessions")
@@ -49,18 +51,29 @@ class SecureSessionManager:
         
         self.cipher = Fernet(self.session_key)
         
-        # Active sessions tracking
-        self.active_sessions: Dict[str, Dict] = {}
+        # Active sessions tracking (indexed by user and expiry; Redis-backed when configured)
+        self.sessions = create_session_store()
+        self.session_idle = timedelta(seconds=SESSION_IDLE_SECONDS)
+    
+    @property
+    def active_sessions(self) -> Dict[str, Dict]:
+        return self.sessions.all()
+    
+    def _session_expiry(self, session_info: Dict) -> datetime:
+        """Idle timeout from last use, capped by the refresh token's own lifetime"""
+        return min(session_info["last_used"] + self.session_idle, session_info["created"] + self.refresh_token_expire)
     
     def create_access_token(self, data: Dict[str, Any]) -> str:
         """Create secure access token"""
         to_encode = data.copy()
-        expire = datetime.utcnow() + self.access_token_expire
+        now = datetime.utcnow()
+        expire = now + self.access_token_expire
         
         # Add security claims
         to_encode.update({
             "exp": expire,
-            "iat": datetime.utcnow(),
+            # Fractional NumericDate, so revoke-all cutoffs can be compared below whole seconds
+            "iat": now.replace(tzinfo=timezone.utc).timestamp(),
             "type": "access",
             "jti": secrets.token_urlsafe(16),  # JWT ID for tracking
         })
@@ -93,13 +106,15 @@ class SecureSessionManager:
             encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
             
             # Store refresh token info
-            self.active_sessions[to_encode["jti"]] = {
+            now = datetime.utcnow()
+            session_info = {
                 "user": user_data["sub"],
-                "created": datetime.utcnow(),
-                "last_used": datetime.utcnow(),
+                "created": now,
+                "last_used": now,
                 "ip": user_data.get("ip", "unknown"),
                 "user_agent": user_data.get("user_agent", "unknown"),
             }
+            self.sessions.add(to_encode["jti"], session_info, self._session_expiry(session_info))
             
             security_logger.info(f"Refresh token created for user: {user_data['sub']}")
             
@@ -125,11 +140,16 @@ class SecureSessionManager:
             if exp and datetime.fromtimestamp(exp) < datetime.utcnow():
                 raise JWTError("Token expired")
             
+            # Access tokens issued before a "revoke all" for the user are no longer valid
+            if token_type == "access":
+                revoked_before = self.sessions.revoked_before(payload.get("sub"))
+                # Sub-second comparison: a re-login in the same second as "log out everywhere" stays valid
+                if revoked_before and payload.get("iat", 0) < revoked_before.replace(tzinfo=timezone.utc).timestamp():
+                    raise JWTError("Token revoked")
+            
             # Update session tracking for refresh tokens
             if token_type == "refresh":
-                jti = payload.get("jti")
-                if jti in self.active_sessions:
-                    self.active_sessions[jti]["last_used"] = datetime.utcnow()
+                self._touch_session(payload.get("jti"))
             
             return payload
             
@@ -149,14 +169,14 @@ class SecureSessionManager:
             
             # Check if refresh token is in active sessions
             jti = payload.get("jti")
-            if jti not in self.active_sessions:
+            session_info = self.sessions.get(jti)
+            if session_info is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Refresh token revoked"
                 )
             
             # Verify IP consistency (optional security check)
-            session_info = self.active_sessions[jti]
             if session_info["ip"] != client_ip:
                 security_logger.warning(f"IP mismatch for refresh token: {jti}")
                 # Could block or require re-authentication
@@ -166,7 +186,7 @@ class SecureSessionManager:
             new_access_token = self.create_access_token(user_data)
             
             # Update session last used
-            session_info["last_used"] = datetime.utcnow()
+            self._touch_session(jti)
             
             security_logger.info(f"Access token refreshed for user: {payload['sub']}")
             
@@ -189,8 +209,7 @@ class SecureSessionManager:
             payload = self.verify_token(token, "refresh")
             jti = payload.get("jti")
             
-            if jti in self.active_sessions:
-                del self.active_sessions[jti]
+            if self.sessions.remove(jti):
                 security_logger.info(f"Token revoked for user: {payload['sub']}")
             
         except Exception as e:
@@ -198,16 +217,14 @@ class SecureSessionManager:
     
     def revoke_all_user_tokens(self, username: str):
         """Revoke all tokens for a user"""
-        revoked_count = 0
-        sessions_to_remove = []
+        revoked_count = self.sessions.remove_user(username)
         
-        for jti, session_info in self.active_sessions.items():
-            if session_info["user"] == username:
-                sessions_to_remove.append(jti)
+        # Outstanding access tokens are rejected until they would have expired anyway
+        now = datetime.utcnow()
+        self.sessions.revoke_user_before(username, now, now + self.access_token_expire)
         
-        for jti in sessions_to_remove:
-            del self.active_sessions[jti]
-            revoked_count += 1
+        # Cached principals must not outlive the revocation
+        invalidate_identity(username)
         
         security_logger.info(f"Revoked {revoked_count} tokens for user: {username}")
         return revoked_count
@@ -255,27 +272,22 @@ class SecureSessionManager:
     def get_active_sessions(self, username: str = None) -> Dict[str, Any]:
         """Get active sessions (for monitoring)"""
         if username:
-            return {
-                jti: info for jti, info in self.active_sessions.items()
-                if info["user"] == username
-            }
-        return self.active_sessions.copy()
+            return self.sessions.user_sessions(username)
+        return self.sessions.all()
+    
+    def _touch_session(self, jti: Optional[str]):
+        session_info = self.sessions.get(jti) if jti else None
+        if session_info is not None:
+            session_info["last_used"] = datetime.utcnow()
+            self.sessions.touch(jti, session_info["last_used"], self._session_expiry(session_info))
     
     def cleanup_expired_sessions(self):
-        """Clean up expired sessions"""
-        now = datetime.utcnow()
-        expired_sessions = []
-        
-        for jti, session_info in self.active_sessions.items():
-            # Consider session expired if not used for 24 hours
-            if (now - session_info["last_used"]).total_seconds() > 86400:
-                expired_sessions.append(jti)
-        
-        for jti in expired_sessions:
-            del self.active_sessions[jti]
+        """Clean up expired sessions (idle for SESSION_IDLE_SECONDS or past the refresh token lifetime)"""
+        expired_count = self.sessions.expire(datetime.utcnow())
         
-        if expired_sessions:
-            security_logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
+        if expired_count:
+            security_logger.info(f"Cleaned up {expired_count} expired sessions")
+        return expired_count
 
 # Global session manager instance
 session_manager = SecureSessionManager()
@@ -292,7 +304,7 @@ class SecureBearer(HTTPBearer):
         
         if credentials:
             # Additional security checks
-            from security_config import get_client_ip
+            from app.core.security_config import get_client_ip
             client_ip = get_client_ip(request)
             
             # Log token usage
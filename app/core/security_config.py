@@ -157,6 +157,7 @@ RATE_LIMITS = {
     
     # Admin endpoints (very restrictive)
     "admin": "5/hour",  # Reduced from 10
+    "admin_metrics": "60/minute",  # Read-only status endpoints polled by monitoring
 }
 
 # Database Security Configuration
@@ -217,53 +218,85 @@ SECURITY_EVENTS = {
     "SECURITY_SCAN": "security_scan",
 }
 
-def get_client_ip(request: Request) -> str:
-    """Safely extract client IP from request headers"""
-    # Check X-Forwarded-For (from load balancers/proxies)
-    forwarded_for = request.headers.get("x-forwarded-for")
+# Reverse proxies in front of the app that append to X-Forwarded-For (Railway's edge = 1).
+# 0 = the app is reached directly and forwarding headers are ignored.
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 1))
+
+def client_ip_from_headers(headers, peer: str = 'unknown', trusted_proxies: int = None) -> str:
+    """Client IP as seen by the outermost trusted proxy (lower-case header names), else the peer.
+
+    Clients control everything left of what our own proxies appended to
+    X-Forwarded-For, so the address is taken `trusted_proxies` entries from the
+    right - the rightmost hop no trusted proxy vouches for - never the leftmost.
+    """
+    if trusted_proxies is None:
+        trusted_proxies = TRUSTED_PROXY_COUNT
+    if trusted_proxies <= 0:
+        return peer
+
+    forwarded_for = headers.get("x-forwarded-for")
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        # Fewer hops than trusted proxies: the header didn't come through our proxies
+        return hops[-trusted_proxies] if len(hops) >= trusted_proxies else peer
     
-    # Check X-Real-IP (from reverse proxies)
-    real_ip = request.headers.get("x-real-ip")
+    # Single-value headers set (overwritten) by the proxy itself
+    real_ip = headers.get("x-real-ip") or headers.get("cf-connecting-ip")
     if real_ip:
         return real_ip.strip()
     
-    # Check CF-Connecting-IP (from Cloudflare)
-    cf_ip = request.headers.get("cf-connecting-ip")
-    if cf_ip:
-        return cf_ip.strip()
-    
     # Fallback to direct client IP
-    return getattr(request.client, 'host', 'unknown')
+    return peer
 
-def is_suspicious_request(request: Request) -> bool:
-    """Detect potentially suspicious requests"""
-    user_agent = request.headers.get('user-agent', '').lower()
-    
-    # CRITICAL: Make suspicious patterns more specific to avoid false positives
-    suspicious_patterns = [
-        'sqlmap', 'nikto', 'dirb', 'gobuster', 'burp', 'nessus', 'scanner',
-        'exploit', 'hack', 'attack', 'inject', 'malware', 'virus',
-        # More specific bot patterns that are actually malicious
-        'masscan', 'zmap', 'shodan', 'censys', 'nuclei',
-        # Remove generic 'bot', 'crawler', 'spider' as they catch legitimate traffic
-    ]
-    
-    # Check for suspicious user agents
-    for pattern in suspicious_patterns:
-        if pattern in user_agent:
-            return True
+def get_client_ip(request: Request) -> str:
+    """Safely extract client IP from request headers"""
+    return client_ip_from_headers(request.headers, getattr(request.client, 'host', 'unknown'))
+
+# CRITICAL: Make suspicious patterns more specific to avoid false positives
+SUSPICIOUS_USER_AGENT_PATTERNS = [
+    'sqlmap', 'nikto', 'dirb', 'gobuster', 'burp', 'nessus', 'scanner',
+    'exploit', 'hack', 'attack', 'inject', 'malware', 'virus',
+    # More specific bot patterns that are actually malicious
+    'masscan', 'zmap', 'shodan', 'censys', 'nuclei',
+    # Remove generic 'bot', 'crawler', 'spider' as they catch legitimate traffic
+]
+
+_SUSPICIOUS_USER_AGENT_TOKENS = tuple(SUSPICIOUS_USER_AGENT_PATTERNS)
+USER_AGENT_CACHE_SIZE = int(os.getenv("USER_AGENT_CACHE_SIZE", 4096))
+# How long the middleware blocks an IP after repeated rate-limit or suspicious-request hits
+SECURITY_AUTO_BLOCK_SECONDS = int(os.getenv("SECURITY_AUTO_BLOCK_SECONDS", 3600))
+# Verdict per user agent string - clients send the same one on every request
+_user_agent_verdicts: Dict[str, bool] = {}
+
+def is_suspicious_user_agent(user_agent: str) -> bool:
+    """Detect scanner/attack tooling user agents"""
+    verdict = _user_agent_verdicts.get(user_agent)
+    if verdict is None:
+        verdict = _classify_user_agent(user_agent)
+        # Bounded: only typical-length agents, and only until the cache is full
+        if len(_user_agent_verdicts) < USER_AGENT_CACHE_SIZE and len(user_agent or '') <= 512:
+            _user_agent_verdicts[user_agent] = verdict
+    return verdict
+
+def _classify_user_agent(user_agent: str) -> bool:
+    user_agent = (user_agent or '').lower()
     
     # Check for empty or very short user agents (more suspicious)
-    if not user_agent or len(user_agent) < 10:
+    if len(user_agent) < 10:
         return True
     
+    # Check for suspicious user agents (substring search beats a regex alternation here)
     # REMOVED: Suspicious headers check as x-forwarded-* are normal in production
     # These headers are commonly used by legitimate proxies and load balancers
-    
+    for pattern in _SUSPICIOUS_USER_AGENT_TOKENS:
+        if pattern in user_agent:
+            return True
     return False
 
+def is_suspicious_request(request: Request) -> bool:
+    """Detect potentially suspicious requests"""
+    return is_suspicious_user_agent(request.headers.get('user-agent', ''))
+
 def generate_csrf_token() -> str:
     """Generate a secure CSRF token"""
     return secrets.token_urlsafe(32)
@@ -279,6 +312,7 @@ security_config = SecurityConfig()
 __all__ = [
     'SecurityConfig', 'security_config', 'SSL_CONFIG', 'SECURITY_HEADERS',
     'RATE_LIMITS', 'DATABASE_SECURITY', 'SESSION_CONFIG', 'UPLOAD_SECURITY',
-    'MONITORING_CONFIG', 'SECURITY_EVENTS', 'get_client_ip', 
-    'is_suspicious_request', 'generate_csrf_token', 'validate_csrf_token'
+    'MONITORING_CONFIG', 'SECURITY_EVENTS', 'TRUSTED_PROXY_COUNT', 'SECURITY_AUTO_BLOCK_SECONDS',
+    'client_ip_from_headers', 'get_client_ip',
+    'is_suspicious_user_agent', 'is_suspicious_request', 'generate_csrf_token', 'validate_csrf_token'
 ]
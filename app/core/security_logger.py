@@ -1,10 +1,23 @@
 """
 Security-focused logging utilities for the application
+
+Security, audit and API-call records go through `security_log`, a queued
+pipeline: the request path only builds a dict and does a non-blocking put;
+a background writer thread encodes the records (orjson when installed) and
+writes them in batches - to SECURITY_LOG_FILE as JSON lines when configured,
+otherwise through the regular `security.*` loggers as "KIND: {json}".
+When the queue is full records are dropped and counted rather than blocking.
 """
+import atexit
 import logging
 import json
-from datetime import datetime
-from typing import Dict, Any, Optional
+import os
+import queue
+import random
+import threading
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import Request
 
 # Configure security logger
@@ -22,6 +35,149 @@ formatter = logging.Formatter(
 handler.setFormatter(formatter)
 security_logger.addHandler(handler)
 
+SECURITY_LOG_QUEUE_SIZE = int(os.getenv("SECURITY_LOG_QUEUE_SIZE", 10000))
+SECURITY_LOG_BATCH_SIZE = int(os.getenv("SECURITY_LOG_BATCH_SIZE", 256))
+# Fraction of API_CALL records kept (they are logged for every request)
+SECURITY_API_LOG_SAMPLE_RATE = float(os.getenv("SECURITY_API_LOG_SAMPLE_RATE", 1.0))
+# JSON-lines file for security records; unset = write through the logging handlers
+SECURITY_LOG_FILE = os.getenv("SECURITY_LOG_FILE")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+try:
+    import orjson
+
+    def encode_record(record: Dict[str, Any]) -> str:
+        return orjson.dumps(record, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:  # pragma: no cover - orjson is optional
+    def encode_record(record: Dict[str, Any]) -> str:
+        return json.dumps(record, default=_json_default)
+
+
+_STOP = object()
+
+
+class SecurityLogPipeline:
+    """Bounded queue + background writer for security/audit records"""
+
+    def __init__(self, max_queue: int = SECURITY_LOG_QUEUE_SIZE, batch_size: int = SECURITY_LOG_BATCH_SIZE,
+                 path: Optional[str] = SECURITY_LOG_FILE, autostart: bool = True):
+        self.batch_size = batch_size
+        self.path = path
+        self.autostart = autostart
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file = None
+
+        self.submitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def submit(self, channel: str, level: int, kind: str, record: Dict[str, Any], sample_rate: float = 1.0) -> bool:
+        """Queue a record without blocking; False if it was sampled out or dropped"""
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            self.sampled_out += 1
+            return False
+        # Logger sink: records the logger would discard are not queued at all
+        if not self.path and not logging.getLogger(channel).isEnabledFor(level):
+            return False
+        if self._thread is None and self.autostart:
+            self.start()
+        try:
+            self._queue.put_nowait((channel, level, kind, record))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                security_logger.warning(f"⚠️ Security log queue full, {self.dropped} records dropped")
+            return False
+        self.submitted += 1
+        return True
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="security-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is _STOP for item in batch)
+            records = [item for item in batch if item is not _STOP]
+            try:
+                if records:
+                    self._write(records)
+            except Exception as e:
+                self.write_errors += 1
+                security_logger.error(f"❌ Security log write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, records: List[Tuple[str, int, str, Dict[str, Any]]]):
+        if self.path:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("".join(
+                encode_record({"kind": kind, "logger": channel, "level": logging.getLevelName(level), **record}) + "\n"
+                for channel, level, kind, record in records
+            ))
+            self._file.flush()
+        else:
+            for channel, level, kind, record in records:
+                logging.getLogger(channel).log(level, f"{kind}: {encode_record(record)}")
+        self.written += len(records)
+        self.batches += 1
+
+    def flush(self):
+        """Block until every queued record has been written (tests, shutdown)"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+        self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+        }
+
+
+# Shared pipeline for the app's security and audit logging
+security_log = SecurityLogPipeline()
+
 class SecurityLogger:
     """Centralized security event logging"""
     
@@ -38,9 +194,9 @@ class SecurityLogger:
         }
         
         if success:
-            security_logger.info(f"LOGIN_SUCCESS: {json.dumps(event_data)}")
+            security_log.submit("security", logging.INFO, "LOGIN_SUCCESS", event_data)
         else:
-            security_logger.warning(f"LOGIN_FAILED: {json.dumps(event_data)}")
+            security_log.submit("security", logging.WARNING, "LOGIN_FAILED", event_data)
     
     @staticmethod
     def log_registration(username: str, email: str, ip_address: str):
@@ -52,7 +208,7 @@ class SecurityLogger:
             "ip_address": ip_address,
             "timestamp": datetime.utcnow().isoformat()
         }
-        security_logger.info(f"USER_REGISTERED: {json.dumps(event_data)}")
+        security_log.submit("security", logging.INFO, "USER_REGISTERED", event_data)
     
     @staticmethod
     def log_password_change(username: str, ip_address: str, success: bool):
@@ -66,9 +222,9 @@ class SecurityLogger:
         }
         
         if success:
-            security_logger.info(f"PASSWORD_CHANGED: {json.dumps(event_data)}")
+            security_log.submit("security", logging.INFO, "PASSWORD_CHANGED", event_data)
         else:
-            security_logger.warning(f"PASSWORD_CHANGE_FAILED: {json.dumps(event_data)}")
+            security_log.submit("security", logging.WARNING, "PASSWORD_CHANGE_FAILED", event_data)
     
     @staticmethod
     def log_suspicious_activity(event_type: str, details: Dict[str, Any], ip_address: str):
@@ -79,7 +235,7 @@ class SecurityLogger:
             "ip_address": ip_address,
             "timestamp": datetime.utcnow().isoformat()
         }
-        security_logger.warning(f"SUSPICIOUS_ACTIVITY: {json.dumps(event_data)}")
+        security_log.submit("security", logging.WARNING, "SUSPICIOUS_ACTIVITY", event_data)
     
     @staticmethod
     def log_rate_limit_exceeded(endpoint: str, ip_address: str, user_agent: str = None):
@@ -91,21 +247,10 @@ class SecurityLogger:
             "user_agent": user_agent,
             "timestamp": datetime.utcnow().isoformat()
         }
-        security_logger.warning(f"RATE_LIMIT_EXCEEDED: {json.dumps(event_data)}")
+        security_log.submit("security", logging.WARNING, "RATE_LIMIT_EXCEEDED", event_data)
     
     @staticmethod
     def get_client_ip(request: Request) -> str:
-        """Safely extract client IP from request"""
-        # Check for forwarded IPs (behind proxy/load balancer)
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            # Take the first IP in the chain
-            return forwarded_for.split(",")[0].strip()
-        
-        # Check for real IP header
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip.strip()
-        
-        # Fall back to direct client
-        return getattr(request.client, 'host', 'unknown')
\ No newline at end of file
+        """Safely extract client IP from request, trusting only the configured proxy hops"""
+        from app.core.security_config import get_client_ip
+        return get_client_ip(request)
\ No newline at end of file
@@ -2,334 +2,274 @@
 Advanced Security Middleware for Arbify
 =====================================
 
-Comprehensive security middleware including:
-- HTTPS enforcement
-- Security headers
-- Rate limiting
+One pure-ASGI middleware for the whole security layer:
+- Health check fast path (/health, /status, /healthz pass straight through)
+- Trusted host check (production)
+- HTTPS enforcement (production)
+- Blocked IPs and suspicious user agents
+- Rate limiting (GCRA engine in app/core/rate_limiter.py) and blocking of IPs
+  that keep exceeding it
+- Security headers, precomputed once as raw ASGI header pairs
 - Request monitoring
-- Threat detection
+
+Unlike BaseHTTPMiddleware it adds no extra task or response stream per request,
+and the request headers are scanned once - client IP, user agent, host and
+forwarded proto all come from that single pass.
 """
 
-import time
-import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Set
+import math
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
 from collections import defaultdict, deque
-from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-
-from security_config import (
-    security_config, SSL_CONFIG, SECURITY_HEADERS, MONITORING_CONFIG,
-    get_client_ip, is_suspicious_request, SECURITY_EVENTS
+from fastapi import status
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from app.core.rate_limiter import CATEGORY_RATES, DEFAULT_CATEGORY, GLOBAL_RATE, endpoint_category, rate_limiter
+from app.core.security_config import (
+    SECURITY_AUTO_BLOCK_SECONDS, SECURITY_HEADERS, MONITORING_CONFIG, client_ip_from_headers, is_suspicious_user_agent
 )
+from app.core.ip_blocklist import IPBlocklist, ip_blocklist
+from app.core.security_logger import SECURITY_API_LOG_SAMPLE_RATE, security_log
 
 # Security logger
 security_logger = logging.getLogger("security.middleware")
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Comprehensive security middleware"""
-    
-    def __init__(self, app, environment: str = "development"):
-        super().__init__(app)
+# CRITICAL: Always allow health checks to pass through without any security checks
+HEALTH_PATHS = frozenset({"/status", "/health", "/healthz"})
+# Never rate limited (health checks and the root probe)
+RATE_LIMIT_EXEMPT_PATHS = HEALTH_PATHS | {"/"}
+
+# Request headers the middleware reads; everything else is skipped in the single scan
+_READ_HEADERS = frozenset({
+    b"x-forwarded-for", b"x-real-ip", b"cf-connecting-ip", b"x-forwarded-proto", b"user-agent", b"host",
+})
+
+class SecurityMiddleware:
+    """Comprehensive security middleware (pure ASGI)"""
+
+    def __init__(self, app, environment: str = "development", allowed_hosts: Optional[Iterable[str]] = None, limiter=None,
+                 blocklist: Optional[IPBlocklist] = None):
+        self.app = app
         self.environment = environment
         self.is_production = environment == "production"
-        
-        # Rate limiting storage (in production, use Redis)
-        self.rate_limit_storage: Dict[str, deque] = defaultdict(lambda: deque())
-        self.blocked_ips: Set[str] = set()
+        self.limiter = limiter or rate_limiter
+        self.allowed_hosts = list(allowed_hosts) if allowed_hosts else None
+
+        self.blocklist = blocklist if blocklist is not None else ip_blocklist  # shared with SecurityMonitor
         self.suspicious_ips: Dict[str, int] = defaultdict(int)
-        
+
         # Security event tracking
         self.security_events: deque = deque(maxlen=1000)
-        
-    async def dispatch(self, request: Request, call_next):
-        """Main middleware handler"""
-        start_time = time.time()
-        client_ip = get_client_ip(request)
-        
+
+        # Response headers, encoded once
+        headers = dict(SECURITY_HEADERS.get(environment, SECURITY_HEADERS["development"]))
+        headers["Server"] = "Arbify/1.0"  # Hide server details
+        headers["X-Powered-By"] = ""  # Remove framework info
+        self._security_headers: List[Tuple[bytes, bytes]] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()
+        ]
+        self._security_header_names = frozenset(name for name, _ in self._security_headers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in HEALTH_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        path = scope["path"]
+        request_headers = {}
+        for name, value in scope["headers"]:
+            if name in _READ_HEADERS and name not in request_headers:
+                request_headers[name.decode("latin-1")] = value.decode("latin-1")
+        peer = scope.get("client")
+        client_ip = client_ip_from_headers(request_headers, peer[0] if peer else "unknown")
+        user_agent = request_headers.get("user-agent", "")
+
+        response_status = 0
+
+        async def send_with_headers(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                headers = [h for h in message.get("headers", []) if h[0].lower() not in self._security_header_names]
+                headers.extend(self._security_headers)
+                # Add timestamp for debugging (non-production only)
+                if not self.is_production:
+                    headers.append((b"x-response-time", datetime.utcnow().isoformat().encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        # 1. Trusted hosts
+        if self.allowed_hosts is not None and not self._is_allowed_host(request_headers.get("host", "")):
+            await PlainTextResponse("Invalid host header", status_code=400)(scope, receive, send_with_headers)
+            return
+
+        # 2. HTTPS Enforcement
+        if self.is_production and not self._is_https(scope, request_headers):
+            await self._redirect_to_https(scope, request_headers)(scope, receive, send_with_headers)
+            return
+
+        # CRITICAL: Relax security for API endpoints to avoid blocking legitimate requests
+        is_api_request = path.startswith("/api/")
+
+        # 3. IP Blocking Check (only for non-API requests or already blocked IPs)
+        if not is_api_request and self.blocklist.is_blocked(client_ip):
+            self._log_security_event("BLOCKED_IP_ACCESS", client_ip, scope, user_agent)
+            await JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Access denied"})(scope, receive, send_with_headers)
+            return
+
+        # 4. Suspicious Request Detection (relaxed for API endpoints)
+        if not is_api_request and is_suspicious_user_agent(user_agent):
+            self._handle_suspicious_request(client_ip, scope, user_agent)
+
+        # 5. Rate Limiting
+        if path not in RATE_LIMIT_EXEMPT_PATHS:
+            limited = await self._check_rate_limit(client_ip, path, scope["method"])
+            if limited is not None:
+                self._record_rate_limit_violation(client_ip, scope, user_agent)
+                await limited(scope, receive, send_with_headers)
+                return
+
+        # 6. Process Request
         try:
-            # CRITICAL: Always allow health checks to pass through without any security checks
-            if request.url.path in ["/status", "/health", "/healthz"]:
-                response = await call_next(request)
-                return response
-            
-            # CRITICAL: Relax security for API endpoints to avoid blocking legitimate requests
-            is_api_request = request.url.path.startswith("/api/")
-        
-            # 1. HTTPS Enforcement
-            if self.is_production and not self._is_https(request):
-                return self._redirect_to_https(request)
-            
-            # 2. IP Blocking Check (only for non-API requests or already blocked IPs)
-            if client_ip in self.blocked_ips and not is_api_request:
-                self._log_security_event("BLOCKED_IP_ACCESS", client_ip, request)
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied"
-                )
-            
-            # 3. Suspicious Request Detection (relaxed for API endpoints)
-            if is_suspicious_request(request) and not is_api_request:
-                self._handle_suspicious_request(client_ip, request)
-            
-            # 4. Rate Limiting
-            if not self._check_rate_limit(client_ip, request):
-                self._log_security_event("RATE_LIMIT_EXCEEDED", client_ip, request)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded"
-                )
-            
-            # 5. Process Request
-            response = await call_next(request)
-            
-            # 6. Add Security Headers
-            self._add_security_headers(response)
-            
-            # 7. Log Request (if monitoring enabled)
-            if MONITORING_CONFIG["log_api_calls"]:
-                self._log_api_call(request, response, time.time() - start_time)
-            
-            return response
-            
-        except HTTPException as e:
-            # Handle known exceptions with proper security logging
-            self._log_security_event("HTTP_EXCEPTION", client_ip, request, {
-                "status_code": e.status_code,
-                "detail": str(e.detail)
-            })
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"detail": e.detail}
-            )
+            await self.app(scope, receive, send_with_headers)
         except Exception as e:
             # Handle unexpected exceptions
-            self._log_security_event("INTERNAL_ERROR", client_ip, request, {
-                "error": str(e)
-            })
+            self._log_security_event("INTERNAL_ERROR", client_ip, scope, user_agent, {"error": str(e)})
             security_logger.error(f"Unexpected error in security middleware: {str(e)}")
-            return JSONResponse(
+            if response_status:
+                raise
+            await JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"detail": "Internal server error"}
-            )
-    
-    def _is_https(self, request: Request) -> bool:
+            )(scope, receive, send_with_headers)
+            return
+
+        # 7. Log Request (if monitoring enabled)
+        if MONITORING_CONFIG["log_api_calls"]:
+            self._log_api_call(scope, response_status, time.perf_counter() - start_time, client_ip, user_agent)
+
+    def _is_allowed_host(self, host_header: str) -> bool:
+        host = host_header.split(":")[0]
+        for pattern in self.allowed_hosts:
+            if host == pattern or (pattern.startswith("*") and host.endswith(pattern[1:])):
+                return True
+        return False
+
+    def _is_https(self, scope, request_headers: Dict[str, str]) -> bool:
         """Check if request is using HTTPS"""
         # Check direct HTTPS
-        if request.url.scheme == "https":
+        if scope.get("scheme") == "https":
             return True
-        
+
         # Check proxy headers (for load balancers)
-        proto = request.headers.get("x-forwarded-proto")
+        proto = request_headers.get("x-forwarded-proto")
         if proto and proto.lower() == "https":
             return True
-        
-        return False
-    
-    def _redirect_to_https(self, request: Request) -> Response:
+
+        # Railway health checks and internal requests, and local requests
+        user_agent = request_headers.get("user-agent", "").lower()
+        if "railway" in user_agent or "healthcheck" in user_agent:
+            return True
+        return request_headers.get("host", "").split(":")[0] in ("localhost", "127.0.0.1")
+
+    def _redirect_to_https(self, scope, request_headers: Dict[str, str]) -> JSONResponse:
         """Redirect HTTP to HTTPS"""
-        https_url = str(request.url).replace("http://", "https://", 1)
+        query = scope.get("query_string", b"").decode("latin-1")
+        https_url = f"https://{request_headers.get('host', '')}{scope.get('root_path', '')}{scope['path']}" + (f"?{query}" if query else "")
         return JSONResponse(
             status_code=status.HTTP_301_MOVED_PERMANENTLY,
             content={"detail": "Redirecting to HTTPS"},
             headers={"Location": https_url}
         )
-    
-    def _check_rate_limit(self, client_ip: str, request: Request) -> bool:
-        """Check if request exceeds rate limits"""
-        endpoint = self._get_endpoint_category(request)
-        
-        # Get rate limit for endpoint (default to general)
-        from security_config import RATE_LIMITS
-        rate_limit = RATE_LIMITS.get(endpoint, RATE_LIMITS["api_general"])
-        
-        # Parse rate limit (e.g., "10/minute")
-        try:
-            limit, period = rate_limit.split("/")
-            limit = int(limit)
-            
-            if period == "minute":
-                window = 60
-            elif period == "hour":
-                window = 3600
-            elif period == "day":
-                window = 86400
-            else:
-                window = 60  # default to minute
-                
-        except (ValueError, IndexError):
-            # Invalid rate limit format, allow request
-            return True
-        
-        # Check rate limit
-        now = time.time()
-        key = f"{client_ip}:{endpoint}"
-        
-        # Clean old entries
-        while (self.rate_limit_storage[key] and 
-               self.rate_limit_storage[key][0] < now - window):
-            self.rate_limit_storage[key].popleft()
-        
-        # Check if limit exceeded
-        if len(self.rate_limit_storage[key]) >= limit:
-            # Track excessive requests
-            self.suspicious_ips[client_ip] += 1
-            
-            # Block IP if too many violations
-            if self.suspicious_ips[client_ip] > 10:
-                self.blocked_ips.add(client_ip)
-                security_logger.warning(f"Blocked IP due to excessive rate limit violations: {client_ip}")
-            
-            return False
-        
-        # Add current request
-        self.rate_limit_storage[key].append(now)
-        return True
-    
-    def _get_endpoint_category(self, request: Request) -> str:
-        """Categorize endpoint for rate limiting"""
-        path = request.url.path.lower()
-        
-        if "/api/auth/register" in path:
-            return "auth_register"
-        elif "/api/auth/token" in path or "/api/auth/login" in path:
-            return "auth_login"
-        elif "/api/auth/password" in path:
-            return "auth_password_reset"
-        elif "/api/odds" in path:
-            return "api_odds"
-        elif "/api/arbitrage" in path:
-            return "api_arbitrage"
-        elif "/api/my-arbitrage" in path and request.method == "POST":
-            return "api_save_arbitrage"
-        elif "/api/subscription" in path:
-            return "api_subscription"
-        elif "/api/auth/user/profile" in path:
-            return "api_user_profile"
-        elif "/admin" in path:
-            return "admin"
-        else:
-            return "api_general"
-    
-    def _handle_suspicious_request(self, client_ip: str, request: Request):
+
+    async def _check_rate_limit(self, client_ip: str, path: str, method: str) -> Optional[JSONResponse]:
+        """Per-IP overall budget, then the endpoint category's budget; a 429 response when exceeded"""
+        decision = await self.limiter.hit(("all", client_ip), GLOBAL_RATE)
+        detail = f"Rate limit exceeded ({GLOBAL_RATE.limit}/min)"
+        if decision.allowed:
+            category = endpoint_category(path, method)
+            rate = CATEGORY_RATES.get(category) or CATEGORY_RATES[DEFAULT_CATEGORY]
+            decision = await self.limiter.hit((category, client_ip), rate)
+            detail = f"Rate limit exceeded for {category}"
+        if decision.allowed:
+            return None
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"error": "Too Many Requests", "detail": detail},
+            headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))}
+        )
+
+    def _record_rate_limit_violation(self, client_ip: str, scope, user_agent: str):
+        """Block IPs that keep hitting the limits"""
+        self._log_security_event("RATE_LIMIT_EXCEEDED", client_ip, scope, user_agent)
+        self.suspicious_ips[client_ip] += 1
+
+        # Block IP if too many violations
+        if self.suspicious_ips[client_ip] > 10:
+            self._auto_block(client_ip, "Excessive rate limit violations")
+
+    def _handle_suspicious_request(self, client_ip: str, scope, user_agent: str):
         """Handle potentially suspicious requests"""
         self.suspicious_ips[client_ip] += 1
-        
-        self._log_security_event("SUSPICIOUS_REQUEST", client_ip, request, {
-            "user_agent": request.headers.get("user-agent", ""),
+
+        self._log_security_event("SUSPICIOUS_REQUEST", client_ip, scope, user_agent, {
+            "user_agent": user_agent,
             "suspicious_count": self.suspicious_ips[client_ip]
         })
-        
+
         # Block IP if too many suspicious requests
         if self.suspicious_ips[client_ip] > 5:
-            self.blocked_ips.add(client_ip)
-            security_logger.warning(f"Blocked suspicious IP: {client_ip}")
-    
-    def _add_security_headers(self, response: Response):
-        """Add comprehensive security headers"""
-        headers = SECURITY_HEADERS.get(self.environment, SECURITY_HEADERS["development"])
-        
-        for header, value in headers.items():
-            response.headers[header] = value
-        
-        # Add additional security headers
-        response.headers["Server"] = "Arbify/1.0"  # Hide server details
-        response.headers["X-Powered-By"] = ""  # Remove framework info
-        
-        # Add timestamp for debugging (non-production only)
-        if not self.is_production:
-            response.headers["X-Response-Time"] = str(datetime.utcnow().isoformat())
-    
-    def _log_security_event(self, event_type: str, client_ip: str, request: Request, extra_data: Dict = None):
+            self._auto_block(client_ip, "Suspicious requests")
+
+    def _auto_block(self, client_ip: str, reason: str):
+        """Temporary block - permanent ones are left to the monitor and admins"""
+        self.blocklist.block(client_ip, reason=reason, duration=SECURITY_AUTO_BLOCK_SECONDS, source="middleware")
+        # Start counting afresh once the block expires
+        self.suspicious_ips.pop(client_ip, None)
+        security_logger.warning(f"Blocked IP for {SECURITY_AUTO_BLOCK_SECONDS}s ({reason}): {client_ip}")
+
+    def _log_security_event(self, event_type: str, client_ip: str, scope, user_agent: str, extra_data: Dict = None):
         """Log security events"""
         event_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "event_type": event_type,
             "client_ip": client_ip,
-            "user_agent": request.headers.get("user-agent", ""),
-            "path": request.url.path,
-            "method": request.method,
-            "query_params": str(request.query_params),
+            "user_agent": user_agent,
+            "path": scope["path"],
+            "method": scope["method"],
+            "query_params": scope.get("query_string", b"").decode("latin-1"),
         }
-        
+
         if extra_data:
             event_data.update(extra_data)
-        
+
         # Store in memory (in production, send to SIEM)
         self.security_events.append(event_data)
-        
-        # Log to file/stdout
-        security_logger.warning(f"SECURITY_EVENT: {json.dumps(event_data)}")
-    
-    def _log_api_call(self, request: Request, response: Response, duration: float):
+
+        # Log to file/stdout (queued)
+        security_log.submit(security_logger.name, logging.WARNING, "SECURITY_EVENT", event_data)
+
+    def _log_api_call(self, scope, status_code: int, duration: float, client_ip: str, user_agent: str):
         """Log API calls for monitoring"""
         if self.environment == "development":
             # More verbose logging in development
             log_data = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
+                "timestamp": datetime.utcnow(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "category": endpoint_category(scope["path"], scope["method"]),
+                "status_code": status_code,
                 "duration_ms": round(duration * 1000, 2),
-                "client_ip": get_client_ip(request),
-                "user_agent": request.headers.get("user-agent", "")[:100],  # Truncate
+                "client_ip": client_ip,
+                "user_agent": user_agent[:100],  # Truncate
             }
-            security_logger.info(f"API_CALL: {json.dumps(log_data)}")
-
-class HTTPSRedirectMiddleware(BaseHTTPMiddleware):
-    """Simple HTTPS redirect middleware for production"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # CRITICAL: Allow Railway health checks to pass through
-        if request.url.path in ["/status", "/health", "/healthz"]:
-            # Always allow health check endpoints without HTTPS redirect
-            response = await call_next(request)
-            return response
-        
-        # Check for Railway internal requests (they often come from internal IPs)
-        user_agent = request.headers.get("user-agent", "").lower()
-        if "railway" in user_agent or "healthcheck" in user_agent:
-            response = await call_next(request)
-            return response
-        
-        if (request.url.scheme != "https" and 
-            request.headers.get("x-forwarded-proto") != "https" and
-            request.url.hostname not in ["localhost", "127.0.0.1"]):
-            
-            # Redirect to HTTPS
-            https_url = str(request.url).replace("http://", "https://", 1)
-            return JSONResponse(
-                status_code=status.HTTP_301_MOVED_PERMANENTLY,
-                content={"message": "Redirecting to HTTPS"},
-                headers={"Location": https_url}
-            )
-        
-        response = await call_next(request)
-        return response
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Lightweight security headers middleware"""
-    
-    def __init__(self, app, environment: str = "development"):
-        super().__init__(app)
-        self.environment = environment
-    
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Add security headers
-        headers = SECURITY_HEADERS.get(self.environment, SECURITY_HEADERS["development"])
-        for header, value in headers.items():
-            response.headers[header] = value
-        
-        return response
+            security_log.submit(security_logger.name, logging.INFO, "API_CALL", log_data, SECURITY_API_LOG_SAMPLE_RATE)
 
 # Export middleware classes
 __all__ = [
-    'SecurityMiddleware', 
-    'HTTPSRedirectMiddleware', 
-    'SecurityHeadersMiddleware'
+    'SecurityMiddleware',
+    'HEALTH_PATHS',
 ]
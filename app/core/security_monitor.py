@@ -7,21 +7,30 @@ Comprehensive security monitoring including:
 - Security event aggregation
 - Automated incident response
 - Security metrics dashboard
+
+Threat rules and the dashboard read from indexes maintained as events arrive,
+never by scanning the event log:
+- EventWindowIndex keeps a timestamp deque per (ip, event_type), trimmed to the
+  longest rule window for that type, so a rule's window count is O(1) amortised
+- per-IP high/critical counts and the 24h threat-level counts are updated on
+  append and on expiry/eviction from the 10k event log
 """
 
 import os
-import json
-import asyncio
+import heapq
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from collections import defaultdict, deque
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from collections import Counter, OrderedDict, defaultdict, deque
 from dataclasses import dataclass, asdict
 from enum import Enum
 
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.responses import JSONResponse
 
+from app.core.ip_blocklist import IPBlocklist, ip_blocklist
+from app.core.security_logger import security_log
+
 # Security logger
 security_logger = logging.getLogger("security.monitor")
 
@@ -69,19 +78,95 @@ class SecurityIncident:
     mitigation_actions: List[str]
     resolved_at: Optional[datetime] = None
 
+class EventWindowIndex:
+    """Recent event timestamps per (ip, event_type), for sliding-window counts.
+
+    Each key keeps only timestamps within its event type's retention (the
+    longest rule window for that type), so trimming is amortised O(1) per
+    event and a count over the retention window is len(). Keys are kept in
+    least-recently-updated order; idle keys are swept from the old end.
+    """
+
+    def __init__(self, retention: Dict[str, int]):
+        self.retention = {event_type: timedelta(seconds=seconds) for event_type, seconds in retention.items()}
+        self._windows: "OrderedDict[Tuple[str, str], deque]" = OrderedDict()
+
+    def add(self, source_ip: str, event_type: str, timestamp: datetime):
+        retention = self.retention.get(event_type)
+        if retention is None:
+            return  # No rule counts this event type
+        key = (source_ip, event_type)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = deque()
+        else:
+            self._windows.move_to_end(key)
+        window.append(timestamp)
+        self._trim(window, timestamp - retention)
+        self._sweep(timestamp)
+
+    def count(self, source_ip: str, event_type: str, window_seconds: int, now: datetime) -> int:
+        window = self._windows.get((source_ip, event_type))
+        if not window:
+            return 0
+        cutoff = now - timedelta(seconds=window_seconds)
+        retention = self.retention.get(event_type)
+        if retention is not None and window_seconds >= retention.total_seconds():
+            self._trim(window, cutoff)
+            return len(window)
+        # Shorter than the retention: walk back from the newest entry
+        count = 0
+        for timestamp in reversed(window):
+            if timestamp <= cutoff:
+                break
+            count += 1
+        return count
+
+    @staticmethod
+    def _trim(window: deque, cutoff: datetime):
+        while window and window[0] <= cutoff:
+            window.popleft()
+
+    def _sweep(self, now: datetime, limit: int = 2):
+        """Drop keys whose newest event is past retention (bounded work per call)"""
+        for _ in range(limit):
+            if not self._windows:
+                return
+            (source_ip, event_type), window = next(iter(self._windows.items()))
+            if window and window[-1] > now - self.retention[event_type]:
+                return
+            self._windows.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
 class SecurityMonitor:
     """Real-time security monitoring system"""
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow, blocklist: Optional[IPBlocklist] = None):
+        self._clock = clock
         self.events: deque = deque(maxlen=10000)  # Keep last 10k events
         self.incidents: Dict[str, SecurityIncident] = {}
         self.metrics: Dict[str, Any] = defaultdict(int)
-        self.blocked_ips: set = set()
+        self.blocklist = blocklist if blocklist is not None else ip_blocklist  # shared with SecurityMiddleware
         self.suspicious_ips: Dict[str, int] = defaultdict(int)
         
         # Threat detection rules
         self.setup_threat_rules()
         
+        # Incrementally maintained views (see module docstring)
+        retention: Dict[str, int] = {}
+        for rule in self.threat_rules.values():
+            retention[rule["pattern"]] = max(retention.get(rule["pattern"], 0), rule["window"])
+        self.windows = EventWindowIndex(retention)
+        self._rules_by_pattern: Dict[str, List[Tuple[str, Dict]]] = defaultdict(list)
+        for rule_name, rule in self.threat_rules.items():
+            self._rules_by_pattern[rule["pattern"]].append((rule_name, rule))
+        self._threat_source_counts: Counter = Counter()  # high/critical events per IP in self.events
+        self._recent_events: deque = deque()  # suffix of self.events within the last 24h
+        self._recent_threat_levels: Counter = Counter()
+        self._active_incidents: set = set()
+        
         # Start background monitoring
         self.monitoring_active = True
     
@@ -148,9 +233,10 @@ class SecurityMonitor:
                   user_id: int = None, threat_level: ThreatLevel = ThreatLevel.LOW):
         """Log a security event"""
         
+        now = self._clock()
         event = SecurityEvent(
-            id=f"evt_{len(self.events)}_{int(datetime.utcnow().timestamp())}",
-            timestamp=datetime.utcnow(),
+            id=f"evt_{len(self.events)}_{int(now.timestamp())}",
+            timestamp=now,
             event_type=event_type,
             threat_level=threat_level,
             source_ip=source_ip,
@@ -161,21 +247,51 @@ class SecurityMonitor:
             user_id=user_id
         )
         
-        self.events.append(event)
+        self._append_event(event)
         self.metrics[f"event_{event_type}"] += 1
         self.metrics["total_events"] += 1
         
-        # Log to file
-        security_logger.info(f"SECURITY_EVENT: {json.dumps(asdict(event), default=str)}")
+        # Log to file (encoded and written off the request path)
+        record = dict(vars(event))
+        record["metadata"] = dict(event.metadata)
+        security_log.submit(security_logger.name, logging.INFO, "SECURITY_EVENT", record)
         
         # Check for threats
         self.check_threat_rules(event)
         
         return event.id
     
+    def _append_event(self, event: SecurityEvent):
+        """Append to the event log and update every index, including for the evicted oldest event"""
+        if len(self.events) == self.events.maxlen:
+            self._forget_event(self.events[0])
+        self.events.append(event)
+        
+        self.windows.add(event.source_ip, event.event_type, event.timestamp)
+        if event.threat_level in (ThreatLevel.HIGH, ThreatLevel.CRITICAL):
+            self._threat_source_counts[event.source_ip] += 1
+        self._recent_events.append(event)
+        self._recent_threat_levels[event.threat_level.value] += 1
+        self._expire_recent(event.timestamp)
+    
+    def _forget_event(self, event: SecurityEvent):
+        if event.threat_level in (ThreatLevel.HIGH, ThreatLevel.CRITICAL):
+            self._threat_source_counts[event.source_ip] -= 1
+            if self._threat_source_counts[event.source_ip] <= 0:
+                del self._threat_source_counts[event.source_ip]
+        if self._recent_events and self._recent_events[0] is event:
+            self._recent_events.popleft()
+            self._recent_threat_levels[event.threat_level.value] -= 1
+    
+    def _expire_recent(self, now: datetime):
+        cutoff = now - timedelta(seconds=86400)
+        while self._recent_events and self._recent_events[0].timestamp <= cutoff:
+            expired = self._recent_events.popleft()
+            self._recent_threat_levels[expired.threat_level.value] -= 1
+    
     def check_threat_rules(self, event: SecurityEvent):
         """Check if event triggers any threat detection rules"""
-        for rule_name, rule in self.threat_rules.items():
+        for rule_name, rule in self._rules_by_pattern.get(event.event_type, ()):
             if self.matches_pattern(event, rule["pattern"]):
                 # Count occurrences in time window
                 count = self.count_events_in_window(
@@ -193,24 +309,24 @@ class SecurityMonitor:
     
     def count_events_in_window(self, source_ip: str, pattern: str, window_seconds: int) -> int:
         """Count events from an IP matching pattern in time window"""
-        cutoff = datetime.utcnow() - timedelta(seconds=window_seconds)
+        if pattern in self.windows.retention:
+            return self.windows.count(source_ip, pattern, window_seconds, self._clock())
         
-        count = 0
-        for event in self.events:
-            if (event.source_ip == source_ip and 
-                event.event_type == pattern and 
-                event.timestamp > cutoff):
-                count += 1
-        
-        return count
+        # Event types no rule watches are not indexed - scan the log
+        cutoff = self._clock() - timedelta(seconds=window_seconds)
+        return sum(
+            1 for event in self.events
+            if event.source_ip == source_ip and event.event_type == pattern and event.timestamp > cutoff
+        )
     
     def trigger_incident(self, rule_name: str, triggering_event: SecurityEvent, rule: Dict):
         """Trigger a security incident"""
-        incident_id = f"inc_{rule_name}_{int(datetime.utcnow().timestamp())}"
+        now = self._clock()
+        incident_id = f"inc_{rule_name}_{int(now.timestamp())}"
         
         incident = SecurityIncident(
             id=incident_id,
-            created_at=datetime.utcnow(),
+            created_at=now,
             incident_type=rule_name,
             threat_level=rule["threat_level"],
             status=IncidentStatus.OPEN,
@@ -222,12 +338,13 @@ class SecurityMonitor:
         )
         
         self.incidents[incident_id] = incident
+        self._active_incidents.add(incident_id)
         
         # Execute automated response
         self.execute_response_action(incident, rule["action"], triggering_event)
         
         # Log incident
-        security_logger.warning(f"SECURITY_INCIDENT: {json.dumps(asdict(incident), default=str)}")
+        security_log.submit(security_logger.name, logging.WARNING, "SECURITY_INCIDENT", asdict(incident))
         
         return incident_id
     
@@ -255,57 +372,31 @@ class SecurityMonitor:
             incident.mitigation_actions.append("Security team alerted")
     
     def block_ip(self, ip: str, reason: str = "Security violation"):
-        """Permanently block an IP address"""
-        self.blocked_ips.add(ip)
+        """Permanently block an IP address (or CIDR range)"""
+        self.blocklist.block(ip, reason=reason, source="monitor")
         security_logger.warning(f"IP blocked: {ip} - Reason: {reason}")
     
     def temporary_block_ip(self, ip: str, duration: int):
-        """Temporarily block an IP address"""
-        # In production, implement with Redis/cache with TTL
-        self.blocked_ips.add(ip)
-        
-        # Schedule unblock (simplified)
-        async def unblock_later():
-            await asyncio.sleep(duration)
-            if ip in self.blocked_ips:
-                self.blocked_ips.remove(ip)
-                security_logger.info(f"Temporary block expired for IP: {ip}")
-        
-        asyncio.create_task(unblock_later())
+        """Temporarily block an IP address - lifted by the blocklist's expiry queue"""
+        self.blocklist.block(ip, reason="Temporary block", duration=duration, source="monitor")
         security_logger.warning(f"IP temporarily blocked: {ip} for {duration}s")
     
     def is_ip_blocked(self, ip: str) -> bool:
         """Check if an IP is blocked"""
-        return ip in self.blocked_ips
+        return self.blocklist.is_blocked(ip)
     
     def get_security_metrics(self) -> Dict[str, Any]:
         """Get comprehensive security metrics"""
-        now = datetime.utcnow()
-        
-        # Recent events (last 24 hours)
-        recent_events = [
-            e for e in self.events 
-            if (now - e.timestamp).total_seconds() < 86400
-        ]
-        
-        # Active incidents
-        active_incidents = [
-            i for i in self.incidents.values()
-            if i.status in [IncidentStatus.OPEN, IncidentStatus.INVESTIGATING]
-        ]
-        
-        # Threat level distribution
-        threat_levels = defaultdict(int)
-        for event in recent_events:
-            threat_levels[event.threat_level.value] += 1
+        now = self._clock()
+        self._expire_recent(now)
         
         return {
             "total_events": len(self.events),
-            "recent_events_24h": len(recent_events),
-            "active_incidents": len(active_incidents),
-            "blocked_ips": len(self.blocked_ips),
+            "recent_events_24h": len(self._recent_events),
+            "active_incidents": len(self._active_incidents),
+            "blocked_ips": len(self.blocklist),
             "suspicious_ips": len(self.suspicious_ips),
-            "threat_levels": dict(threat_levels),
+            "threat_levels": {level: count for level, count in self._recent_threat_levels.items() if count > 0},
             "top_threat_sources": self.get_top_threat_sources(),
             "metrics": dict(self.metrics),
             "last_updated": now.isoformat()
@@ -313,17 +404,11 @@ class SecurityMonitor:
     
     def get_top_threat_sources(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top threat source IPs"""
-        ip_counts = defaultdict(int)
-        
-        for event in self.events:
-            if event.threat_level in [ThreatLevel.HIGH, ThreatLevel.CRITICAL]:
-                ip_counts[event.source_ip] += 1
-        
-        sorted_ips = sorted(ip_counts.items(), key=lambda x: x[1], reverse=True)
+        top = heapq.nlargest(limit, self._threat_source_counts.items(), key=lambda x: x[1])
         
         return [
             {"ip": ip, "threat_count": count}
-            for ip, count in sorted_ips[:limit]
+            for ip, count in top
         ]
     
     def get_recent_incidents(self, hours: int = 24) -> List[Dict[str, Any]]:
@@ -342,7 +427,8 @@ class SecurityMonitor:
         if incident_id in self.incidents:
             incident = self.incidents[incident_id]
             incident.status = IncidentStatus.RESOLVED
-            incident.resolved_at = datetime.utcnow()
+            incident.resolved_at = self._clock()
+            self._active_incidents.discard(incident_id)
             
             if resolution_notes:
                 incident.mitigation_actions.append(f"Resolution: {resolution_notes}")
@@ -385,16 +471,17 @@ async def resolve_incident(incident_id: str, resolution_notes: str = ""):
 @router.get("/blocked-ips")
 async def get_blocked_ips():
     """Get list of blocked IPs"""
+    entries = security_monitor.blocklist.entries()
     return {
-        "blocked_ips": list(security_monitor.blocked_ips),
-        "count": len(security_monitor.blocked_ips)
+        "blocked_ips": [entry.to_dict() for entry in entries],
+        "count": len(entries),
+        "stats": security_monitor.blocklist.stats()
     }
 
 @router.post("/unblock-ip")
 async def unblock_ip(ip: str):
     """Manually unblock an IP address"""
-    if ip in security_monitor.blocked_ips:
-        security_monitor.blocked_ips.remove(ip)
+    if security_monitor.blocklist.unblock(ip):
         security_logger.info(f"IP manually unblocked: {ip}")
         return {"message": f"IP {ip} unblocked successfully"}
     else:
@@ -440,6 +527,7 @@ def is_ip_blocked(ip: str) -> bool:
 # Export classes and functions
 __all__ = [
     'SecurityMonitor',
+    'EventWindowIndex',
     'security_monitor',
     'ThreatLevel',
     'IncidentStatus',
@@ -12,12 +12,14 @@ load_dotenv()
 
 # Avoid circular imports by checking environment directly
 DEV_MODE = os.getenv("ENVIRONMENT", "development") == "development"
+# bcrypt cost for new hashes; stored hashes with another cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
 
 # Create password context with bcrypt - handle version compatibility issues
 
 try:
     # Try creating context normally first
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 except Exception as e:
     print(f"⚠️ Bcrypt context creation failed: {str(e)}")
     try:
@@ -45,6 +47,15 @@ def hash_password(password: str) -> str:
         password = password_bytes[:72].decode('utf-8', errors='ignore')
     return pwd_context.hash(password)
 
+def needs_rehash(hashed_password: str) -> bool:
+    """True for legacy SHA-256 hashes and bcrypt hashes made with another cost"""
+    if not hashed_password.startswith(('$2b$', '$2a$', '$2y$')):
+        return True
+    try:
+        return int(hashed_password[4:6]) != BCRYPT_ROUNDS
+    except ValueError:
+        return True
+
 def verify_legacy_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against legacy SHA-256 hash"""
     try:
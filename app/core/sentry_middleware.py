@@ -7,6 +7,8 @@ from fastapi.responses import JSONResponse
 import time
 import logging
 
+from app.core.tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 async def sentry_middleware(request: Request, call_next):
@@ -20,12 +22,16 @@ async def sentry_middleware(request: Request, call_next):
         # Add request information
         scope.set_tag("request_method", request.method)
         scope.set_tag("request_path", request.url.path)
+        # Only the headers worth having on an error report - copying them all costs on every request
         scope.set_context("request", {
             "url": str(request.url),
             "method": request.method,
-            "headers": dict(request.headers),
+            "user_agent": request.headers.get("user-agent"),
             "query_params": dict(request.query_params)
         })
+        trace_id = tracer.current_span().trace_id
+        if trace_id:
+            scope.set_tag("trace_id", trace_id)
         
         # Add user information if available
         if hasattr(request.state, 'user') and request.state.user:
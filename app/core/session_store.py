@@ -0,0 +1,328 @@
+# session_store.py
+"""
+Refresh-token sessions and user revocations, indexed for cheap expiry.
+
+MemorySessionStore keeps three views of the same sessions:
+- by jti (the session record itself)
+- by user (set of jtis), so listing or revoking a user's sessions touches
+  only that user's sessions
+- by expiry bucket - a timing wheel of SESSION_EXPIRY_BUCKET_SECONDS slots
+  with a heap of occupied slots - so expire() pops only the slots that are
+  due and its cost is proportional to the sessions actually expired
+
+A session expires when it has been idle for SESSION_IDLE_SECONDS or reaches
+the refresh token's own expiry, whichever comes first; using it moves it to
+a later slot.
+
+"Revoke all" also records a per-user cutoff: access tokens issued before it
+are rejected until they would have expired anyway.
+
+RedisSessionStore keeps the same data in Redis (REDIS_URL, SESSION_STORE_SHARED)
+so sessions and revocations survive restarts and are shared by every worker;
+Redis key TTLs do the expiry. If Redis is unreachable the worker falls back
+to its local store, like the rate limiter.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", 86400))
+SESSION_EXPIRY_BUCKET_SECONDS = int(os.getenv("SESSION_EXPIRY_BUCKET_SECONDS", 60))
+SESSION_STORE_SHARED = os.getenv("SESSION_STORE_SHARED", "true").lower() == "true"
+
+_DATETIME_FIELDS = ("created", "last_used")
+
+
+class MemorySessionStore:
+    """In-process sessions indexed by jti, by user and by expiry slot"""
+
+    def __init__(self, bucket_seconds: int = SESSION_EXPIRY_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._slot_of: Dict[str, int] = {}
+        self._slots: Dict[int, Set[str]] = {}
+        self._slot_heap: List[int] = []
+        self._revoked_before: Dict[str, tuple] = {}
+        self._revoked_heap: List[tuple] = []
+        self._lock = threading.RLock()
+
+        self.expired = 0
+
+    def _slot(self, expires_at: datetime) -> int:
+        # Rounded up, so a session is never dropped before its expiry
+        return math.ceil(expires_at.timestamp() / self.bucket_seconds)
+
+    def _schedule(self, jti: str, expires_at: datetime):
+        slot = self._slot(expires_at)
+        old = self._slot_of.get(jti)
+        if old == slot:
+            return
+        if old is not None:
+            self._unschedule(jti, old)
+        members = self._slots.get(slot)
+        if members is None:
+            members = self._slots[slot] = set()
+            heapq.heappush(self._slot_heap, slot)
+        members.add(jti)
+        self._slot_of[jti] = slot
+
+    def _unschedule(self, jti: str, slot: int):
+        members = self._slots.get(slot)
+        if members is not None:
+            members.discard(jti)
+            # Empty slots stay in the heap and are skipped when they come due
+            if not members:
+                del self._slots[slot]
+
+    def add(self, jti: str, session: Dict[str, Any], expires_at: datetime):
+        with self._lock:
+            self._sessions[jti] = session
+            self._by_user.setdefault(session["user"], set()).add(jti)
+            self._schedule(jti, expires_at)
+
+    def get(self, jti: str) -> Optional[Dict[str, Any]]:
+        return self._sessions.get(jti)
+
+    def touch(self, jti: str, last_used: datetime, expires_at: datetime):
+        with self._lock:
+            session = self._sessions.get(jti)
+            if session is not None:
+                session["last_used"] = last_used
+                self._schedule(jti, expires_at)
+
+    def remove(self, jti: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(jti, None)
+            if session is None:
+                return False
+            user_sessions = self._by_user.get(session["user"])
+            if user_sessions is not None:
+                user_sessions.discard(jti)
+                if not user_sessions:
+                    del self._by_user[session["user"]]
+            slot = self._slot_of.pop(jti, None)
+            if slot is not None:
+                self._unschedule(jti, slot)
+            return True
+
+    def user_sessions(self, user: str) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {jti: self._sessions[jti] for jti in self._by_user.get(user, ())}
+
+    def remove_user(self, user: str) -> int:
+        with self._lock:
+            jtis = list(self._by_user.get(user, ()))
+            for jti in jtis:
+                self.remove(jti)
+            return len(jtis)
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return dict(self._sessions)
+
+    def expire(self, now: datetime) -> int:
+        """Drop sessions whose slot is due - only due slots are visited"""
+        current = math.floor(now.timestamp() / self.bucket_seconds)
+        removed = 0
+        with self._lock:
+            while self._slot_heap and self._slot_heap[0] <= current:
+                slot = heapq.heappop(self._slot_heap)
+                for jti in list(self._slots.get(slot, ())):
+                    self.remove(jti)
+                    removed += 1
+            while self._revoked_heap and self._revoked_heap[0][0] <= now:
+                until, user = heapq.heappop(self._revoked_heap)
+                # A later revocation replaced this one if the expiry differs
+                if self._revoked_before.get(user, (None, None))[1] == until:
+                    del self._revoked_before[user]
+        self.expired += removed
+        return removed
+
+    def revoke_user_before(self, user: str, cutoff: datetime, until: datetime):
+        with self._lock:
+            self._revoked_before[user] = (cutoff, until)
+            heapq.heappush(self._revoked_heap, (until, user))
+
+    def revoked_before(self, user: str) -> Optional[datetime]:
+        entry = self._revoked_before.get(user)
+        return entry[0] if entry is not None else None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "users": len(self._by_user),
+            "expiry_slots": len(self._slots),
+            "revoked_users": len(self._revoked_before),
+            "expired": self.expired,
+        }
+
+
+class RedisSessionStore:
+    """Sessions in Redis: one key per session (TTL = expiry) plus a set of jtis per user"""
+
+    def __init__(self, client, local: Optional[MemorySessionStore] = None, prefix: str = "arbify:session"):
+        self._client = client
+        self.local = local or MemorySessionStore()
+        self.prefix = prefix
+        self.shared_errors = 0
+
+    def _session_key(self, jti: str) -> str:
+        return f"{self.prefix}:{jti}"
+
+    def _user_key(self, user: str) -> str:
+        return f"{self.prefix}:user:{user}"
+
+    def _revoked_key(self, user: str) -> str:
+        return f"{self.prefix}:revoked_before:{user}"
+
+    def _error(self, e: Exception):
+        self.shared_errors += 1
+        if self.shared_errors == 1 or self.shared_errors % 1000 == 0:
+            logger.warning(f"⚠️ Shared session store error ({self.shared_errors}), using local state: {e}")
+
+    @staticmethod
+    def _ttl_ms(expires_at: datetime) -> int:
+        return max(1, int((expires_at - datetime.utcnow()).total_seconds() * 1000))
+
+    @staticmethod
+    def _encode(session: Dict[str, Any]) -> str:
+        return json.dumps({k: v.isoformat() if k in _DATETIME_FIELDS else v for k, v in session.items()})
+
+    @staticmethod
+    def _decode(raw: str) -> Dict[str, Any]:
+        session = json.loads(raw)
+        for field in _DATETIME_FIELDS:
+            if field in session:
+                session[field] = datetime.fromisoformat(session[field])
+        return session
+
+    def add(self, jti: str, session: Dict[str, Any], expires_at: datetime):
+        try:
+            ttl = self._ttl_ms(expires_at)
+            pipe = self._client.pipeline()
+            pipe.set(self._session_key(jti), self._encode(session), px=ttl)
+            pipe.sadd(self._user_key(session["user"]), jti)
+            # The user index outlives its longest session; stale members are pruned on read
+            pipe.pexpire(self._user_key(session["user"]), ttl, gt=True)
+            pipe.pexpire(self._user_key(session["user"]), ttl, nx=True)
+            pipe.execute()
+        except Exception as e:
+            self._error(e)
+            self.local.add(jti, session, expires_at)
+
+    def get(self, jti: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self._client.get(self._session_key(jti))
+            return self._decode(raw) if raw else None
+        except Exception as e:
+            self._error(e)
+            return self.local.get(jti)
+
+    def touch(self, jti: str, last_used: datetime, expires_at: datetime):
+        try:
+            session = self.get(jti)
+            if session is not None:
+                session["last_used"] = last_used
+                self._client.set(self._session_key(jti), self._encode(session), px=self._ttl_ms(expires_at), xx=True)
+        except Exception as e:
+            self._error(e)
+            self.local.touch(jti, last_used, expires_at)
+
+    def remove(self, jti: str) -> bool:
+        try:
+            raw = self._client.getdel(self._session_key(jti))
+            if raw:
+                self._client.srem(self._user_key(self._decode(raw)["user"]), jti)
+            return bool(raw) or self.local.remove(jti)
+        except Exception as e:
+            self._error(e)
+            return self.local.remove(jti)
+
+    def user_sessions(self, user: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            jtis = sorted(self._client.smembers(self._user_key(user)))
+            if not jtis:
+                return self.local.user_sessions(user)
+            raws = self._client.mget([self._session_key(jti) for jti in jtis])
+            stale = [jti for jti, raw in zip(jtis, raws) if not raw]
+            if stale:
+                self._client.srem(self._user_key(user), *stale)
+            sessions = {jti: self._decode(raw) for jti, raw in zip(jtis, raws) if raw}
+            sessions.update(self.local.user_sessions(user))
+            return sessions
+        except Exception as e:
+            self._error(e)
+            return self.local.user_sessions(user)
+
+    def remove_user(self, user: str) -> int:
+        removed = self.local.remove_user(user)
+        try:
+            jtis = list(self._client.smembers(self._user_key(user)))
+            if jtis:
+                removed += self._client.delete(*[self._session_key(jti) for jti in jtis])
+            self._client.delete(self._user_key(user))
+        except Exception as e:
+            self._error(e)
+        return removed
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        sessions = self.local.all()
+        try:
+            keys = [key for key in self._client.scan_iter(f"{self.prefix}:*", count=500)
+                    if key.count(":") == self.prefix.count(":") + 1]
+            for key, raw in zip(keys, self._client.mget(keys) if keys else []):
+                if raw:
+                    sessions[key.rsplit(":", 1)[1]] = self._decode(raw)
+        except Exception as e:
+            self._error(e)
+        return sessions
+
+    def expire(self, now: datetime) -> int:
+        # Redis expires the shared keys itself
+        return self.local.expire(now)
+
+    def revoke_user_before(self, user: str, cutoff: datetime, until: datetime):
+        self.local.revoke_user_before(user, cutoff, until)
+        try:
+            self._client.set(self._revoked_key(user), cutoff.isoformat(), px=self._ttl_ms(until))
+        except Exception as e:
+            self._error(e)
+
+    def revoked_before(self, user: str) -> Optional[datetime]:
+        try:
+            raw = self._client.get(self._revoked_key(user))
+            if raw:
+                return datetime.fromisoformat(raw)
+        except Exception as e:
+            self._error(e)
+        return self.local.revoked_before(user)
+
+    def __len__(self) -> int:
+        return len(self.all())
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.local.stats(), backend="redis", shared_errors=self.shared_errors)
+
+
+def create_session_store():
+    """Redis-backed when REDIS_URL is configured (and SESSION_STORE_SHARED is on), else in-process"""
+    client = get_shared_cache() if SESSION_STORE_SHARED else None
+    if client is not None:
+        logger.info("✅ Shared session store enabled (Redis)")
+        return RedisSessionStore(client)
+    return MemorySessionStore()
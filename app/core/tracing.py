@@ -0,0 +1,386 @@
+# tracing.py
+"""
+Sampled request tracing with per-stage spans.
+
+A trace starts at the HTTP edge (TracingMiddleware) with a head-sampling
+decision: TRACE_SAMPLE_RATE of requests are traced. With TRACE_TRUST_PARENT on,
+a request whose W3C `traceparent` header says the caller already sampled it is
+traced too (joining the caller's trace) - only enable that behind a proxy that
+strips the header from untrusted clients. TRACE_SAMPLE_RATE=0 disables tracing
+entirely, whatever the header says. Code then marks its stages with
+
+    with tracer.span("sgo.fetch", sport=sport) as span:
+        ...
+        span.set_attribute("events", len(events))
+
+Spans nest through a contextvar, so they follow asyncio tasks started inside
+them (asyncio.gather) and threads started with contextvars.copy_context().
+When the request is not sampled, span() returns a shared no-op span - one
+contextvar read and no allocation.
+
+Finished spans are queued (non-blocking, dropped and counted when full) and a
+background thread exports them in batches as OTLP/JSON:
+- TRACE_EXPORTER=otlp: POST to TRACE_OTLP_ENDPOINT (an OpenTelemetry
+  collector's OTLP/HTTP receiver, default http://localhost:4318/v1/traces)
+- TRACE_EXPORTER=file: one OTLP/JSON payload per line in TRACE_FILE (readable
+  by the collector's otlpjsonfile receiver, or with jq)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests traced (head sampling); 0 disables tracing
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.0))
+# Honour an upstream sampled `traceparent` (otherwise any client could force tracing)
+TRACE_TRUST_PARENT = os.getenv("TRACE_TRUST_PARENT", "false").lower() == "true"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "otlp")  # otlp | file
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "arbify-api")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 10000))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", 512))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", 2.0))
+
+# OTLP span kinds / status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Returned when the current request is not sampled"""
+
+    trace_id = None
+    span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed stage of a sampled trace; a context manager that becomes the current span"""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind", "attributes",
+                 "start_ns", "end_ns", "status", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = STATUS_OK
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = STATUS_ERROR
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def encode_spans(spans: List[Span], service_name: str = TRACE_SERVICE_NAME) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest for a batch of finished spans"""
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": span.status, "message": span.error} if span.error else {"code": span.status},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        encoded.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": encoded}],
+        }]
+    }
+
+
+class OTLPHttpExporter:
+    """POSTs OTLP/JSON batches to a collector"""
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, payload: Dict[str, Any]):
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode(), method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def close(self):
+        pass
+
+
+class FileExporter:
+    """Appends one OTLP/JSON payload per line"""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._file = None
+
+    def export(self, payload: Dict[str, Any]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(payload) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def create_exporter(kind: str = TRACE_EXPORTER):
+    if kind == "file":
+        return FileExporter()
+    return OTLPHttpExporter()
+
+
+_STOP = object()
+
+
+class Tracer:
+    """Head-sampled traces with a bounded export queue and a background exporter thread"""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, exporter=None, max_queue: int = TRACE_QUEUE_SIZE,
+                 batch_size: int = TRACE_BATCH_SIZE, interval: float = TRACE_EXPORT_INTERVAL,
+                 service_name: str = TRACE_SERVICE_NAME, trust_parent: bool = TRACE_TRUST_PARENT):
+        self.sample_rate = sample_rate
+        self.trust_parent = trust_parent
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.service_name = service_name
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.traces_started = 0
+        self.sampled_out = 0
+        self.spans_exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, kind: int = SPAN_KIND_SERVER,
+                    **attributes) -> Any:
+        """Root span for a request - NOOP_SPAN unless this request is sampled"""
+        if self.sample_rate <= 0:
+            self.sampled_out += 1
+            return NOOP_SPAN
+        parent = _parse_traceparent(traceparent) if traceparent and self.trust_parent else None
+        if parent is not None and parent[2]:
+            trace_id, parent_id = parent[0], parent[1]
+        elif self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        else:
+            self.sampled_out += 1
+            return NOOP_SPAN
+        self.traces_started += 1
+        return Span(self, name, trace_id, parent_id, kind, attributes)
+
+    def span(self, name: str, **attributes) -> Any:
+        """Child of the current span, or NOOP_SPAN outside a sampled trace"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, SPAN_KIND_INTERNAL, attributes)
+
+    @staticmethod
+    def current_span() -> Any:
+        return _current_span.get() or NOOP_SPAN
+
+    def _export(self, span: Span):
+        if self.exporter is None:
+            self.exporter = create_exporter()
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"⚠️ Trace export queue full, {self.dropped} spans dropped")
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect what else finished within the interval, up to a batch
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            spans = [item for item in batch if item is not _STOP]
+            try:
+                if spans:
+                    self.exporter.export(encode_spans(spans, self.service_name))
+                    self.spans_exported += len(spans)
+            except Exception as e:
+                self.export_errors += 1
+                if self.export_errors == 1 or self.export_errors % 100 == 0:
+                    logger.warning(f"⚠️ Trace export failed ({self.export_errors}), {len(spans)} spans lost: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is _STOP:
+                return
+
+    def flush(self):
+        """Block until every queued span has been exported (tests, shutdown)"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+        self._thread = None
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "trust_parent": self.trust_parent,
+            "exporter": type(self.exporter).__name__ if self.exporter else TRACE_EXPORTER,
+            "traces_started": self.traces_started,
+            "sampled_out": self.sampled_out,
+            "queued": self._queue.qsize(),
+            "spans_exported": self.spans_exported,
+            "dropped": self.dropped,
+            "export_errors": self.export_errors,
+        }
+
+
+def _parse_traceparent(value: str):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+# Shared tracer for the API and services
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """Pure-ASGI root span per HTTP request; adds `traceparent` to sampled responses"""
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = self.tracer.start_trace(f"{scope['method']} {scope['path']}", traceparent,
+                                       **{"http.method": scope["method"], "http.target": scope["path"]})
+        if root is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        header = f"00-{root.trace_id}-{root.span_id}-01".encode("latin-1")
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                message["headers"] = list(message.get("headers", [])) + [(b"traceparent", header)]
+            await send(message)
+
+        with root:
+            await self.app(scope, receive, send_with_trace)
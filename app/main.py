@@ -3,7 +3,6 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import os
 import logging
 import requests
@@ -209,6 +208,28 @@ async def lifespan(app: FastAPI):
             asyncio.create_task(run_notification_checker())
             logger.info("✅ Arbitrage notification service task created!")
             
+            # Start email outbox worker
+            logger.info("📤 Starting email outbox worker...")
+            from app.services.email_outbox import outbox_worker
+            asyncio.create_task(outbox_worker.run())
+            logger.info("✅ Email outbox worker task created!")
+            
+            # Start password hashing workers before the first login (a failure here must not stop the pipeline)
+            try:
+                from app.core.password_hasher import password_hasher
+                await password_hasher.warm_up()
+                logger.info("✅ Password hashing workers started!")
+            except Exception as e:
+                logger.error(f"❌ Password hashing warm-up failed, workers will start on first use: {e}")
+            
+            # Load the IP threat feed, if one is configured
+            from app.core.ip_blocklist import SECURITY_BLOCKLIST_FILE, ip_blocklist
+            if SECURITY_BLOCKLIST_FILE:
+                try:
+                    ip_blocklist.load_file(SECURITY_BLOCKLIST_FILE)
+                except OSError as e:
+                    logger.error(f"❌ Could not load IP blocklist {SECURITY_BLOCKLIST_FILE}: {e}")
+            
             # Start SGO arbitrage detection service
             logger.info("🎯 Starting SGO arbitrage detection service...")
             from app.services.arbitrage_detector import start_arbitrage_detection
@@ -232,6 +253,21 @@ async def lifespan(app: FastAPI):
         logger.info("✅ Background scheduler stopped")
     except Exception as e:
         logger.error(f"❌ Error stopping scheduler: {e}")
+    try:
+        from app.services.email_dispatcher import email_sender
+        await email_sender.close()
+    except Exception as e:
+        logger.error(f"❌ Error closing email client: {e}")
+    try:
+        from app.core.password_hasher import password_hasher
+        password_hasher.shutdown()
+    except Exception as e:
+        logger.error(f"❌ Error stopping password hashing workers: {e}")
+    try:
+        from app.core.tracing import tracer
+        tracer.stop()
+    except Exception as e:
+        logger.error(f"❌ Error flushing traces: {e}")
     logger.info("Shutdown complete!")
 
 # Create rate limiter (removed slowapi)
@@ -240,83 +276,33 @@ async def lifespan(app: FastAPI):
 # Create the FastAPI app with the lifespan handler
 app = FastAPI(title="Arbitrage Betting API", lifespan=lifespan)
 
-# Add Custom Rate Limiting Middleware
-from app.core.middleware import RateLimitMiddleware
-app.add_middleware(RateLimitMiddleware)
-
 # Add Sentry middleware for error tracking (disabled - sentry_sdk not installed)
 # app.middleware("http")(sentry_middleware)
 
-# Add security middleware (will be imported after deployment)
-try:
-    from app.core.security_middleware import SecurityMiddleware, HTTPSRedirectMiddleware
-    
-    # Add comprehensive security middleware with error handling
-    try:
-        app.add_middleware(SecurityMiddleware, environment=ENVIRONMENT)
-        logger.info("✅ Advanced SecurityMiddleware added successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to add SecurityMiddleware: {e}")
-        raise  # Re-raise to trigger fallback
-    
-    # Add HTTPS redirect for production
-    if ENVIRONMENT == "production":
-        try:
-            app.add_middleware(HTTPSRedirectMiddleware)
-            logger.info("✅ HTTPSRedirectMiddleware added successfully")
-        except Exception as e:
-            logger.error(f"❌ Failed to add HTTPSRedirectMiddleware: {e}")
-    
-    logger.info("✅ Advanced security middleware loaded successfully")
-    
-except (ImportError, Exception) as e:
-    logger.warning(f"⚠️  Security middleware failed, using fallback: {e}")
-    # Fallback to basic security headers
-    @app.middleware("http")
-    async def add_basic_security_headers(request: Request, call_next):
-        """Basic security headers fallback"""
-        response = await call_next(request)
-        
-        # Basic security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Server"] = "Arbify-Fallback/1.0"  # Identify fallback mode
-        
-        if ENVIRONMENT == "production":
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
-            response.headers["Content-Security-Policy"] = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' https://js.stripe.com; "
-                "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
-                "font-src 'self' https://fonts.gstatic.com; "
-                "img-src 'self' data: https:; "
-                "connect-src 'self' https://api.stripe.com https://arbify-beige.vercel.app https://web-production-af8b.up.railway.app; "
-                "frame-src https://js.stripe.com; "
-                "object-src 'none'; "
-                "base-uri 'self'; "
-                "form-action 'self'"
-            )
-        
-        return response
-    
-    logger.warning("⚠️  Using basic security headers fallback mode")
+# Security layer: trusted hosts and HTTPS (production), blocked/suspicious IPs,
+# rate limiting and security headers in one pure-ASGI middleware
+from app.core.security_middleware import SecurityMiddleware
+
+TRUSTED_HOSTS = [
+    "arbify.vercel.app", 
+    "*.vercel.app",
+    "web-production-af8b.up.railway.app",
+    "*.railway.app",
+    "*.railway.internal",
+    "localhost",
+    "127.0.0.1"
+]
+app.add_middleware(
+    SecurityMiddleware,
+    environment=ENVIRONMENT,
+    allowed_hosts=TRUSTED_HOSTS if ENVIRONMENT == "production" else None,
+)
+logger.info("✅ SecurityMiddleware added successfully")
 
-# Add trusted host middleware for production
-if ENVIRONMENT == "production":
-    app.add_middleware(
-        TrustedHostMiddleware, 
-        allowed_hosts=[
-            "arbify.vercel.app", 
-            "*.vercel.app",
-            "web-production-af8b.up.railway.app",
-            "*.railway.app",
-            "*.railway.internal",
-            "localhost",
-            "127.0.0.1"
-        ]
-    )
+# Sampled request tracing (TRACE_SAMPLE_RATE); wraps the security layer so the root span covers it
+from app.core.tracing import TracingMiddleware, tracer
+
+app.add_middleware(TracingMiddleware, tracer=tracer)
 
 app.include_router(subscription_router, prefix="/api/subscriptions", tags=["Subscriptions"])
 app.include_router(subscription_router, prefix="/api/subscription", tags=["Subscriptions"])
@@ -1330,6 +1316,10 @@ logger.info("🔧 SCHEDULER DEBUG: Adding scheduled job (2 minute intervals - ma
 scheduler.add_job(scheduled_job_with_quota_check, 'interval', minutes=2, id='odds_update_job')
 logger.info(f"🔧 SCHEDULER DEBUG: Job added with quota management. Total jobs: {len(scheduler.get_jobs())}")
 
+# Retention jobs (notification logs, dedup records, delivered outbox emails, expired tokens)
+from app.services.maintenance import run_retention_jobs, RETENTION_INTERVAL_MINUTES
+scheduler.add_job(run_retention_jobs, 'interval', minutes=RETENTION_INTERVAL_MINUTES, id='retention_job')
+
 # Add quota status endpoint
 @app.get("/api/quota-status")
 async def get_quota_status():
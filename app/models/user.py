@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Enum, Text, JSON
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Enum, Text, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -100,7 +100,7 @@ class PasswordReset(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     token = Column(String, unique=True, index=True)
-    expires = Column(DateTime)
+    expires = Column(DateTime, index=True)  # retention job deletes expired tokens
     used = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -113,7 +113,7 @@ class EmailVerification(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     token = Column(String, unique=True, index=True)
-    expires = Column(DateTime)
+    expires = Column(DateTime, index=True)  # retention job deletes expired tokens
     verified = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -142,6 +142,10 @@ class UserArbitrage(Base):
 
 class UserEmailNotificationLog(Base):
     __tablename__ = "user_email_notification_logs"
+    __table_args__ = (
+        # Per-user send history (daily limit / cooldown checks)
+        Index("ix_user_email_notification_logs_user_sent_at", "user_id", "sent_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -150,4 +154,39 @@ class UserEmailNotificationLog(Base):
     status = Column(String) # 'sent', 'failed'
     details = Column(String, nullable=True)
     
-    user = relationship("User", back_populates="notification_logs")
\ No newline at end of file
+    user = relationship("User", back_populates="notification_logs")
+
+class NotifiedOpportunity(Base):
+    """Durable per-user dedup of arbitrage alerts; rows expire after NOTIFICATION_DEDUP_TTL_HOURS"""
+    __tablename__ = "notified_opportunities"
+    __table_args__ = (
+        UniqueConstraint("user_id", "opportunity_key", name="uq_notified_opportunities_user_key"),
+        Index("ix_notified_opportunities_expires_at", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    opportunity_key = Column(String(32), nullable=False)  # stable_opportunity_key() digest
+    notified_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class EmailOutbox(Base):
+    """Transactional outbox: emails are inserted alongside the change that triggers them
+    and delivered by the outbox worker (app/services/email_outbox.py)"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    email_type = Column(String(32), nullable=False)  # 'welcome', 'verification', 'password_reset', 'arbitrage_alert'
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html = Column(Text, nullable=False)
+    status = Column(String(16), default="pending", nullable=False)  # 'pending', 'sending', 'sent', 'dead'
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
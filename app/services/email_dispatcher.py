@@ -0,0 +1,240 @@
+# email_dispatcher.py
+"""
+Async email dispatch through the Resend HTTP API.
+
+- One pooled aiohttp session per event loop (the scheduler runs jobs on their own loops)
+- A token bucket shared by every loop/thread keeps us under the provider rate limit
+- Bursts go through the batch endpoint (up to EMAIL_BATCH_SIZE messages per request)
+- Bounded concurrency, and per-request retries with exponential backoff + full jitter
+  on 429/5xx/network errors (Retry-After is honoured)
+
+Point RESEND_API_URL at a local HTTP server to exercise it without the real provider.
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiohttp
+
+from app.core.config import (
+    RESEND_API_KEY, FROM_EMAIL, RESEND_API_URL, EMAIL_RATE_LIMIT_PER_SECOND,
+    EMAIL_MAX_CONCURRENCY, EMAIL_BATCH_SIZE, EMAIL_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class EmailMessage:
+    to: str
+    subject: str
+    html: str
+    email_type: str = "notification"
+    # Stable per logical email (e.g. the outbox row), sent as Idempotency-Key so retries aren't delivered twice
+    idempotency_key: Optional[str] = None
+
+    def payload(self, from_email: str) -> Dict[str, Any]:
+        return {"from": from_email, "to": [self.to], "subject": self.subject, "html": self.html}
+
+
+class TokenBucket:
+    """Reservation-style token bucket, safe to share across threads and event loops.
+
+    reserve() takes a token immediately (the balance may go negative) and returns
+    how long the caller must wait, so waiters are served in order without polling.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    async def acquire(self, tokens: float = 1):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncEmailSender:
+    """Non-blocking Resend client used by the notification pipeline"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = RESEND_API_KEY,
+        from_email: str = FROM_EMAIL,
+        base_url: str = RESEND_API_URL,
+        rate_per_second: float = EMAIL_RATE_LIMIT_PER_SECOND,
+        max_concurrency: int = EMAIL_MAX_CONCURRENCY,
+        batch_size: int = EMAIL_BATCH_SIZE,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0,
+        timeout: float = 15.0,
+    ):
+        self.api_key = api_key
+        self.from_email = from_email
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.bucket = TokenBucket(rate_per_second)
+
+        # loop -> (session, semaphore)
+        self._per_loop: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.requests = 0
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None or state[0].closed:
+            session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            )
+            state = (session, asyncio.Semaphore(self.max_concurrency))
+            self._per_loop[loop] = state
+        return state
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def _post(self, path: str, payload: Any, label: str, idempotency_key: Optional[str] = None) -> bool:
+        """POST with rate limiting, bounded concurrency and retries; True on a 2xx response.
+
+        The same Idempotency-Key goes out on every attempt, so a retry after a timeout
+        the provider had in fact accepted is not delivered again.
+        """
+        session, semaphore = self._loop_state()
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            await self.bucket.acquire()
+            try:
+                async with semaphore:
+                    self.requests += 1
+                    async with session.post(f"{self.base_url}{path}", json=payload, headers=headers) as response:
+                        if 200 <= response.status < 300:
+                            return True
+                        body = await response.text()
+                        if response.status not in RETRYABLE_STATUSES:
+                            logger.error(f"❌ Email API rejected {label}: {response.status} {body[:200]}")
+                            return False
+                        retry_after = response.headers.get("Retry-After")
+                        logger.warning(f"⚠️ Email API {response.status} for {label} (attempt {attempt + 1})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"⚠️ Email request error for {label} (attempt {attempt + 1}): {e}")
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        logger.error(f"❌ Giving up on {label} after {self.max_retries + 1} attempts")
+        return False
+
+    def _configured(self) -> bool:
+        if not self.api_key:
+            logger.error("❌ RESEND_API_KEY not set - cannot send emails")
+            return False
+        return True
+
+    async def send(self, message: EmailMessage) -> bool:
+        if not self._configured():
+            return False
+        ok = await self._post("/emails", message.payload(self.from_email), f"{message.email_type} email to {message.to}",
+                              message.idempotency_key)
+        if ok:
+            self.sent += 1
+            logger.info(f"✅ {message.email_type} email sent to {message.to}")
+        else:
+            self.failed += 1
+        return ok
+
+    async def _send_batch(self, batch: Sequence[EmailMessage]) -> List[bool]:
+        if len(batch) == 1:
+            return [await self.send(batch[0])]
+        payload = [message.payload(self.from_email) for message in batch]
+        if await self._post("/emails/batch", payload, f"batch of {len(batch)} emails", self._batch_key(batch)):
+            self.sent += len(batch)
+            logger.info(f"✅ Sent batch of {len(batch)} emails")
+            return [True] * len(batch)
+        # Batch requests are validated as a whole - retry individually so one bad
+        # address doesn't drop everyone else's email
+        logger.warning(f"⚠️ Batch of {len(batch)} failed - falling back to individual sends")
+        return list(await asyncio.gather(*(self.send(message) for message in batch)))
+
+    @staticmethod
+    def _batch_key(batch: Sequence[EmailMessage]) -> str:
+        """Derived from the messages' own keys (outbox row ids) when they all have one"""
+        keys = [message.idempotency_key for message in batch]
+        if all(keys):
+            return "batch-" + hashlib.sha256("\n".join(keys).encode()).hexdigest()[:32]
+        return f"batch-{uuid.uuid4().hex}"
+
+    async def send_many(self, messages: Sequence[EmailMessage]) -> List[bool]:
+        """Send a burst of messages; returns per-message success in input order"""
+        if not messages:
+            return []
+        if not self._configured():
+            return [False] * len(messages)
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        results = await asyncio.gather(*(self._send_batch(batch) for batch in batches))
+        return [ok for batch_results in results for ok in batch_results]
+
+    async def close(self):
+        """Close the session owned by the current event loop"""
+        state = self._per_loop.pop(asyncio.get_running_loop(), None)
+        if state is not None and not state[0].closed:
+            await state[0].close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_per_second": self.bucket.rate,
+            "max_concurrency": self.max_concurrency,
+            "batch_size": self.batch_size,
+        }
+
+
+# Shared sender for the app and background notifier
+email_sender = AsyncEmailSender()
+
+async def send_email_async(to_email: str, subject: str, html_content: str, email_type: str = "notification") -> bool:
+    """Async drop-in for scripts.email_verification.send_email"""
+    return await email_sender.send(EmailMessage(to_email, subject, html_content, email_type))
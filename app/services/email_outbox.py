@@ -0,0 +1,249 @@
+# email_outbox.py
+"""
+Transactional outbox for outgoing email.
+
+Request handlers and the notification checker call enqueue_email() inside the
+transaction that makes the triggering change (new profile, reset token,
+verification token, dedup records), so an email exists exactly when its change
+commits and no handler waits on the provider.
+
+OutboxWorker drains the table in the background:
+- claims due rows in batches (SKIP LOCKED on PostgreSQL) under a lease, so a
+  crashed worker's rows are picked up again once the lease lapses
+- sends each batch through the shared AsyncEmailSender (batch endpoint, rate limited)
+- failed rows are retried with jittered exponential backoff and dead-lettered
+  (status 'dead', last_error kept) after EMAIL_OUTBOX_MAX_ATTEMPTS attempts
+
+get_outbox_metrics() reports queue depth per status and the age of the oldest
+pending email. Delivered rows are pruned by the retention jobs (app/services/maintenance.py).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import DEV_MODE
+from app.core.database import AsyncSessionLocal
+from app.models.user import EmailOutbox
+from app.services.email_dispatcher import EmailMessage, email_sender
+
+logger = logging.getLogger(__name__)
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 100))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", 2))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", 30))
+EMAIL_OUTBOX_BACKOFF_CAP_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_CAP_SECONDS", 3600))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", 300))  # claimed rows become due again after this
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 7))  # sent rows kept for this long
+
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+
+
+@dataclass
+class ClaimedEmail:
+    """An outbox row claimed by the worker, detached from its session"""
+    id: int
+    attempts: int
+    message: EmailMessage
+
+
+def enqueue_email(
+    db: Session,
+    to_email: str,
+    subject: str,
+    html: str,
+    email_type: str,
+    user_id: Optional[int] = None,
+) -> EmailOutbox:
+    """Add an email to the outbox; it is sent only if the caller's transaction commits"""
+    entry = EmailOutbox(
+        user_id=user_id,
+        email_type=email_type,
+        to_email=to_email,
+        subject=subject,
+        html=html,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(entry)
+    return entry
+
+def enqueue_emails(db: Session, messages: Sequence[Tuple[EmailMessage, Optional[int]]]) -> int:
+    """Bulk enqueue_email for (message, user_id) pairs - one executemany insert, same transaction rules"""
+    if not messages:
+        return 0
+    now = datetime.utcnow()
+    db.execute(insert(EmailOutbox), [
+        {
+            "user_id": user_id,
+            "email_type": message.email_type,
+            "to_email": message.to,
+            "subject": message.subject,
+            "html": message.html,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for message, user_id in messages
+    ])
+    return len(messages)
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number `attempts` (exponential, capped, jittered over the upper half)"""
+    ceiling = min(EMAIL_OUTBOX_BACKOFF_CAP_SECONDS, EMAIL_OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+def claim_batch(db: Session, limit: int = EMAIL_OUTBOX_BATCH_SIZE, now: Optional[datetime] = None) -> List[ClaimedEmail]:
+    """Lease up to `limit` due rows (pending, or sending with an expired lease) and commit the claim"""
+    now = now or datetime.utcnow()
+    query = db.query(EmailOutbox).filter(
+        EmailOutbox.status.in_((PENDING, SENDING)),
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+
+    claimed = []
+    for row in query:
+        row.status = SENDING
+        row.attempts += 1
+        row.next_attempt_at = now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS)
+        message = EmailMessage(row.to_email, row.subject, row.html, row.email_type, idempotency_key=f"outbox-{row.id}")
+        claimed.append(ClaimedEmail(row.id, row.attempts, message))
+    db.commit()
+    return claimed
+
+def complete_batch(db: Session, results: Sequence[Tuple[ClaimedEmail, bool]], now: Optional[datetime] = None) -> Dict[str, int]:
+    """Mark sent rows, reschedule failures with backoff, dead-letter exhausted ones"""
+    now = now or datetime.utcnow()
+    counts = {SENT: 0, PENDING: 0, DEAD: 0}
+    rows = {
+        row.id: row
+        for row in db.query(EmailOutbox).filter(EmailOutbox.id.in_([claimed.id for claimed, _ in results]))
+    }
+    for claimed, ok in results:
+        row = rows.get(claimed.id)
+        if row is None:
+            continue
+        if ok:
+            row.status = SENT
+            row.sent_at = now
+            row.last_error = None
+        elif claimed.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+            row.status = DEAD
+            row.last_error = f"Delivery failed after {claimed.attempts} attempts"
+            logger.error(f"☠️ Dead-lettered {row.email_type} email {row.id} to {row.to_email} after {claimed.attempts} attempts")
+        else:
+            row.status = PENDING
+            row.next_attempt_at = now + timedelta(seconds=backoff_seconds(claimed.attempts))
+            row.last_error = f"Delivery failed (attempt {claimed.attempts})"
+        counts[row.status] += 1
+    db.commit()
+    return counts
+
+def get_outbox_metrics(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Queue depth per status, oldest pending age and the worker's counters"""
+    now = now or datetime.utcnow()
+    depth = {PENDING: 0, SENDING: 0, SENT: 0, DEAD: 0}
+    for status, count in db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status):
+        depth[status] = count
+
+    oldest_pending, next_due = db.query(
+        func.min(EmailOutbox.created_at),
+        func.min(EmailOutbox.next_attempt_at),
+    ).filter(EmailOutbox.status.in_((PENDING, SENDING))).one()
+
+    return {
+        "depth": depth,
+        "backlog": depth[PENDING] + depth[SENDING],
+        "oldest_pending_age_seconds": round((now - oldest_pending).total_seconds(), 1) if oldest_pending else 0.0,
+        "next_attempt_in_seconds": round(max(0.0, (next_due - now).total_seconds()), 1) if next_due else None,
+        "worker": outbox_worker.stats(),
+    }
+
+
+class OutboxWorker:
+    """Background drain loop for the email outbox"""
+
+    def __init__(self, batch_size: int = EMAIL_OUTBOX_BATCH_SIZE, poll_seconds: float = EMAIL_OUTBOX_POLL_SECONDS, session_factory=None):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._session_factory = session_factory or AsyncSessionLocal
+
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.last_batch_seconds: Optional[float] = None
+
+    async def _deliver(self, messages: List[EmailMessage]) -> List[bool]:
+        if DEV_MODE:
+            for message in messages:
+                logger.info(f"📧 DEV MODE: Would send {message.email_type} email to {message.to} - {message.subject}")
+            return [True] * len(messages)
+        return await email_sender.send_many(messages)
+
+    async def drain_once(self) -> int:
+        """Claim and deliver one batch; returns the number of rows claimed"""
+        async with self._session_factory() as db:
+            claimed = await db.run_sync(lambda s: claim_batch(s, self.batch_size))
+            if not claimed:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                results = await self._deliver([c.message for c in claimed])
+            except Exception as e:
+                logger.error(f"❌ Outbox delivery error: {str(e)}")
+                results = [False] * len(claimed)
+
+            counts = await db.run_sync(lambda s: complete_batch(s, list(zip(claimed, results))))
+
+        self.batches += 1
+        self.sent += counts[SENT]
+        self.retried += counts[PENDING]
+        self.dead += counts[DEAD]
+        self.last_batch_seconds = round(time.perf_counter() - start, 3)
+        logger.info(
+            f"📤 Outbox batch: {counts[SENT]} sent, {counts[PENDING]} rescheduled, {counts[DEAD]} dead-lettered "
+            f"in {self.last_batch_seconds:.1f}s"
+        )
+        return len(claimed)
+
+    async def run(self):
+        logger.info(f"📤 Email outbox worker started (batch {self.batch_size}, poll {self.poll_seconds}s)")
+        while True:
+            try:
+                claimed = await self.drain_once()
+                # A full batch means more is probably due - keep draining without sleeping
+                if claimed < self.batch_size:
+                    await asyncio.sleep(self.poll_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Error in email outbox worker: {str(e)}")
+                await asyncio.sleep(max(self.poll_seconds, 30))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead_lettered": self.dead,
+            "last_batch_seconds": self.last_batch_seconds,
+        }
+
+
+# Shared worker started from the app lifespan
+outbox_worker = OutboxWorker()
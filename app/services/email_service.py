@@ -2,7 +2,7 @@
 import os
 import requests
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from datetime import datetime
 from app.core.config import IS_RAILWAY_DEPLOYMENT, DEV_MODE
 
@@ -105,8 +105,22 @@ class EmailService:
             logger.error(f"❌ Email error sending to {to_email}: {str(e)}")
             return False
     
-    def send_verification_email(self, email: str, token: str) -> bool:
-        """Send email verification email"""
+    async def send_email_async(self, to_email: str, subject: str, html_content: str,
+                               email_type: str = "general") -> bool:
+        """Non-blocking send_email for async code paths (pooled client, rate limited)"""
+        if DEV_MODE:
+            logger.info(f"📧 DEV MODE: Would send {email_type} email to {to_email}")
+            logger.info(f"📧 Subject: {subject}")
+            return True
+        
+        if not self._validate_config():
+            return False
+        
+        from app.services.email_dispatcher import EmailMessage, email_sender
+        return await email_sender.send(EmailMessage(to_email, subject, html_content, email_type))
+    
+    def render_verification_email(self, token: str) -> Tuple[str, str]:
+        """(subject, html) for an email verification message"""
         verify_url = f"{self.base_url_web}/verify-email?token={token}"
         
         html_content = f"""
@@ -167,15 +181,20 @@ class EmailService:
         </html>
         """
         
+        return "Verify Your Email - Arbify Account", html_content
+    
+    def send_verification_email(self, email: str, token: str) -> bool:
+        """Send email verification email"""
+        subject, html_content = self.render_verification_email(token)
         return self.send_email(
             to_email=email,
-            subject="Verify Your Email - Arbify Account",
+            subject=subject,
             html_content=html_content,
             email_type="verification"
         )
     
-    def send_password_reset_email(self, email: str, token: str) -> bool:
-        """Send password reset email"""
+    def render_password_reset_email(self, token: str) -> Tuple[str, str]:
+        """(subject, html) for a password reset message"""
         reset_url = f"{self.base_url_web}/reset-password?token={token}"
         
         html_content = f"""
@@ -247,15 +266,20 @@ class EmailService:
         </html>
         """
         
+        return "Reset Your Arbify Password", html_content
+    
+    def send_password_reset_email(self, email: str, token: str) -> bool:
+        """Send password reset email"""
+        subject, html_content = self.render_password_reset_email(token)
         return self.send_email(
             to_email=email,
-            subject="Reset Your Arbify Password",
+            subject=subject,
             html_content=html_content,
             email_type="password_reset"
         )
     
-    def send_welcome_email(self, email: str, username: str) -> bool:
-        """Send welcome email to new users"""
+    def render_welcome_email(self, username: str) -> Tuple[str, str]:
+        """(subject, html) for the welcome message sent to new users"""
         
         html_content = f"""
         <!DOCTYPE html>
@@ -316,10 +340,15 @@ class EmailService:
         </html>
         """
         
+        return "Welcome to Arbify - Start Finding Arbitrage Opportunities", html_content
+    
+    def send_welcome_email(self, email: str, username: str) -> bool:
+        """Send welcome email to new users"""
+        subject, html_content = self.render_welcome_email(username)
         logger.info(f"📧 WELCOME EMAIL: Attempting to send to {email} for user {username}")
         result = self.send_email(
             to_email=email,
-            subject="Welcome to Arbify - Start Finding Arbitrage Opportunities",
+            subject=subject,
             html_content=html_content,
             email_type="welcome"
         )
@@ -0,0 +1,295 @@
+# email_templates.py
+"""
+Precompiled email templates.
+
+Templates use {{slot}} placeholders (so inline CSS needs no brace escaping) and
+are split into literal chunks and slot names once, at import; rendering is a
+single join. Values are inserted as-is - fragments are HTML.
+
+FragmentCache memoizes rendered fragments for the duration of one notification
+batch: subscribers matched to the same opportunities share the opportunity
+rows (and often the whole document), so only recipient-specific parts are
+rendered per email.
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List
+
+_SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class EmailTemplate:
+    """A template compiled into alternating literal chunks and slot names"""
+
+    def __init__(self, source: str):
+        parts = _SLOT.split(source)
+        self._literals: List[str] = parts[0::2]
+        self._slots: List[str] = parts[1::2]
+
+    @property
+    def slots(self) -> frozenset:
+        return frozenset(self._slots)
+
+    def render(self, **values: Any) -> str:
+        out = [self._literals[0]]
+        for slot, literal in zip(self._slots, self._literals[1:]):
+            out.append(str(values[slot]))
+            out.append(literal)
+        return "".join(out)
+
+
+class FragmentCache:
+    """Per-batch memo of rendered fragments, with hit counts and accumulated render time"""
+
+    def __init__(self):
+        self._fragments: Dict[Hashable, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        try:
+            value = self._fragments[key]
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+        value = render()
+        self.misses += 1
+        self._fragments[key] = value
+        return value
+
+    @contextmanager
+    def timed(self):
+        """Add the wall time of the enclosed rendering to render_seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.render_seconds += time.perf_counter() - start
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fragments": len(self._fragments),
+            "hits": self.hits,
+            "misses": self.misses,
+            "render_ms": round(self.render_seconds * 1000, 2),
+        }
+
+
+# --- Arbitrage alert (background notifier) ---------------------------------
+
+ALERT_TEST_HEADER = """
+                <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); padding: 20px; text-align: center; margin-bottom: 0; border: 2px solid #d4af37; border-bottom: none;">
+                    <h2 style="margin: 0; color: #d4af37; font-size: 18px; font-weight: 700;">TEST EMAIL - NOT REAL DATA</h2>
+                    <p style="margin: 8px 0 0 0; color: #e5e5e5; font-size: 14px;">This is a test to verify your email notifications are working</p>
+                </div>
+                """
+
+_ALERT_FOOTER = """
+                <!-- Footer -->
+                <div style="background-color: #1a1a1a; padding: 25px 40px; text-align: center; border-top: 1px solid #333333;">
+                    <p style="margin: 0; font-size: 13px; color: #888888;">
+                        <a href="{{frontend_url}}/subscription" style="color: #d4af37; text-decoration: none; font-weight: 500;">Upgrade Plan</a> |
+                        <a href="{{frontend_url}}/profile" style="color: #d4af37; text-decoration: none; font-weight: 500;">Manage Notifications</a>
+                    </p>
+                    <p style="margin: 15px 0 0 0; font-size: 12px; color: #666666;">© 2025 Arbify - Professional Arbitrage Betting Platform</p>
+                </div>
+            </div>
+            """
+
+_ALERT_CTA_AND_INFO = """
+                    <!-- Call to Action -->
+                    <div style="text-align: center; margin: 40px 0;">
+                        <a href="{{frontend_url}}/dashboard?tab=arbitrage"
+                           style="background: linear-gradient(135deg, #d4af37 0%, #f4c430 100%);
+                                  color: #1a1a1a;
+                                  padding: 18px 40px;
+                                  border-radius: 8px;
+                                  text-decoration: none;
+                                  font-weight: 700;
+                                  font-size: 16px;
+                                  display: inline-block;
+                                  box-shadow: 0 4px 12px rgba(212, 175, 55, 0.3);
+                                  transition: all 0.3s ease;">
+                            {{cta_text}}
+                        </a>
+                    </div>
+
+                    <!-- Info Box -->
+                    <div style="background-color: #1a1a1a; border-radius: 8px; padding: 20px; margin: 30px 0; border-left: 4px solid #d4af37;">
+                        <p style="margin: 0; font-size: 14px; color: #e5e5e5; line-height: 1.6;">
+                            <strong style="color: #d4af37;">Ready to profit?</strong> Access your personalized dashboard to see complete odds breakdowns,
+                            calculate optimal stakes, and track all opportunities in real-time.
+                        </p>
+                    </div>
+                </div>
+                """
+
+ALERT_SINGLE = EmailTemplate("""
+            <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 0; background-color: #0f0f0f; border-radius: 12px; overflow: hidden;">
+                {{test_header}}
+                <!-- Header -->
+                <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); padding: 30px 40px; text-align: center; border-bottom: 3px solid #d4af37;">
+                    <h1 style="color: #d4af37; margin: 0; font-size: 32px; font-weight: 700; letter-spacing: -0.5px;">Arbify Alert</h1>
+                    <p style="color: #e5e5e5; margin: 8px 0 0 0; font-size: 16px; font-weight: 400;">{{header_text}}</p>
+                </div>
+
+                <!-- Main Content -->
+                <div style="padding: 40px;">
+                    <!-- Opportunity Card -->
+                    <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); border-radius: 12px; padding: 30px; margin-bottom: 30px; border: 1px solid #d4af37;">
+                        <h2 style="color: #d4af37; margin: 0 0 20px 0; font-size: 24px; font-weight: 600; text-align: center;">
+                            {{home_team}} vs {{away_team}}
+                        </h2>
+
+                        <div style="display: table; width: 100%; margin-bottom: 25px;">
+                            <div style="display: table-row;">
+                                <div style="display: table-cell; padding: 8px 0; width: 30%; color: #b5b5b5; font-size: 14px; font-weight: 500;">Sport:</div>
+                                <div style="display: table-cell; padding: 8px 0; color: #ffffff; font-size: 14px; font-weight: 600;">{{league}}</div>
+                            </div>
+                            <div style="display: table-row;">
+                                <div style="display: table-cell; padding: 8px 0; width: 30%; color: #b5b5b5; font-size: 14px; font-weight: 500;">Match Time:</div>
+                                <div style="display: table-cell; padding: 8px 0; color: #ffffff; font-size: 14px; font-weight: 600;">{{match_time}}</div>
+                            </div>
+                            <div style="display: table-row;">
+                                <div style="display: table-cell; padding: 8px 0; width: 30%; color: #b5b5b5; font-size: 14px; font-weight: 500;">Profit:</div>
+                                <div style="display: table-cell; padding: 8px 0; color: #10b981; font-size: 18px; font-weight: 700;">{{profit}}%</div>
+                            </div>
+                        </div>
+
+                        <!-- Betting Details -->
+                        <div style="background-color: #0f0f0f; border-radius: 8px; padding: 20px; border: 1px solid #333333; margin-bottom: 20px;">
+                            <h4 style="color: #d4af37; margin: 0 0 15px 0; font-size: 16px; font-weight: 600;">How to Bet:</h4>
+                            <div style="margin-bottom: 15px;">
+                                <div style="color: #ffffff; font-size: 14px; font-weight: 600; margin-bottom: 5px;">
+                                    {{side1_team}}: ${{side1_stake}} at {{side1_odds}}
+                                </div>
+                                <div style="color: #b5b5b5; font-size: 12px;">Bookmaker: {{side1_bookmaker}}</div>
+                            </div>
+                            <div style="margin-bottom: 15px;">
+                                <div style="color: #ffffff; font-size: 14px; font-weight: 600; margin-bottom: 5px;">
+                                    {{side2_team}}: ${{side2_stake}} at {{side2_odds}}
+                                </div>
+                                <div style="color: #b5b5b5; font-size: 12px;">Bookmaker: {{side2_bookmaker}}</div>
+                            </div>
+                            <div style="border-top: 1px solid #333; padding-top: 15px; margin-top: 15px;">
+                                <div style="color: #10b981; font-size: 14px; font-weight: 600;">
+                                    Total stake: $100 → Guaranteed profit: ${{guaranteed_profit}}
+                                </div>
+                            </div>
+                        </div>
+
+                        <!-- Verification Tips -->
+                        <div style="background-color: #0f0f0f; border-radius: 8px; padding: 20px; border: 1px solid #333333;">
+                            <h4 style="color: #f59e0b; margin: 0 0 10px 0; font-size: 14px; font-weight: 600;">⚠️ Verification Required:</h4>
+                            <div style="color: #b5b5b5; font-size: 12px; line-height: 1.6;">
+                                <div style="margin-bottom: 5px;">• Check odds are still available before betting</div>
+                                <div style="margin-bottom: 5px;">• Verify {{market_description}} - {{verification_tips}}</div>
+                                <div>• Place bets quickly - odds change frequently</div>
+                            </div>
+                        </div>
+                    </div>
+                    """ + _ALERT_CTA_AND_INFO + _ALERT_FOOTER)
+
+ALERT_ROW = EmailTemplate("""
+                <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); border-radius: 8px; padding: 20px; margin: 15px 0; border: 1px solid #d4af37;">
+                    <h3 style="color: #d4af37; margin: 0 0 15px 0; font-size: 18px; font-weight: 600;">{{home_team}} vs {{away_team}}</h3>
+                    <div style="display: table; width: 100%; margin-bottom: 15px;">
+                        <div style="display: table-row;">
+                            <div style="display: table-cell; padding: 4px 0; width: 25%; color: #b5b5b5; font-size: 13px;">Sport:</div>
+                            <div style="display: table-cell; padding: 4px 0; color: #ffffff; font-size: 13px; font-weight: 500;">{{league}}</div>
+                        </div>
+                        <div style="display: table-row;">
+                            <div style="display: table-cell; padding: 4px 0; width: 25%; color: #b5b5b5; font-size: 13px;">Match Time:</div>
+                            <div style="display: table-cell; padding: 4px 0; color: #ffffff; font-size: 13px; font-weight: 500;">{{match_time}}</div>
+                        </div>
+                        <div style="display: table-row;">
+                            <div style="display: table-cell; padding: 4px 0; width: 25%; color: #b5b5b5; font-size: 13px;">Profit:</div>
+                            <div style="display: table-cell; padding: 4px 0; color: #10b981; font-size: 16px; font-weight: 700;">{{profit}}%</div>
+                        </div>
+                    </div>
+                    <div style="background-color: #0f0f0f; border-radius: 6px; padding: 12px; border: 1px solid #333333;">
+                        <div style="color: #b5b5b5; font-size: 11px; line-height: 1.4;">
+                            <span>• Arbitrage confirmed</span> • <span>Stakes calculated</span> • <span>Live tracking</span>
+                        </div>
+                    </div>
+                </div>
+                """)
+
+ALERT_MORE = EmailTemplate("""
+                <div style="background-color: #1a1a1a; border-radius: 8px; padding: 20px; margin: 25px 0; border: 2px solid #d4af37; text-align: center;">
+                    <p style="margin: 0; font-size: 16px; color: #d4af37; font-weight: 600;">
+                        Plus {{remaining}} more opportunities available!
+                    </p>
+                    <p style="margin: 8px 0 0 0; font-size: 13px; color: #e5e5e5;">View all opportunities and detailed analysis on your dashboard</p>
+                </div>
+                """)
+
+ALERT_MULTI = EmailTemplate("""
+            <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 0; background-color: #0f0f0f; border-radius: 12px; overflow: hidden;">
+                <!-- Header -->
+                <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); padding: 30px 40px; text-align: center; border-bottom: 3px solid #d4af37;">
+                    <h1 style="color: #d4af37; margin: 0; font-size: 32px; font-weight: 700; letter-spacing: -0.5px;">Arbify Alert</h1>
+                    <p style="color: #e5e5e5; margin: 8px 0 0 0; font-size: 16px; font-weight: 400;">{{count}} New Arbitrage Opportunities!</p>
+                </div>
+
+                <!-- Main Content -->
+                <div style="padding: 40px;">
+                    <!-- Opportunities List -->
+                    <div style="margin: 0 0 30px 0;">
+                        {{opportunities_html}}
+                    </div>
+
+                    {{more_opportunities_html}}
+                    """ + _ALERT_CTA_AND_INFO + _ALERT_FOOTER)
+
+
+# --- Simple alert (notification test endpoint) -----------------------------
+
+SIMPLE_ALERT_SINGLE = EmailTemplate("""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
+            <h1 style="color: #d4af37;">New Arbitrage Opportunity!</h1>
+            <p>We've found a new arbitrage opportunity with <strong>{{profit}}%</strong> profit.</p>
+
+            <div style="background-color: #f8f9fa; border-radius: 5px; padding: 15px; margin: 20px 0;">
+                <h3 style="margin-top: 0;">{{home_team}} vs {{away_team}}</h3>
+                <p><strong>Sport:</strong> {{sport_title}}</p>
+                <p><strong>Start Time:</strong> {{commence_time}}</p>
+                <p><strong>Profit:</strong> {{profit}}%</p>
+            </div>
+
+            <p>We've found a new arbitrage opportunity that matches your preferences!</p>
+            <p><a href="http://localhost:8000/arbitrage" style="background-color: #d4af37; color: #fff; padding: 10px 15px; border-radius: 5px; text-decoration: none;">View Opportunity</a></p>
+
+            <hr style="margin: 20px 0; border: none; border-top: 1px solid #eee;">
+            <p style="color: #777; font-size: 12px;">© 2025 Arbify - Arbitrage Betting Platform</p>
+        </div>
+        """)
+
+SIMPLE_ALERT_ROW = EmailTemplate("""
+            <div style="margin-bottom: 15px; padding: 10px; border-left: 3px solid #d4af37; background-color: #f8f9fa;">
+                <p style="margin: 0;"><strong>{{home_team}} vs {{away_team}}</strong></p>
+                <p style="margin: 5px 0;"><strong>Profit:</strong> {{profit}}%</p>
+                <p style="margin: 0;"><strong>Sport:</strong> {{sport_title}}</p>
+            </div>
+            """)
+
+SIMPLE_ALERT_MULTI = EmailTemplate("""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
+            <h1 style="color: #d4af37;">New Arbitrage Opportunities!</h1>
+            <p>We've found {{count}} new arbitrage opportunities for you.</p>
+
+            <div style="margin: 20px 0;">
+                {{opportunities_html}}
+            </div>
+
+            <p>We've found multiple new arbitrage opportunities that match your preferences!</p>
+            <p><a href="http://localhost:8000/#arbitrage" style="background-color: #d4af37; color: #fff; padding: 10px 15px; border-radius: 5px; text-decoration: none;">View All Opportunities</a></p>
+
+            <hr style="margin: 20px 0; border: none; border-top: 1px solid #eee;">
+            <p style="color: #777; font-size: 12px;">© 2025 Arbify - Arbitrage Betting Platform</p>
+        </div>
+        """)
@@ -0,0 +1,128 @@
+# identity_cache.py
+"""
+Short-lived cache of authenticated identities.
+
+get_current_user used to reload the User row on every authenticated request.
+Entries here are keyed by the token subject plus the token version (its `iat`
+claim), so a freshly issued token never reuses a principal cached for an older
+one. Anything that changes who a user is or whether they may log in (password
+change, deactivation, rename, delete, revoke_all_user_tokens) drops every
+cached entry for that username.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.core.cache import TTLCache
+from app.models.user import User
+from app.services.subscription_tier import get_user_tier
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_CACHE_TTL_SECONDS = int(os.getenv("IDENTITY_CACHE_TTL_SECONDS", 60))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", 50000))
+
+# Values: {"id": int, "username": str, "email": str, "is_active": bool}
+_identity_cache = TTLCache(maxsize=IDENTITY_CACHE_MAX_ENTRIES, ttl=IDENTITY_CACHE_TTL_SECONDS, namespace="identity")
+
+# Columns whose change must invalidate cached identities
+_IDENTITY_COLUMNS = ("username", "email", "hashed_password", "is_active")
+
+
+@dataclass(frozen=True)
+class CurrentPrincipal:
+    """Lightweight authenticated user for routes that only need id and tier"""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    tier: str = "basic"
+
+
+def token_version(payload: Dict[str, Any]) -> int:
+    """Version of a decoded token; tokens issued before `iat` was stamped share version 0"""
+    try:
+        return int(payload.get("iat") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _cache_key(username: str, version: int) -> str:
+    return f"{username}:{version}"
+
+def _identity_from(user: User) -> Dict[str, Any]:
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "is_active": bool(user.is_active),
+    }
+
+def remember_identity(username: str, version: int, user: User):
+    """Seed the cache from a User row that was loaded anyway"""
+    _identity_cache.set(_cache_key(username, version), _identity_from(user))
+
+def get_identity(username: str, version: int, db: Session) -> Optional[Dict[str, Any]]:
+    """Return the cached identity for a token, loading it on a miss (None if the user is gone)"""
+    key = _cache_key(username, version)
+    identity = _identity_cache.get(key)
+    if identity is None:
+        row = db.query(User.id, User.username, User.email, User.is_active).filter(
+            User.username == username
+        ).first()
+        if row is None:
+            return None
+        identity = {"id": row.id, "username": row.username, "email": row.email, "is_active": bool(row.is_active)}
+        _identity_cache.set(key, identity)
+    return identity
+
+def get_principal(username: str, version: int, db: Session) -> Optional[CurrentPrincipal]:
+    """Build a CurrentPrincipal; the tier comes from the (separately invalidated) tier cache"""
+    identity = get_identity(username, version, db)
+    if identity is None:
+        return None
+    return CurrentPrincipal(tier=get_user_tier(identity["id"], db), **identity)
+
+def invalidate_identity(username: Optional[str]):
+    """Drop every cached identity for a username, whatever token version it was cached under"""
+    if not username:
+        return
+    _identity_cache.invalidate_prefix(f"{username}:")
+    logger.info(f"🔄 Invalidated cached identity for {username}")
+
+def get_identity_cache_stats() -> dict:
+    return _identity_cache.stats()
+
+
+def _invalidate_now_and_after_commit(target: User, username: Optional[str]):
+    # The flush-time invalidation covers this worker; repeating it after commit
+    # drops anything a concurrent request re-cached from the old row meanwhile
+    invalidate_identity(username)
+    session = object_session(target)
+    if session is not None and username:
+        session.info.setdefault("identity_invalidations", set()).add(username)
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_user_update(mapper, connection, target):
+    """Password changes, deactivation and renames invalidate cached identities"""
+    state = inspect(target)
+    changed = [c for c in _IDENTITY_COLUMNS if state.attrs[c].history.has_changes()]
+    if not changed:
+        return
+    _invalidate_now_and_after_commit(target, target.username)
+    if "username" in changed:
+        for old_username in state.attrs.username.history.deleted:
+            _invalidate_now_and_after_commit(target, old_username)
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_delete(mapper, connection, target):
+    _invalidate_now_and_after_commit(target, target.username)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for username in session.info.pop("identity_invalidations", ()):
+        invalidate_identity(username)
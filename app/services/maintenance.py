@@ -0,0 +1,150 @@
+# maintenance.py
+"""
+Scheduled retention jobs.
+
+Tables that only grow (notification logs, dedup records, delivered outbox
+emails, expired reset/verification tokens) are pruned here, on the scheduler,
+instead of at the start of every notification cycle.
+
+Deletes are chunked by primary key: each batch selects up to
+RETENTION_BATCH_SIZE ids in id order (walking the primary key index, or the
+policy's own index), deletes exactly those rows and commits, so no single
+statement holds locks on a large range of the table.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.user import (
+    EmailOutbox, EmailVerification, NotifiedOpportunity, PasswordReset, UserEmailNotificationLog,
+)
+from app.services.email_outbox import EMAIL_OUTBOX_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 1000))
+RETENTION_INTERVAL_MINUTES = int(os.getenv("RETENTION_INTERVAL_MINUTES", 60))
+EMAIL_LOG_RETENTION_DAYS = int(os.getenv("EMAIL_LOG_RETENTION_DAYS", 7))
+
+
+@dataclass
+class RetentionPolicy:
+    """Rows of `model` matching condition(now) are deleted"""
+    name: str
+    model: Any
+    condition: Callable[[datetime], Any]
+
+
+@dataclass
+class RetentionResult:
+    name: str
+    deleted: int
+    batches: int
+    seconds: float
+    error: Optional[str] = None
+
+
+RETENTION_POLICIES: List[RetentionPolicy] = [
+    RetentionPolicy(
+        "email_notification_logs", UserEmailNotificationLog,
+        lambda now: UserEmailNotificationLog.sent_at < now - timedelta(days=EMAIL_LOG_RETENTION_DAYS),
+    ),
+    RetentionPolicy(
+        "notified_opportunities", NotifiedOpportunity,
+        lambda now: NotifiedOpportunity.expires_at <= now,
+    ),
+    RetentionPolicy(
+        "email_outbox_sent", EmailOutbox,
+        lambda now: (EmailOutbox.status == "sent") & (EmailOutbox.sent_at < now - timedelta(days=EMAIL_OUTBOX_RETENTION_DAYS)),
+    ),
+    RetentionPolicy(
+        "password_resets", PasswordReset,
+        lambda now: PasswordReset.expires < now,
+    ),
+    RetentionPolicy(
+        "email_verifications", EmailVerification,
+        lambda now: EmailVerification.expires < now,
+    ),
+]
+
+def delete_in_batches(db: Session, model, condition, batch_size: int = RETENTION_BATCH_SIZE, name: Optional[str] = None) -> RetentionResult:
+    """Delete matching rows in primary-key-ordered batches, committing after each"""
+    start = time.perf_counter()
+    deleted = batches = 0
+    while True:
+        ids = [row_id for (row_id,) in db.query(model.id).filter(condition).order_by(model.id).limit(batch_size)]
+        if not ids:
+            break
+        db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        deleted += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return RetentionResult(name or model.__tablename__, deleted, batches, round(time.perf_counter() - start, 3))
+
+def run_retention_policies(
+    db: Session,
+    policies: List[RetentionPolicy] = RETENTION_POLICIES,
+    now: Optional[datetime] = None,
+    batch_size: int = RETENTION_BATCH_SIZE,
+) -> List[RetentionResult]:
+    """Apply every policy; a failing policy is rolled back and reported without stopping the others"""
+    now = now or datetime.utcnow()
+    results = []
+    for policy in policies:
+        start = time.perf_counter()
+        try:
+            result = delete_in_batches(db, policy.model, policy.condition(now), batch_size, name=policy.name)
+        except Exception as e:
+            db.rollback()
+            result = RetentionResult(policy.name, 0, 0, round(time.perf_counter() - start, 3), error=str(e))
+            logger.error(f"❌ Retention job {policy.name} failed: {str(e)}")
+        results.append(result)
+    return results
+
+
+_last_run_lock = threading.Lock()
+_last_run: Dict[str, Any] = {}
+
+def run_retention_jobs() -> List[RetentionResult]:
+    """Scheduler entry point: prune every table and record the outcome for /admin/maintenance-status"""
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        results = run_retention_policies(db)
+    finally:
+        db.close()
+    duration = time.perf_counter() - start
+
+    total = sum(result.deleted for result in results)
+    logger.info(
+        f"🧹 Retention: removed {total} rows in {duration:.2f}s - "
+        + ", ".join(f"{r.name}={r.deleted}" for r in results)
+    )
+    with _last_run_lock:
+        _last_run.clear()
+        _last_run.update({
+            "started_at": started_at.isoformat(),
+            "duration_seconds": round(duration, 3),
+            "deleted": total,
+            "jobs": [asdict(result) for result in results],
+        })
+    return results
+
+def get_maintenance_status() -> Dict[str, Any]:
+    with _last_run_lock:
+        return {
+            "interval_minutes": RETENTION_INTERVAL_MINUTES,
+            "batch_size": RETENTION_BATCH_SIZE,
+            "last_run": dict(_last_run) or None,
+        }
@@ -0,0 +1,96 @@
+# notification_dedup.py
+"""
+Durable dedup of arbitrage alerts.
+
+Each (user, opportunity) pair that was emailed is stored in notified_opportunities
+with an expiry, keyed by a stable digest of the opportunity's identity (event +
+market + line - never the profit, so small price moves don't re-send). The
+checker bulk-loads the unexpired keys for its candidates once per cycle, so
+every dedup check afterwards is a set lookup.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.user import NotifiedOpportunity
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_DEDUP_TTL_HOURS = int(os.getenv("NOTIFICATION_DEDUP_TTL_HOURS", 24))
+
+# Same bound-parameter-friendly chunking as the other bulk loaders
+CHUNK_SIZE = 500
+
+# Identity fields used when an opportunity has no provider id
+_IDENTITY_FIELDS = ("sport", "league", "home_team", "away_team", "start_time", "market_type", "line")
+
+def stable_opportunity_key(opportunity: Dict) -> str:
+    """32-char digest identifying an opportunity independent of its current prices"""
+    identity = opportunity.get("id")
+    if not identity:
+        identity = "|".join(str(opportunity.get(field, "")) for field in _IDENTITY_FIELDS)
+    return hashlib.blake2b(str(identity).encode("utf-8"), digest_size=16).hexdigest()
+
+def get_notified_keys(user_ids: Iterable[int], db: Session, now: Optional[datetime] = None) -> Dict[int, Set[str]]:
+    """Unexpired opportunity keys per user, one query per chunk of users"""
+    now = now or datetime.utcnow()
+    user_ids = list(user_ids)
+    keys: Dict[int, Set[str]] = {}
+    for i in range(0, len(user_ids), CHUNK_SIZE):
+        chunk = user_ids[i:i + CHUNK_SIZE]
+        rows = db.query(NotifiedOpportunity.user_id, NotifiedOpportunity.opportunity_key).filter(
+            NotifiedOpportunity.user_id.in_(chunk),
+            NotifiedOpportunity.expires_at > now
+        )
+        for user_id, key in rows:
+            keys.setdefault(user_id, set()).add(key)
+    return keys
+
+def record_notified(entries: Iterable[Tuple[int, List[Dict]]], db: Session, now: Optional[datetime] = None):
+    """Upsert (user_id, opportunities) pairs with a fresh expiry; the caller commits"""
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(hours=NOTIFICATION_DEDUP_TTL_HOURS)
+    rows = {
+        (user_id, stable_opportunity_key(opportunity)): None
+        for user_id, opportunities in entries
+        for opportunity in opportunities
+    }
+    values = [
+        {"user_id": user_id, "opportunity_key": key, "notified_at": now, "expires_at": expires_at}
+        for user_id, key in rows
+    ]
+    if not values:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        # One cached statement executed with a parameter list (executemany),
+        # rather than compiling a multi-VALUES statement per chunk
+        stmt = insert(NotifiedOpportunity)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "opportunity_key"],
+            set_={"notified_at": stmt.excluded.notified_at, "expires_at": stmt.excluded.expires_at},
+        )
+        db.execute(stmt, values)
+        return
+
+    # Generic fallback for other backends
+    for value in values:
+        existing = db.query(NotifiedOpportunity).filter(
+            NotifiedOpportunity.user_id == value["user_id"],
+            NotifiedOpportunity.opportunity_key == value["opportunity_key"]
+        ).first()
+        if existing:
+            existing.notified_at = value["notified_at"]
+            existing.expires_at = value["expires_at"]
+        else:
+            db.add(NotifiedOpportunity(**value))
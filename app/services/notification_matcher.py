@@ -0,0 +1,219 @@
+# notification_matcher.py
+"""
+Inverted index of notification preferences.
+
+The notification checker used to re-filter the full opportunity list once per
+subscriber. SubscriptionIndex is built once per check cycle from every opted-in
+profile and matches each opportunity against it, so a cycle costs one pass over
+the opportunities plus set intersections instead of users x opportunities.
+Bookmaker selections are stored as bitmasks grouped by distinct mask, so
+re-pricing happens once per distinct (selection & ladder books) - not per user.
+
+Matching rules (same as the ArbitrageFinder/LiveOdds frontend filters):
+- profit_percentage >= the user's minimum_profit_threshold (default 1.0%)
+- the arb must be available on the user's selected bookmakers
+  (DEFAULT_NOTIFICATION_BOOKMAKERS when none are selected): when a headline
+  price comes from an unselected book the opportunity is re-priced from its
+  top-k price ladder (app/services/price_ladder.py), and the user gets the
+  re-priced copy if it still clears their threshold
+- the opportunity's sport/league is one of the user's preferred sports
+  (users with no preferred sports match every sport)
+"""
+
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from app.services.price_ladder import best_mask, bookmaker_bits, compile_ladder, reprice, repriced_opportunity
+
+logger = logging.getLogger(__name__)
+
+# Major US books - used when a user hasn't selected any, to keep fantasy/DFS platforms out
+DEFAULT_NOTIFICATION_BOOKMAKERS = ['fanduel', 'draftkings', 'betmgm', 'caesars', 'espnbet', 'pinnacle', 'bet365']
+
+DEFAULT_MIN_PROFIT_THRESHOLD = 1.0
+
+_EMPTY: FrozenSet[int] = frozenset()
+
+def _split_csv(value: Optional[str]) -> List[str]:
+    return [item.strip().lower() for item in (value or "").split(",") if item.strip()]
+
+# Sport groups that prefix Odds-API keys ("soccer_epl", "basketball_nba")
+ODDS_API_SPORT_PREFIXES = frozenset({
+    'americanfootball', 'aussierules', 'baseball', 'basketball', 'boxing', 'cricket',
+    'golf', 'handball', 'icehockey', 'lacrosse', 'mma', 'rugbyleague', 'rugbyunion',
+    'soccer', 'tennis',
+})
+
+# Frontend SGO keys whose SGO leagueID differs from the key itself
+SGO_LEAGUE_ALIASES = {
+    'premier_league': 'epl',
+    'serie_a': 'it_serie_a',
+    'brasileiro_serie_a': 'br_serie_a',
+}
+
+def preferred_sport_tokens(sport_key: str) -> Set[str]:
+    """Tokens a preferred sport key matches: the key itself, the league part of an
+    Odds-API key ("soccer_epl" -> "epl") and the leagueID of an aliased SGO key
+    ("PREMIER_LEAGUE" -> "epl"). Other keys only match as a whole, so
+    "BRASILEIRO_SERIE_A" never matches Italian Serie A"""
+    key = sport_key.strip().lower()
+    tokens = {key}
+    sport, _, league = key.partition("_")
+    if league and sport in ODDS_API_SPORT_PREFIXES:
+        tokens.add(league)
+    if key in SGO_LEAGUE_ALIASES:
+        tokens.add(SGO_LEAGUE_ALIASES[key])
+    return tokens
+
+def opportunity_sport_tokens(opportunity: Dict) -> FrozenSet[str]:
+    return frozenset(
+        str(opportunity[field]).lower()
+        for field in ("sport_key", "sport", "league")
+        if opportunity.get(field)
+    )
+
+def opportunity_bookmakers(opportunity: Dict) -> FrozenSet[str]:
+    """SGO opportunities list books under `bookmakers`, older detectors under `bookmakers_involved`"""
+    books = opportunity.get("bookmakers_involved") or opportunity.get("bookmakers") or []
+    return frozenset(str(bm).lower() for bm in books)
+
+
+class SubscriptionIndex:
+    """Preference index: sport token -> users, bookmaker mask -> users, user -> profit threshold"""
+
+    def __init__(self, max_per_user: Optional[int] = None):
+        self.max_per_user = max_per_user
+        self._thresholds: Dict[int, float] = {}
+        self._sport_users: Dict[str, Set[int]] = {}
+        self._any_sport_users: Set[int] = set()
+        self._mask_users: Dict[int, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._thresholds)
+
+    def add(
+        self,
+        user_id: int,
+        preferred_sports: Iterable[str] = (),
+        preferred_bookmakers: Iterable[str] = (),
+        min_profit: Optional[float] = None,
+    ):
+        self._thresholds[user_id] = min_profit or DEFAULT_MIN_PROFIT_THRESHOLD
+
+        sports = [s for s in preferred_sports if s and s.strip()]
+        if sports:
+            for sport_key in sports:
+                for token in preferred_sport_tokens(sport_key):
+                    self._sport_users.setdefault(token, set()).add(user_id)
+        else:
+            self._any_sport_users.add(user_id)
+
+        books = [b.strip().lower() for b in preferred_bookmakers if b and b.strip()] or DEFAULT_NOTIFICATION_BOOKMAKERS
+        self._mask_users.setdefault(bookmaker_bits.mask(books), set()).add(user_id)
+
+    def add_profile(self, profile):
+        """Index a UserProfile (comma-separated preferred_sports / preferred_bookmakers)"""
+        self.add(
+            profile.user_id,
+            _split_csv(profile.preferred_sports),
+            _split_csv(getattr(profile, "preferred_bookmakers", None)),
+            profile.minimum_profit_threshold,
+        )
+
+    @classmethod
+    def from_profiles(cls, profiles: Iterable, max_per_user: Optional[int] = None) -> "SubscriptionIndex":
+        index = cls(max_per_user=max_per_user)
+        for profile in profiles:
+            index.add_profile(profile)
+        return index
+
+    def _users_for_sports(self, tokens: FrozenSet[str], memo: Dict[FrozenSet[str], Set[int]]) -> Set[int]:
+        users = memo.get(tokens)
+        if users is None:
+            users = set(self._any_sport_users)
+            for token in tokens:
+                users |= self._sport_users.get(token, _EMPTY)
+            memo[tokens] = users
+        return users
+
+    def _eligible(self, users: Set[int], sport_users: Set[int], profit: float) -> Set[int]:
+        return {user_id for user_id in users if user_id in sport_users and profit >= self._thresholds[user_id]}
+
+    def match_variants(self, opportunity: Dict, _sport_memo: Optional[Dict] = None) -> List[Tuple[Dict, Set[int]]]:
+        """(opportunity as priced for them, user ids) for every group of users it matches"""
+        books = opportunity_bookmakers(opportunity)
+        if len(books) < 2:
+            return []  # Need at least 2 bookmakers for arbitrage
+
+        sport_users = self._users_for_sports(opportunity_sport_tokens(opportunity), _sport_memo if _sport_memo is not None else {})
+        if not sport_users:
+            return []
+        profit = opportunity.get("profit_percentage", 0) or 0
+
+        compiled = compile_ladder(opportunity)
+        if compiled is None:
+            # No prices to fall back on - every book must be selected
+            needed = bookmaker_bits.mask(books)
+            users = set()
+            for mask, mask_users in self._mask_users.items():
+                if mask & needed == needed:
+                    users |= self._eligible(mask_users, sport_users, profit)
+            return [(opportunity, users)] if users else []
+
+        ladder_mask = 0
+        for _, prices in compiled:
+            for bit, _ in prices:
+                ladder_mask |= bit
+        headline = best_mask(compiled)
+
+        # Selections that differ only in books this opportunity doesn't quote price identically
+        priced: Dict[int, Optional[Tuple[float, Tuple[int, ...]]]] = {}
+        variants: Dict[Tuple[int, ...], Tuple[Dict, Set[int]]] = {}
+        for mask, mask_users in self._mask_users.items():
+            projected = mask & ladder_mask
+            if not projected:
+                continue
+            if projected & headline == headline:
+                choice, variant_profit = None, profit
+            else:
+                if projected not in priced:
+                    priced[projected] = reprice(compiled, projected)
+                result = priced[projected]
+                if result is None:
+                    continue
+                variant_profit, choice = result
+            users = self._eligible(mask_users, sport_users, variant_profit)
+            if not users:
+                continue
+            if choice not in variants:
+                variant = opportunity if choice is None else repriced_opportunity(opportunity, compiled, (variant_profit, choice))
+                variants[choice] = (variant, set())
+            variants[choice][1].update(users)
+        return list(variants.values())
+
+    def match_opportunity(self, opportunity: Dict, _sport_memo: Optional[Dict] = None) -> Set[int]:
+        """User ids whose preferences accept this opportunity (at its headline or a re-priced price)"""
+        users = set()
+        for _, variant_users in self.match_variants(opportunity, _sport_memo):
+            users |= variant_users
+        return users
+
+    def match(self, opportunities: Iterable[Dict]) -> Dict[int, List[Dict]]:
+        """Single pass over the opportunities -> per-user batches (input order kept, capped at max_per_user)"""
+        batches: Dict[int, List[Dict]] = {}
+        sport_memo: Dict[FrozenSet[str], Set[int]] = {}
+        for opportunity in opportunities:
+            for variant, users in self.match_variants(opportunity, sport_memo):
+                for user_id in users:
+                    batch = batches.setdefault(user_id, [])
+                    if self.max_per_user is None or len(batch) < self.max_per_user:
+                        batch.append(variant)
+        return batches
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._thresholds),
+            "sport_tokens": len(self._sport_users),
+            "any_sport_users": len(self._any_sport_users),
+            "bookmaker_selections": len(self._mask_users),
+        }
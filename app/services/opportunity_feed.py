@@ -0,0 +1,150 @@
+# opportunity_feed.py
+"""
+Change feed between odds ingestion and the notification checker.
+
+SGOProLiveService publishes every freshly fetched upcoming-opportunity snapshot.
+The feed diffs it against the previous snapshot and queues only opportunities
+that newly appeared or whose profit improved materially; the notifier awaits
+those changes instead of re-running on a timer, so time-to-notify follows
+ingestion latency.
+
+Debounce: an opportunity that was emitted recently is not emitted again when it
+flaps out of and back into the snapshot within NOTIFY_DEBOUNCE_SECONDS - only a
+profit improvement of NOTIFY_MIN_PROFIT_IMPROVEMENT points re-emits it.
+
+Ingestion runs on scheduler threads with their own event loops, so publish()
+is thread-safe and wakes the consumer's loop with call_soon_threadsafe.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.notification_dedup import stable_opportunity_key
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DEBOUNCE_SECONDS = float(os.getenv("NOTIFY_DEBOUNCE_SECONDS", 300))
+NOTIFY_MIN_PROFIT_IMPROVEMENT = float(os.getenv("NOTIFY_MIN_PROFIT_IMPROVEMENT", 0.5))  # percentage points
+NOTIFY_COALESCE_SECONDS = float(os.getenv("NOTIFY_COALESCE_SECONDS", 2))
+
+
+class OpportunityFeed:
+    def __init__(
+        self,
+        debounce_seconds: float = NOTIFY_DEBOUNCE_SECONDS,
+        min_improvement: float = NOTIFY_MIN_PROFIT_IMPROVEMENT,
+        coalesce_seconds: float = NOTIFY_COALESCE_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.min_improvement = min_improvement
+        self.coalesce_seconds = coalesce_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._previous_keys: Set[str] = set()
+        self._emitted: Dict[str, Tuple[float, float]] = {}  # key -> (profit, emitted_at)
+        self._pending: Dict[str, Dict] = {}  # latest version of each changed opportunity
+
+        self._event: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.snapshots = 0
+        self.emitted_new = 0
+        self.emitted_improved = 0
+        self.suppressed = 0
+
+    def diff(self, snapshot: List[Dict]) -> List[Dict]:
+        """Record a snapshot and return the opportunities worth (re-)evaluating"""
+        now = self._clock()
+        changes = []
+        with self._lock:
+            current_keys = set()
+            for opportunity in snapshot:
+                key = stable_opportunity_key(opportunity)
+                if key in current_keys:
+                    continue
+                current_keys.add(key)
+                profit = opportunity.get("profit_percentage", 0) or 0
+                last = self._emitted.get(key)
+
+                if last is None or (key not in self._previous_keys and now - last[1] >= self.debounce_seconds):
+                    self.emitted_new += 1
+                elif profit >= last[0] + self.min_improvement:
+                    self.emitted_improved += 1
+                else:
+                    if key not in self._previous_keys:
+                        self.suppressed += 1  # flapped back within the debounce window
+                    continue
+
+                self._emitted[key] = (profit, now)
+                changes.append(opportunity)
+
+            # Forget emissions that are out of the snapshot and past the debounce window
+            for key in [k for k, (_, at) in self._emitted.items() if k not in current_keys and now - at >= self.debounce_seconds]:
+                del self._emitted[key]
+
+            self._previous_keys = current_keys
+            self.snapshots += 1
+        return changes
+
+    def publish(self, snapshot: List[Dict]) -> int:
+        """Called by ingestion with each fresh snapshot; queues changes and wakes the consumer"""
+        changes = self.diff(snapshot)
+        if not changes:
+            return 0
+        with self._lock:
+            for opportunity in changes:
+                self._pending[stable_opportunity_key(opportunity)] = opportunity
+            event, loop = self._event, self._event_loop
+        logger.info(f"📣 Opportunity feed: {len(changes)} new/improved of {len(snapshot)} in snapshot")
+        if event is not None and loop is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # consumer loop closed; changes stay queued for the next consumer
+        return len(changes)
+
+    async def next_changes(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Wait for queued changes (coalescing bursts); [] on timeout"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._event is None or self._event_loop is not loop:
+                self._event = asyncio.Event()
+                self._event_loop = loop
+            if self._pending:
+                self._event.set()
+            event = self._event
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        if self.coalesce_seconds:
+            await asyncio.sleep(self.coalesce_seconds)
+
+        with self._lock:
+            event.clear()
+            changes = list(self._pending.values())
+            self._pending.clear()
+        return changes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "snapshots": self.snapshots,
+                "emitted_new": self.emitted_new,
+                "emitted_improved": self.emitted_improved,
+                "suppressed_flaps": self.suppressed,
+                "pending": len(self._pending),
+                "tracked": len(self._emitted),
+            }
+
+
+# Shared feed: SGOProLiveService publishes, the notification checker consumes
+opportunity_feed = OpportunityFeed()
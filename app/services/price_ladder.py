@@ -0,0 +1,158 @@
+# price_ladder.py
+"""
+Top-k prices per side, for re-pricing an arbitrage on a bookmaker subset.
+
+An opportunity's best_odds holds only the single best price per side, so a user
+who excludes one of those books used to lose the arb entirely - even when the
+next-best price from a book they do use is still profitable. The detector now
+keeps the PRICE_LADDER_DEPTH best prices per side under `price_ladder`, and the
+notification matcher re-evaluates each opportunity per bookmaker selection:
+
+- bookmakers are mapped to bits (BookmakerBits), a user's selection is one int
+  mask, and a ladder compiles to per-side tuples of (bit, decimal odds)
+- reprice() walks each side's ladder and takes the first price whose bit is in
+  the mask - O(sides x k) integer ops, no re-analysis of the market
+- the re-priced arb keeps the detector's rules: at least two distinct books and
+  at least 0.01% profit
+
+Opportunities without a ladder (older detectors) compile from best_odds with
+depth 1, which is exactly the old "every book must be selected" rule.
+"""
+
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PRICE_LADDER_DEPTH = int(os.getenv("PRICE_LADDER_DEPTH", 3))
+
+# Same floor as the detector: near-0% arbs are not real opportunities
+MIN_REPRICED_PROFIT = 0.01
+
+# side -> ((bit, decimal odds), ...) best first
+CompiledLadder = Tuple[Tuple[str, Tuple[Tuple[int, float], ...]], ...]
+
+
+class BookmakerBits:
+    """Process-wide bookmaker -> bit assignment (lower-cased names)"""
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bit(self, bookmaker: str) -> int:
+        name = str(bookmaker).strip().lower()
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(name, 1 << len(self._bits))
+        return bit
+
+    def mask(self, bookmakers: Iterable[str]) -> int:
+        mask = 0
+        for bookmaker in bookmakers:
+            mask |= self.bit(bookmaker)
+        return mask
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+
+bookmaker_bits = BookmakerBits()
+
+
+def build_price_ladder(
+    odds_by_side: Dict[str, Dict[str, Dict]],
+    depth: int = PRICE_LADDER_DEPTH,
+    line=None,
+    accept: Optional[Callable[[Dict], bool]] = None,
+) -> Dict[str, List[Dict]]:
+    """Top `depth` prices per side (best first) from {side: {bookmaker: odds_info}}.
+
+    Only prices quoted at `line` (when given) and passing `accept` are kept, so
+    a fallback price never brings in a different line or a rejected book.
+    """
+    ladder = {}
+    for side, bookmaker_odds in odds_by_side.items():
+        prices = [
+            info for info in bookmaker_odds.values()
+            if (line is None or info.get("line") == line) and (accept is None or accept(info))
+        ]
+        prices.sort(key=lambda info: info["odds"], reverse=True)
+        if prices:
+            ladder[side] = [
+                {key: info[key] for key in ("bookmaker", "odds", "american_odds", "line") if key in info}
+                for info in prices[:depth]
+            ]
+    return ladder
+
+def compile_ladder(opportunity: Dict) -> Optional[CompiledLadder]:
+    """Bit/odds form of the opportunity's ladder (best_odds at depth 1 when it has none)"""
+    ladder = opportunity.get("price_ladder")
+    if not ladder:
+        best_odds = opportunity.get("best_odds")
+        if not best_odds or not all(isinstance(info, dict) and info.get("odds") for info in best_odds.values()):
+            return None
+        ladder = {side: [info] for side, info in best_odds.items()}
+    return tuple(
+        (side, tuple((bookmaker_bits.bit(info["bookmaker"]), float(info["odds"])) for info in prices))
+        for side, prices in ladder.items()
+    )
+
+def best_mask(compiled: CompiledLadder) -> int:
+    """Bits of the books behind the opportunity's headline (all-book) price"""
+    mask = 0
+    for _, prices in compiled:
+        mask |= prices[0][0]
+    return mask
+
+def reprice(compiled: CompiledLadder, mask: int) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Best arb available on the books in `mask`: (profit %, ladder index per side), or None"""
+    picks = []
+    for _, prices in compiled:
+        allowed = [i for i, (bit, _) in enumerate(prices) if bit & mask]
+        if not allowed:
+            return None
+        picks.append(allowed)
+
+    def profit(choice):
+        return (1 / sum(1 / compiled[s][1][i][1] for s, i in enumerate(choice)) - 1) * 100
+
+    def distinct_books(choice):
+        return len({compiled[s][1][i][0] for s, i in enumerate(choice)})
+
+    choice = tuple(allowed[0] for allowed in picks)
+    if distinct_books(choice) < 2:
+        # Every side's best allowed price is the same book - move one side to its next book
+        alternatives = [
+            choice[:s] + (i,) + choice[s + 1:]
+            for s, allowed in enumerate(picks)
+            for i in allowed[1:]
+        ]
+        alternatives = [alt for alt in alternatives if distinct_books(alt) >= 2]
+        if not alternatives:
+            return None
+        choice = max(alternatives, key=profit)
+
+    value = profit(choice)
+    if value < MIN_REPRICED_PROFIT:
+        return None
+    return value, choice
+
+def repriced_opportunity(opportunity: Dict, compiled: CompiledLadder, result: Tuple[float, Tuple[int, ...]]) -> Dict:
+    """Copy of the opportunity with best_odds/bookmakers/profit for the chosen ladder prices"""
+    profit, choice = result
+    ladder = opportunity.get("price_ladder") or {side: [info] for side, info in opportunity["best_odds"].items()}
+    original = opportunity.get("best_odds", {})
+    best_odds = {}
+    for (side, _), index in zip(compiled, choice):
+        price = ladder[side][index]
+        # Keep fields the ladder doesn't carry (validation etc.) when the price is unchanged
+        best_odds[side] = original[side] if index == 0 and side in original else dict(price)
+
+    repriced = dict(opportunity)
+    repriced["best_odds"] = best_odds
+    repriced["profit_percentage"] = round(profit, 2)
+    repriced["bookmakers"] = [info["bookmaker"] for info in best_odds.values()]
+    repriced.pop("bookmakers_involved", None)
+    repriced["repriced_from"] = opportunity.get("profit_percentage")
+    return repriced
@@ -5,6 +5,8 @@ SGO Pro Live Service - Optimized for Pro plan with live odds detection
 import os
 import asyncio
 import aiohttp
+import contextvars
+import json
 import logging
 import random
 import time
@@ -13,7 +15,9 @@ from datetime import datetime, timedelta, timezone
 import dateutil.parser
 from app.core.config import SGO_API_KEY, STALE_DATA_THRESHOLD_MINUTES
 from app.services.market_grouper import MarketGrouper
+from app.services.price_ladder import build_price_ladder
 from app.core.database import SessionLocal, BettingOdds
+from app.core.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +32,9 @@ class SGOProLiveService:
     _request_count = 0
     _max_requests_per_minute = 290
     
+    # DFS/Fantasy platforms and placeholder books create fake arbitrage opportunities
+    SUSPICIOUS_BOOKMAKERS = ["underdog", "prizepicks", "superpicks", "parlayplay", "unknown", "generic", "test", "demo"]
+    
     def __init__(self):
         # Get API key from environment variable (production) or use Pro plan key
         self.api_key = os.getenv("SGO_API_KEY")
@@ -74,6 +81,15 @@ class SGOProLiveService:
         # Sport-specific validation rules (builds on existing algorithm)
         self._init_sport_validation_rules()
         
+    def _save_odds_in_background(self, events: List[Dict[str, Any]]):
+        """Run save_odds_to_database on the default executor, traced under the current span"""
+        context = contextvars.copy_context()
+        asyncio.get_running_loop().run_in_executor(None, context.run, self._save_odds_traced, events)
+
+    def _save_odds_traced(self, events: List[Dict[str, Any]]):
+        with tracer.span("db.save_odds", events=len(events)):
+            self.save_odds_to_database(events)
+
     def save_odds_to_database(self, events: List[Dict[str, Any]]):
         """
         Save fetched odds to the database for debugging and 'View Odds' feature.
@@ -473,13 +489,14 @@ class SGOProLiveService:
         try:
             async with self.session.get(url, headers=headers, params=params) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    body = await response.read()
+                    with tracer.span("sgo.json_decode", bytes=len(body)):
+                        data = json.loads(body)
                     
                     # Log SGO structure ONCE only
                     if data.get("data") and not self._logged_structure:
                         events = data["data"]
                         if events:
-                            import json
                             logger.debug(f"🔴 SGO STRUCTURE: {json.dumps(events[0], indent=2)}")
                             self._logged_structure = True
                     
@@ -551,14 +568,16 @@ class SGOProLiveService:
                 start_date = (today - timedelta(hours=6)).strftime("%Y-%m-%d")  # Allow games from 6 hours ago
                 end_date = today.strftime("%Y-%m-%d")
                 
-                live_data = await self._make_request("/events", {
-                    "live": "true",
-                    "limit": 20,
-                    "status": "active",  # Only active events
-                    "startDate": start_date,  # From 6 hours ago
-                    "endDate": end_date,  # Until today
-                    "oddsAvailable": "true"  # Only events with odds
-                })
+                with tracer.span("sgo.fetch", sport="live") as fetch_span:
+                    live_data = await self._make_request("/events", {
+                        "live": "true",
+                        "limit": 20,
+                        "status": "active",  # Only active events
+                        "startDate": start_date,  # From 6 hours ago
+                        "endDate": end_date,  # Until today
+                        "oddsAvailable": "true"  # Only events with odds
+                    })
+                    fetch_span.set_attribute("events", len(live_data.get("data") or []))
                 
                 logger.debug(f"🔍 LIVE GAMES DEBUG: SGO API response status: {live_data.get('success', 'unknown')}")
                 if live_data.get("data"):
@@ -572,8 +591,7 @@ class SGOProLiveService:
                     # Save raw odds to database for debugging and 'View Odds' feature
                     # PERF: Run DB save in background thread to avoid blocking response
                     try:
-                        loop = asyncio.get_running_loop()
-                        loop.run_in_executor(None, self.save_odds_to_database, live_events)
+                        self._save_odds_in_background(live_events)
                     except Exception as e:
                         logger.error(f"Error triggering background DB save: {e}")
                     
@@ -689,6 +707,13 @@ class SGOProLiveService:
             # 5. Update Cache
             self.__class__._cache = result
             self.__class__._cache_time = datetime.now()
+            
+            # 6. Hand the fresh snapshot to the notification feed (only diffs are queued)
+            try:
+                from app.services.opportunity_feed import opportunity_feed
+                opportunity_feed.publish(result)
+            except Exception as e:
+                logger.error(f"❌ Failed to publish opportunities to notification feed: {e}")
             return result
 
     async def _fetch_upcoming_internal(self) -> List[Dict[str, Any]]:
@@ -735,8 +760,7 @@ class SGOProLiveService:
             # Save raw odds to database for debugging and 'View Odds' feature
             if all_upcoming_events:
                 # PERF: Run DB save in background thread to avoid blocking response
-                loop = asyncio.get_running_loop()
-                loop.run_in_executor(None, self.save_odds_to_database, all_upcoming_events)
+                self._save_odds_in_background(all_upcoming_events)
                 logger.info("💾 Triggered background DB save for upcoming events")
             
             if not all_upcoming_events:
@@ -761,31 +785,34 @@ class SGOProLiveService:
                 analysis_tasks.append(self._analyze_upcoming_event_for_arbitrage(event))
             
             # Execute all checks at once
-            analysis_results = await asyncio.gather(*analysis_tasks, return_exceptions=True)
-            
-            for result in analysis_results:
-                if isinstance(result, Exception):
-                     # Log but don't crash
-                    logger.debug(f"Analysis error: {str(result)}")
-                    continue
+            with tracer.span("arbitrage.analysis", events=len(analysis_tasks)):
+                analysis_results = await asyncio.gather(*analysis_tasks, return_exceptions=True)
+            
+            with tracer.span("arbitrage.validation", candidates=len(analysis_results)) as validation_span:
+                for result in analysis_results:
+                    if isinstance(result, Exception):
+                         # Log but don't crash
+                        logger.debug(f"Analysis error: {str(result)}")
+                        continue
                     
-                if result: # If opportunity found
-                    opp = result
-                    try:
-                        # Validate data quality before adding
-                        validated_opp = self._validate_arbitrage_opportunity(opp)
-                        validation = validated_opp.get('validation', {})
-                        confidence_score = validation.get('confidence_score', 0)
+                    if result: # If opportunity found
+                        opp = result
+                        try:
+                            # Validate data quality before adding
+                            validated_opp = self._validate_arbitrage_opportunity(opp)
+                            validation = validated_opp.get('validation', {})
+                            confidence_score = validation.get('confidence_score', 0)
                         
-                        if confidence_score > 0.1:
-                            accessibility = self._categorize_opportunity_accessibility(validated_opp)
-                            validated_opp['accessibility'] = accessibility
+                            if confidence_score > 0.1:
+                                accessibility = self._categorize_opportunity_accessibility(validated_opp)
+                                validated_opp['accessibility'] = accessibility
                             
-                            opportunities.append(validated_opp)
-                            confidence = validation.get('data_quality', 'unknown')
-                            logger.info(f"🎯 UPCOMING ARBITRAGE FOUND ({confidence}): {validated_opp['home_team']} vs {validated_opp['away_team']} - {validated_opp['profit_percentage']}% profit")
-                    except Exception as e:
-                        logger.error(f"Error validating opportunity: {e}")
+                                opportunities.append(validated_opp)
+                                confidence = validation.get('data_quality', 'unknown')
+                                logger.info(f"🎯 UPCOMING ARBITRAGE FOUND ({confidence}): {validated_opp['home_team']} vs {validated_opp['away_team']} - {validated_opp['profit_percentage']}% profit")
+                        except Exception as e:
+                            logger.error(f"Error validating opportunity: {e}")
+                validation_span.set_attribute("opportunities", len(opportunities))
             
             analysis_time = time.time() - analysis_start
             logger.info(f"⏱️ ANALYSIS TIME: {analysis_time:.2f}s | {len(opportunities)} opportunities")
@@ -849,7 +876,9 @@ class SGOProLiveService:
                 params["sportID"] = sport_id
             
             # Get events for the next 7 days
-            response = await self._make_request("events", params)
+            with tracer.span("sgo.fetch", sport=sport_id or "all") as fetch_span:
+                response = await self._make_request("events", params)
+                fetch_span.set_attribute("events", len(response.get("data") or []))
             
             if response.get("success") is False:
                 logger.error(f"SGO API error: {response.get('error')}")
@@ -4070,6 +4099,14 @@ class SGOProLiveService:
                     #     logger.error(f"🔴 FINAL NHL BLOCK: {home_team} vs {away_team} - NHL team detected at opportunity creation")
                     #     continue
                     
+                    # Top-k prices per side at the validated line, so the notifier can
+                    # re-price this arb for users who don't use one of the best books
+                    price_ladder = build_price_ladder(
+                        odds_data,
+                        line=next(iter(line_values)),
+                        accept=lambda info: self._is_ladder_price_usable(info, market_id, sport),
+                    )
+                    
                     # Create opportunity object
                     opportunity = {
                         "id": f"sgo_pro_{game_type.lower()}_{event_id}_{market_info['market_type']}",
@@ -4082,6 +4119,7 @@ class SGOProLiveService:
                         "market_description": market_info.get("detailed_market_description", market_info["market_description"]),
                         "profit_percentage": round(profit_percentage, 2),
                         "best_odds": best_odds,
+                        "price_ladder": price_ladder,
                         "line": line_value,
                         "confidence_score": 0.8,
                         "confidence": confidence,
@@ -4276,8 +4314,7 @@ class SGOProLiveService:
             return True  # Cannot have arbitrage with the same bookmaker
         
         # Pattern 4: Known problematic bookmaker combinations (DFS/Fantasy platforms)
-        suspicious_bookmakers = ["underdog", "prizepicks", "superpicks", "parlayplay", "unknown", "generic", "test", "demo"]
-        if any(bm.lower() in suspicious_bookmakers for bm in bookmakers):
+        if any(bm.lower() in self.SUSPICIOUS_BOOKMAKERS for bm in bookmakers):
             # DFS/Fantasy platforms create fake arbitrage opportunities - always reject
                 return True
         
@@ -4292,6 +4329,13 @@ class SGOProLiveService:
         
         return False
 
+    def _is_ladder_price_usable(self, odds_info: dict, market_id: str, sport: str = "UNKNOWN") -> bool:
+        """Fallback prices in a price ladder get the same per-book checks as best odds"""
+        bookmaker = odds_info.get("bookmaker", "")
+        if bookmaker.lower() in self.SUSPICIOUS_BOOKMAKERS:
+            return False
+        return not self._is_phantom_line(bookmaker, odds_info.get("line"), market_id, sport)
+
     def _is_phantom_line(self, bookmaker: str, line_value: float, market_id: str, sport: str = "UNKNOWN") -> bool:
         """
         Detect phantom lines that don't exist on actual bookmaker sites.
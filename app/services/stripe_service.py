@@ -6,6 +6,7 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.subscription import UserSubscription, SubscriptionPlan, SubscriptionPayment
+from app.services.subscription_tier import invalidate_user_tier
 
 # Initialize Stripe
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
@@ -182,6 +183,7 @@ class StripeService:
                  sub.status = 'active'
                  sub.stripe_subscription_id = subscription_id
                  self.db.commit()
+                 invalidate_user_tier(sub.user_id)
                  logger.info(f"Updated subscription for customer {stripe_customer_id} to ACTIVE")
                  return
 
@@ -192,6 +194,7 @@ class StripeService:
                 sub.stripe_customer_id = stripe_customer_id
                 sub.stripe_subscription_id = subscription_id
                 self.db.commit()
+                invalidate_user_tier(sub.user_id)
                 logger.info(f"Updated subscription for user {user_id} to ACTIVE")
 
     def _handle_subscription_updated(self, stripe_sub):
@@ -205,6 +208,7 @@ class StripeService:
         if sub:
             sub.status = status
             self.db.commit()
+            invalidate_user_tier(sub.user_id)
             logger.info(f"Synced subscription {stripe_sub_id} status to {status}")
 
     def _handle_subscription_deleted(self, stripe_sub):
@@ -216,4 +220,5 @@ class StripeService:
         if sub:
             sub.status = 'canceled'
             self.db.commit()
+            invalidate_user_tier(sub.user_id)
             logger.info(f"Subscription {stripe_sub_id} marked as CANCELED")
\ No newline at end of file
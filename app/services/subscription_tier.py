@@ -0,0 +1,95 @@
+# subscription_tier.py
+"""
+Cached subscription-tier resolution.
+
+Tiers only change through the Stripe webhook handlers in StripeService, which
+call invalidate_user_tier() after committing, so lookups can be served from
+TierCache for the TTL without going back to user_subscriptions.
+"""
+
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.cache import TTLCache
+from app.models.subscription import UserSubscription
+
+logger = logging.getLogger(__name__)
+
+TIER_CACHE_TTL_SECONDS = int(os.getenv("TIER_CACHE_TTL_SECONDS", 300))
+TIER_CACHE_MAX_USERS = int(os.getenv("TIER_CACHE_MAX_USERS", 50000))
+
+# Bulk lookups are issued in IN (...) chunks of this size (SQLite caps bound parameters)
+BULK_LOOKUP_CHUNK_SIZE = 500
+
+# Subscription statuses that grant access
+ACTIVE_STATUSES = ["active", "trialing"]
+
+# Values: "premium", "basic" or "no_subscription"
+_tier_cache = TTLCache(maxsize=TIER_CACHE_MAX_USERS, ttl=TIER_CACHE_TTL_SECONDS, namespace="tier")
+
+def subscription_status_from(subscription: Optional[UserSubscription]) -> str:
+    """Map an active/trialing UserSubscription (or None) to a subscription status"""
+    if not subscription:
+        return "no_subscription"
+    if subscription.status == "trialing":
+        return "premium"  # Trial users get premium features
+    plan_name = (getattr(getattr(subscription, "plan", None), "name", "") or "").lower()
+    return "premium" if "premium" in plan_name else "basic"
+
+def get_subscription_status(user_id: int, db: Session) -> str:
+    """Return "premium", "basic" or "no_subscription" for a user (cached)"""
+    def load():
+        subscription = db.query(UserSubscription).filter(
+            UserSubscription.user_id == user_id,
+            UserSubscription.status.in_(ACTIVE_STATUSES)
+        ).first()
+        return subscription_status_from(subscription)
+
+    return _tier_cache.get_or_load(user_id, load)
+
+def get_subscription_statuses(user_ids: Iterable[int], db: Session) -> Dict[int, str]:
+    """Bulk get_subscription_status: cache hits first, then one grouped query per chunk of misses"""
+    statuses: Dict[int, str] = {}
+    missing = []
+    for user_id in user_ids:
+        status = _tier_cache.get(user_id)
+        if status is None:
+            missing.append(user_id)
+        else:
+            statuses[user_id] = status
+
+    for i in range(0, len(missing), BULK_LOOKUP_CHUNK_SIZE):
+        chunk = missing[i:i + BULK_LOOKUP_CHUNK_SIZE]
+        subscriptions = db.query(UserSubscription).options(selectinload(UserSubscription.plan)).filter(
+            UserSubscription.user_id.in_(chunk),
+            UserSubscription.status.in_(ACTIVE_STATUSES)
+        ).all()
+        by_user: Dict[int, UserSubscription] = {}
+        for subscription in subscriptions:
+            by_user.setdefault(subscription.user_id, subscription)
+        for user_id in chunk:
+            status = subscription_status_from(by_user.get(user_id))
+            _tier_cache.set(user_id, status)
+            statuses[user_id] = status
+
+    return statuses
+
+def get_user_tier(user_id: int, db: Session) -> str:
+    """Collapse the subscription status to the 'premium'/'basic' tier used for gating"""
+    try:
+        return "premium" if get_subscription_status(user_id, db) == "premium" else "basic"
+    except Exception:
+        return "basic"
+
+def invalidate_user_tier(user_id: Optional[int]):
+    """Drop a user's cached tier; called whenever their subscription changes"""
+    if user_id is None:
+        return
+    _tier_cache.invalidate(int(user_id))
+    logger.info(f"🔄 Invalidated cached subscription tier for user {user_id}")
+
+def get_tier_cache_stats() -> dict:
+    return _tier_cache.stats()
@@ -14,46 +14,62 @@ No fake/fallback data is used. If no real opportunities exist, no emails are sen
 import asyncio
 import logging
 import os
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone, date
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, case, func, insert, select
 
-from app.core.database import SessionLocal
+from app.core.database import AsyncSessionLocal
 from app.models.user import User, UserProfile, UserEmailNotificationLog
-from app.models.subscription import UserSubscription
-from scripts.email_verification import send_email
+from app.services.subscription_tier import BULK_LOOKUP_CHUNK_SIZE, get_subscription_status, get_subscription_statuses
+from app.services.notification_matcher import SubscriptionIndex
+from app.services.notification_dedup import get_notified_keys, record_notified, stable_opportunity_key
+from app.services.opportunity_feed import opportunity_feed
+from app.services.email_dispatcher import EmailMessage, email_sender
+from app.services.email_outbox import enqueue_emails
+from app.services.email_templates import ALERT_MORE, ALERT_MULTI, ALERT_ROW, ALERT_SINGLE, ALERT_TEST_HEADER, FragmentCache
 from app.core.config import IS_RAILWAY_DEPLOYMENT
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Heartbeat log interval while the ingestion feed reports no changes
+NOTIFY_IDLE_LOG_SECONDS = 600
+
+# Always use production domain for email links - ready for launch
+EMAIL_FRONTEND_URL = "https://arbify.net"
+
+@dataclass
+class NotificationState:
+    """Everything the checker needs to decide whether a user can be emailed this cycle"""
+    user_id: int
+    profile: Optional[UserProfile]
+    subscription_status: str
+    sent_today: int = 0
+    last_sent_at: Optional[datetime] = None
+    notified_keys: set = field(default_factory=set)  # unexpired stable_opportunity_key()s
+
+@dataclass
+class PendingNotification:
+    """A rendered alert waiting to be dispatched"""
+    user: User
+    opportunities: List[Dict]
+    message: EmailMessage
+
 class ArbitrageNotificationService:
     def __init__(self):
         self.last_check_time = datetime.utcnow()
-        self.sent_notifications = {}  # Track sent notifications to prevent duplicates
         self.consecutive_errors = 0  # Track consecutive errors to prevent spam loops
         
     def get_user_subscription_status(self, user_id: int, db: Session) -> str:
-        """Get user's subscription status"""
+        """Get user's subscription status (served from the shared tier cache)"""
         try:
-            subscription = db.query(UserSubscription).filter(
-                UserSubscription.user_id == user_id,
-                UserSubscription.status.in_(["active", "trialing"])
-            ).first()
-            
-            if subscription:
-                if subscription.status == "trialing":
-                    return "premium"  # Trial users get premium features
-                else:
-                    # Check plan name to determine tier
-                    if "premium" in subscription.plan.name.lower():
-                        return "premium"
-                    else:
-                        return "basic"
-            
-            return "no_subscription"  # Users without subscription should not get basic access
+            # Users without subscription get "no_subscription" and no basic access
+            return get_subscription_status(user_id, db)
         except Exception as e:
             logger.error(f"Error getting subscription status for user {user_id}: {str(e)}")
             return "no_subscription"
@@ -96,9 +112,21 @@ class ArbitrageNotificationService:
 
     def can_send_email_today(self, user_id: int, subscription_status: str, db: Session) -> bool:
         """Check if user can receive another email today with cooldown logic"""
+        try:
+            return self.can_send_with_history(
+                user_id,
+                subscription_status,
+                self.get_daily_email_count(user_id, db),
+                self.get_last_email_time(user_id, db),
+            )
+        except Exception as e:
+            logger.error(f"Error checking email limit for user {user_id}: {str(e)}")
+            return False  # Fail closed
+
+    def can_send_with_history(self, user_id: int, subscription_status: str, today_count: int, last_sent: Optional[datetime]) -> bool:
+        """Daily limit + cooldown check from already-loaded send history"""
         try:
             daily_limit = self.get_daily_email_limit(subscription_status)
-            today_count = self.get_daily_email_count(user_id, db)
             
             # Check daily limit first
             if today_count >= daily_limit:
@@ -106,7 +134,6 @@ class ArbitrageNotificationService:
                 return False
             
             # Implement cooldown periods based on subscription
-            last_sent = self.get_last_email_time(user_id, db)
             if last_sent:
                 # Ensure last_sent is timezone-aware if needed, or naive if comparing to naive
                 # Assuming sent_at is stored as naive UTC in DB (default behavior)
@@ -134,6 +161,49 @@ class ArbitrageNotificationService:
             logger.error(f"Error checking email limit for user {user_id}: {str(e)}")
             return False  # Fail closed
 
+    def load_notification_states(self, user_ids: Iterable[int], db: Session) -> Dict[int, NotificationState]:
+        """Bulk-load profiles, subscription status, send history and dedup keys.
+        
+        Replaces the per-user profile/subscription/count/last-sent queries with a
+        fixed number of grouped queries per chunk of users.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        statuses = get_subscription_statuses(user_ids, db)
+        notified_keys = get_notified_keys(user_ids, db)
+        today_start = datetime.combine(date.today(), datetime.min.time())
+        
+        profiles: Dict[int, UserProfile] = {}
+        history: Dict[int, tuple] = {}
+        for i in range(0, len(user_ids), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = user_ids[i:i + BULK_LOOKUP_CHUNK_SIZE]
+            
+            for profile in db.query(UserProfile).filter(UserProfile.user_id.in_(chunk)):
+                profiles.setdefault(profile.user_id, profile)
+            
+            rows = db.query(
+                UserEmailNotificationLog.user_id,
+                func.count(case((UserEmailNotificationLog.sent_at >= today_start, 1))),
+                func.max(UserEmailNotificationLog.sent_at),
+            ).filter(
+                UserEmailNotificationLog.user_id.in_(chunk),
+                UserEmailNotificationLog.email_type == 'arbitrage_alert'
+            ).group_by(UserEmailNotificationLog.user_id)
+            for user_id, sent_today, last_sent_at in rows:
+                history[user_id] = (sent_today, last_sent_at)
+        
+        states = {}
+        for user_id in user_ids:
+            sent_today, last_sent_at = history.get(user_id, (0, None))
+            states[user_id] = NotificationState(
+                user_id=user_id,
+                profile=profiles.get(user_id),
+                subscription_status=statuses.get(user_id, "no_subscription"),
+                sent_today=sent_today,
+                last_sent_at=last_sent_at,
+                notified_keys=notified_keys.get(user_id, set()),
+            )
+        return states
+    
     def log_notification(self, user_id: int, db: Session, status: str = "sent", details: str = None):
         """Log a sent notification"""
         try:
@@ -151,69 +221,106 @@ class ArbitrageNotificationService:
             logger.error(f"Error logging notification for user {user_id}: {str(e)}")
             db.rollback()
     
-    def cleanup_old_email_logs(self, db: Session):
-        """Clean up email logs older than 7 days to keep database lean"""
+    def record_deliveries(self, pending: List[PendingNotification], db: Session) -> int:
+        """Queue a burst of alerts in the email outbox, log them and mark them notified, in one commit"""
         try:
-            cutoff_date = date.today() - timedelta(days=7)
-            
-            deleted_count = db.query(UserEmailNotificationLog).filter(
-                UserEmailNotificationLog.sent_at < cutoff_date
-            ).delete()
-            
-            if deleted_count > 0:
-                db.commit()
-                logger.info(f"🧹 Cleaned up {deleted_count} old email log records (older than {cutoff_date})")
-            
+            now = datetime.utcnow()
+            enqueue_emails(db, [(notification.message, notification.user.id) for notification in pending])
+            db.execute(insert(UserEmailNotificationLog), [
+                {
+                    "user_id": notification.user.id,
+                    "email_type": 'arbitrage_alert',
+                    "sent_at": now,
+                    "status": "queued",
+                    "details": f"Queued {len(notification.opportunities)} opportunities",
+                }
+                for notification in pending
+            ])
+            record_notified([(notification.user.id, notification.opportunities) for notification in pending], db, now=now)
+            db.commit()
+            logger.info(f"📧 Queued and logged {len(pending)} notifications")
+            return len(pending)
         except Exception as e:
-            logger.error(f"Error cleaning up old email logs: {str(e)}")
+            logger.error(f"Error queueing {len(pending)} notifications: {str(e)}")
             db.rollback()
+            return 0
     
-    async def check_and_notify_users(self):
-        """Main function to check for opportunities and notify users"""
+    async def check_and_notify_users(self, opportunities: Optional[List[Dict]] = None):
+        """Match opportunities against every subscriber and send notifications.
+        
+        The background checker passes only the new/improved opportunities from the
+        ingestion feed; manual triggers pass nothing and evaluate the full snapshot.
+        """
         try:
             logger.info("🔍 Checking for arbitrage opportunities...")
             
             # Reset consecutive errors on successful start
             self.consecutive_errors = 0
             
-            db = SessionLocal()
+            if opportunities is None:
+                opportunities = await self.fetch_upcoming_opportunities()
             
-            # Clean up old email logs (run once per check cycle)
-            self.cleanup_old_email_logs(db)
-            try:
+            if not any(opp.get('profit_percentage', 0) >= 0.5 for opp in opportunities):
+                logger.info("ℹ️ No real arbitrage opportunities found - skipping email notifications")
+                return
+            
+            async with AsyncSessionLocal() as db:
                 # Get all users with email notifications enabled
-                users_to_notify = db.query(User).join(UserProfile).filter(
-                    and_(
-                        User.is_active == True,
-                        User.is_verified == True,
-                        UserProfile.notification_email == True
+                result = await db.scalars(
+                    select(User).join(UserProfile).where(
+                        and_(
+                            User.is_active == True,
+                            User.is_verified == True,
+                            UserProfile.notification_email == True
+                        )
                     )
-                ).all()
+                )
+                subscribers = result.unique().all()
                 
-                logger.info(f"📧 Found {len(users_to_notify)} users with email notifications enabled")
+                logger.info(f"📧 Found {len(subscribers)} users with email notifications enabled")
                 
-                if not users_to_notify:
+                if not subscribers:
                     logger.info("ℹ️ No users found with email notifications enabled")
                     return
                 
-                # Check if we have any real opportunities first before processing users
-                has_real_opportunities = await self.check_for_any_real_opportunities()
+                # Prefetch profiles, subscriptions and send history for every candidate at once
+                states = await db.run_sync(lambda s: self.load_notification_states([user.id for user in subscribers], s))
                 
-                if not has_real_opportunities:
-                    logger.info("ℹ️ No real arbitrage opportunities found - skipping email notifications")
-                    return
+                # Index preferences once, then match each opportunity against the index
+                match_start = time.perf_counter()
+                index = SubscriptionIndex.from_profiles(
+                    (state.profile for state in states.values() if state.profile is not None),
+                    max_per_user=self.get_max_opportunities_per_email(),
+                )
+                batches = index.match(opportunities)
+                logger.info(
+                    f"🔎 Matched {len(opportunities)} opportunities against {len(index)} subscribers "
+                    f"in {(time.perf_counter() - match_start) * 1000:.1f}ms - {len(batches)} users have matches"
+                )
                 
-                for user in users_to_notify:
+                # Opportunity fragments are rendered once per cycle and shared across recipients
+                render_cache = FragmentCache()
+                pending = []
+                for user in subscribers:
+                    batch = batches.get(user.id)
+                    if not batch:
+                        continue
                     try:
-                        await self.check_user_opportunities(user, db)
-                        # Add small delay between users to respect rate limits
-                        await asyncio.sleep(0.5)
+                        notification = self.prepare_notification(user, batch, states[user.id], render_cache)
+                        if notification:
+                            pending.append(notification)
                     except Exception as e:
                         logger.error(f"❌ Error processing user {user.email}: {str(e)}")
                         continue
-                        
-            finally:
-                db.close()
+                
+                if pending:
+                    render_stats = render_cache.stats()
+                    logger.info(
+                        f"🖋️ Rendered {len(pending)} notification emails in {render_stats['render_ms']:.1f}ms "
+                        f"({render_stats['misses']} fragments rendered, {render_stats['hits']} reused)"
+                    )
+                
+                await self.deliver_notifications(pending, db)
             
         except Exception as e:
             self.consecutive_errors += 1
@@ -224,47 +331,14 @@ class ArbitrageNotificationService:
                 logger.error("❌ Too many consecutive errors - extending wait time")
                 raise Exception("Too many consecutive errors - stopping to prevent spam")
     
-    async def check_for_any_real_opportunities(self) -> bool:
-        """Quick check to see if any real arbitrage opportunities exist using NEW SGO API"""
-        try:
-            # Import the NEW SGO service
-            from app.services.sgo_pro_live_service import SGOProLiveService
-            
-            async with SGOProLiveService() as sgo_service:
-                # Check for upcoming arbitrage opportunities
-                opportunities = await sgo_service.get_upcoming_arbitrage_opportunities()
-                
-                # Filter for valid opportunities
-                valid_opps = [
-                    opp for opp in opportunities
-                    if opp.get('profit_percentage', 0) >= 0.5
-                ]
-                
-                if valid_opps:
-                    logger.info(f"✅ Found {len(valid_opps)} real SGO arbitrage opportunities")
-                    return True
-                else:
-                    logger.info("ℹ️ No SGO arbitrage opportunities found above 0.5% profit threshold")
-                    return False
-            
-        except Exception as e:
-            logger.error(f"Error checking SGO opportunities: {str(e)}")
-            return False
-    
-    async def check_user_opportunities(self, user: User, db: Session):
+    async def check_user_opportunities(self, user: User, db: AsyncSession):
         """Check opportunities for a specific user and send notifications"""
         try:
-            profile = db.query(UserProfile).filter(UserProfile.user_id == user.id).first()
+            state = (await db.run_sync(lambda s: self.load_notification_states([user.id], s)))[user.id]
+            profile = state.profile
             if not profile or not profile.notification_email:
                 return
             
-            # Check subscription status and daily limits
-            subscription_status = self.get_user_subscription_status(user.id, db)
-            
-            if not self.can_send_email_today(user.id, subscription_status, db):
-                logger.info(f"📧 Daily email limit reached for user {user.email} (subscription: {subscription_status})")
-                return
-            
             # Parse user preferences
             preferred_sports = profile.preferred_sports.split(",") if profile.preferred_sports else []
             min_profit_threshold = profile.minimum_profit_threshold or 1.0
@@ -273,26 +347,53 @@ class ArbitrageNotificationService:
             opportunities = await self.fetch_real_arbitrage_opportunities(preferred_sports, min_profit_threshold, profile)
             
             if opportunities:
-                # Filter out opportunities we've already notified about
-                new_opportunities = self.filter_new_opportunities(user.id, opportunities)
-                
-                if new_opportunities:
-                    logger.info(f"📧 Sending notification to {user.email} for {len(new_opportunities)} new REAL opportunities (subscription: {subscription_status})")
-                    success = await self.send_notification_email(user.email, new_opportunities, subscription_status)
-                    
-                    if success:
-                        # Track that we've notified about these opportunities
-                        self.mark_opportunities_notified(user.id, new_opportunities)
-                        # Log notification
-                        self.log_notification(user.id, db, status="sent", details=f"Sent {len(new_opportunities)} opportunities")
-                else:
-                    logger.info(f"ℹ️ No new opportunities for user {user.email}")
+                await self.notify_user(user, opportunities, db, state=state)
             else:
                 logger.info(f"ℹ️ No real arbitrage opportunities found for user {user.email} (min profit: {min_profit_threshold}%)")
             
         except Exception as e:
             logger.error(f"❌ Error checking opportunities for user {user.email}: {str(e)}")
     
+    async def notify_user(self, user: User, opportunities: List[Dict], db: AsyncSession, state: Optional[NotificationState] = None):
+        """Apply subscription limits and dedup to a user's matched opportunities, then email them"""
+        if state is None:
+            state = (await db.run_sync(lambda s: self.load_notification_states([user.id], s)))[user.id]
+        pending = self.prepare_notification(user, opportunities, state)
+        if pending:
+            await self.deliver_notifications([pending], db)
+    
+    def prepare_notification(self, user: User, opportunities: List[Dict], state: NotificationState, render_cache: Optional[FragmentCache] = None) -> Optional[PendingNotification]:
+        """Limits + dedup + rendering for one user; None when nothing should be sent"""
+        render_cache = render_cache if render_cache is not None else FragmentCache()
+        subscription_status = state.subscription_status
+        
+        can_send = self.can_send_with_history(user.id, subscription_status, state.sent_today, state.last_sent_at)
+        if not can_send:
+            logger.info(f"📧 Daily email limit reached for user {user.email} (subscription: {subscription_status})")
+            return None
+        
+        # Filter out opportunities we've already notified about
+        new_opportunities = self.filter_new_opportunities(opportunities, state.notified_keys)
+        if not new_opportunities:
+            logger.info(f"ℹ️ No new opportunities for user {user.email}")
+            return None
+        
+        try:
+            with render_cache.timed():
+                subject, html_content = self.render_notification_email(new_opportunities, subscription_status, cache=render_cache)
+        except Exception as e:
+            logger.error(f"❌ Error rendering notification email for {user.email}: {str(e)}")
+            return None
+        
+        logger.info(f"📧 Queued notification to {user.email} for {len(new_opportunities)} new REAL opportunities (subscription: {subscription_status})")
+        return PendingNotification(user, new_opportunities, EmailMessage(user.email, subject, html_content, "arbitrage_alert"))
+    
+    async def deliver_notifications(self, pending: List[PendingNotification], db: AsyncSession) -> int:
+        """Hand a burst of alerts to the email outbox; the outbox worker batches and retries delivery"""
+        if not pending:
+            return 0
+        return await db.run_sync(lambda s: self.record_deliveries(pending, s))
+    
     def format_match_time(self, time_str: str) -> str:
         """Format match time to be more readable"""
         try:
@@ -306,359 +407,157 @@ class ArbitrageNotificationService:
             logger.error(f"Error formatting time {time_str}: {str(e)}")
             return time_str
     
-    async def fetch_real_arbitrage_opportunities(self, preferred_sports: List[str], min_profit: float, user_profile=None) -> List[Dict]:
-        """Fetch REAL arbitrage opportunities using NEW SGO API with frontend-identical filtering"""
+    def get_max_opportunities_per_email(self) -> int:
+        """Limit opportunities per email to prevent email overload"""
+        from app.core.config import DEV_MODE
+        return 5 if DEV_MODE else 10
+    
+    async def fetch_upcoming_opportunities(self) -> List[Dict]:
+        """Fetch the current upcoming arbitrage opportunities from the NEW SGO API (unfiltered)"""
         try:
-            # Import the NEW SGO service
             from app.services.sgo_pro_live_service import SGOProLiveService
             
             async with SGOProLiveService() as sgo_service:
-                # Get upcoming arbitrage opportunities from SGO
-                all_opportunities = await sgo_service.get_upcoming_arbitrage_opportunities()
-                
-                # Apply frontend-identical filtering
-                filtered_opportunities = self._apply_frontend_filtering(all_opportunities, min_profit, user_profile)
-                
-                if filtered_opportunities:
-                    logger.info(f"📧 Found {len(filtered_opportunities)} REAL arbitrage opportunities after frontend filtering (min profit: {min_profit}%)")
-                    
-                    # Limit opportunities to prevent email overload
-                    from app.core.config import DEV_MODE
-                    max_opportunities = 5 if DEV_MODE else 10
-                    limited_opportunities = filtered_opportunities[:max_opportunities]
-                    
-                    return limited_opportunities
-                else:
-                    logger.info(f"📧 No REAL arbitrage opportunities found after frontend filtering (min profit: {min_profit}%)")
-                    return []
+                return await sgo_service.get_upcoming_arbitrage_opportunities()
             
         except Exception as e:
             logger.error(f"Error fetching SGO arbitrage opportunities: {str(e)}")
             return []
     
-    def _apply_frontend_filtering(self, opportunities: List[Dict], min_profit: float, user_profile=None) -> List[Dict]:
+    async def fetch_real_arbitrage_opportunities(self, preferred_sports: List[str], min_profit: float, user_profile=None) -> List[Dict]:
+        """Fetch REAL arbitrage opportunities using NEW SGO API with frontend-identical filtering"""
+        all_opportunities = await self.fetch_upcoming_opportunities()
+        
+        # Apply frontend-identical filtering
+        filtered_opportunities = self._apply_frontend_filtering(all_opportunities, min_profit, user_profile, preferred_sports)
+        
+        if filtered_opportunities:
+            logger.info(f"📧 Found {len(filtered_opportunities)} REAL arbitrage opportunities after frontend filtering (min profit: {min_profit}%)")
+            return filtered_opportunities[:self.get_max_opportunities_per_email()]
+        
+        logger.info(f"📧 No REAL arbitrage opportunities found after frontend filtering (min profit: {min_profit}%)")
+        return []
+    
+    def _apply_frontend_filtering(self, opportunities: List[Dict], min_profit: float, user_profile=None, preferred_sports: List[str] = None) -> List[Dict]:
         """Apply the exact same filtering logic as frontend ArbitrageFinder and LiveOdds components"""
         if not opportunities:
             return []
         
-        # Get user's selected bookmakers (if available)
+        # Get user's selected bookmakers (if available); the index falls back to default reputable books
         selected_bookmakers = []
         if user_profile and hasattr(user_profile, 'preferred_bookmakers') and user_profile.preferred_bookmakers:
             selected_bookmakers = user_profile.preferred_bookmakers.split(",")
         
-        # If no bookmakers selected, use default reputable bookmakers to prevent spam
-        if not selected_bookmakers:
-            # Default to major US bookmakers to filter out fantasy/DFS platforms
-            selected_bookmakers = ['fanduel', 'draftkings', 'betmgm', 'caesars', 'espnbet', 'pinnacle', 'bet365']
-        
-        filtered = []
-        
-        for opp in opportunities:
-            # Filter by minimum profit
-            if opp.get('profit_percentage', 0) < min_profit:
-                continue
-            
-            # Apply bookmaker filtering - ALL bookmakers in opportunity must be in selected list
-            bookmakers_involved = opp.get('bookmakers_involved', [])
-            if len(bookmakers_involved) < 2:
-                continue  # Need at least 2 bookmakers for arbitrage
-            
-            # Check if ALL bookmakers are in the selected list (frontend logic)
-            all_bookmakers_selected = True
-            for bm in bookmakers_involved:
-                bookmaker_key = bm.lower() if isinstance(bm, str) else str(bm).lower()
-                
-                # Check if this bookmaker is in selected list
-                bookmaker_found = any(
-                    selected.lower() == bookmaker_key 
-                    for selected in selected_bookmakers
-                )
-                
-                if not bookmaker_found:
-                    all_bookmakers_selected = False
-                    break
-            
-            if all_bookmakers_selected:
-                filtered.append(opp)
-        
-        return filtered
+        # A one-user index keeps the rules identical to the batch checker
+        index = SubscriptionIndex()
+        index.add(0, preferred_sports or [], selected_bookmakers, min_profit)
+        return index.match(opportunities).get(0, [])
     
-    def filter_new_opportunities(self, user_id: int, opportunities: List[Dict]) -> List[Dict]:
-        """Filter out opportunities we've already notified this user about"""
-        if user_id not in self.sent_notifications:
-            self.sent_notifications[user_id] = set()
-        
+    def filter_new_opportunities(self, opportunities: List[Dict], notified_keys: set) -> List[Dict]:
+        """Filter out opportunities this user was already notified about (O(1) per opportunity)"""
         new_opportunities = []
         for opp in opportunities:
-            # Create a unique identifier for this opportunity using NEW data structure
-            opp_id = f"{opp.get('league', '')}-{opp.get('home_team', '')}-{opp.get('away_team', '')}-{opp.get('profit_percentage', 0):.2f}"
-            
-            if opp_id not in self.sent_notifications[user_id]:
+            key = stable_opportunity_key(opp)
+            if key not in notified_keys:
+                notified_keys.add(key)  # also drops duplicates within the batch
                 new_opportunities.append(opp)
-        
         return new_opportunities
     
-    def mark_opportunities_notified(self, user_id: int, opportunities: List[Dict]):
-        """Mark opportunities as notified to prevent duplicates"""
-        if user_id not in self.sent_notifications:
-            self.sent_notifications[user_id] = set()
+    def render_notification_email(self, opportunities: List[Dict], subscription_status: str = "free", cache: Optional[FragmentCache] = None) -> Tuple[str, str]:
+        """Build the (subject, html) of an arbitrage notification email.
         
-        for opp in opportunities:
-            opp_id = f"{opp.get('league', '')}-{opp.get('home_team', '')}-{opp.get('away_team', '')}-{opp.get('profit_percentage', 0):.2f}"
-            self.sent_notifications[user_id].add(opp_id)
+        Pass the batch's FragmentCache so opportunity rows - and whole documents
+        for recipients with the same matches - are rendered once per batch.
+        """
+        cache = cache if cache is not None else FragmentCache()
+        
+        if len(opportunities) == 1:
+            opp = opportunities[0]
+            # Check if this is a test email
+            is_test = subscription_status == "test" or "[TEST]" in str(opp.get('match', {}).get('home_team', ''))
+            return cache.get_or_render(
+                ("single", self._render_key(opp), is_test),
+                lambda: self._render_single_alert(opp, is_test)
+            )
         
-        # Clean up old notifications (keep only last 24 hours worth)
-        # In a production system, you'd want to use a database table for this
-        if len(self.sent_notifications[user_id]) > 100:
-            # Keep only the 50 most recent
-            recent_notifications = list(self.sent_notifications[user_id])[-50:]
-            self.sent_notifications[user_id] = set(recent_notifications)
+        keys = tuple(self._render_key(opp) for opp in opportunities)
+        return cache.get_or_render(("multi",) + keys, lambda: self._render_multi_alert(opportunities, keys, cache))
+    
+    @staticmethod
+    def _render_key(opp: Dict) -> Tuple:
+        """Cache key for an opportunity's rendered fragments - re-priced copies share the
+        stable key but not the prices, so those are part of it"""
+        return (stable_opportunity_key(opp), opp.get('profit_percentage'), tuple(opp.get('bookmakers') or ()))
+    
+    def _render_single_alert(self, opp: Dict, is_test: bool) -> Tuple[str, str]:
+        if is_test:
+            subject = f"[TEST EMAIL] Arbify Notification Test - {opp.get('profit_percentage', 0):.2f}% Sample"
+        else:
+            subject = f"New Arbitrage Opportunity: {opp.get('profit_percentage', 0):.2f}% Profit"
+        
+        best_odds = opp.get('best_odds', {})
+        side1 = best_odds.get('side1', {})
+        side2 = best_odds.get('side2', {})
+        html_content = ALERT_SINGLE.render(
+            test_header=ALERT_TEST_HEADER if is_test else "",
+            header_text="Email Notification Test" if is_test else "New Arbitrage Opportunity Found",
+            home_team=opp.get('home_team', 'Team A'),
+            away_team=opp.get('away_team', 'Team B'),
+            league=opp.get('league', opp.get('sport', 'Unknown')),
+            match_time=self.format_match_time(opp.get('start_time', '')),
+            profit=f"{opp.get('profit_percentage', 0):.1f}",
+            side1_team=side1.get('team_name', 'Team 1'),
+            side1_stake=f"{side1.get('stake', 50):.0f}",
+            side1_odds=side1.get('american_odds', 'N/A'),
+            side1_bookmaker=side1.get('bookmaker', 'N/A'),
+            side2_team=side2.get('team_name', 'Team 2'),
+            side2_stake=f"{side2.get('stake', 50):.0f}",
+            side2_odds=side2.get('american_odds', 'N/A'),
+            side2_bookmaker=side2.get('bookmaker', 'N/A'),
+            guaranteed_profit=f"{opp.get('profit_percentage', 0) * 1:.1f}",
+            market_description=opp.get('market_description', 'market'),
+            verification_tips=opp.get('verification_tips', 'check market details'),
+            cta_text="View Full Details & Start Betting",
+            frontend_url=EMAIL_FRONTEND_URL,
+        )
+        return subject, html_content
+    
+    def _render_multi_alert(self, opportunities: List[Dict], keys: Tuple[Tuple, ...], cache: FragmentCache) -> Tuple[str, str]:
+        subject = f"{len(opportunities)} New Arbitrage Opportunities Found"
+        
+        # Rows are shared by every recipient matched to the same opportunity
+        opportunities_html = "".join(
+            cache.get_or_render(("row", key), lambda opp=opp: ALERT_ROW.render(
+                home_team=opp.get('home_team', 'Team A'),
+                away_team=opp.get('away_team', 'Team B'),
+                league=opp.get('league', opp.get('sport', 'Unknown')),
+                match_time=self.format_match_time(opp.get('start_time', '')),
+                profit=f"{opp.get('profit_percentage', 0):.1f}",
+            ))
+            for opp, key in zip(opportunities[:5], keys)  # Show top 5
+        )
+        
+        # Add message if there are more opportunities available
+        more_opportunities_html = ""
+        if len(opportunities) > 5:
+            more_opportunities_html = ALERT_MORE.render(remaining=len(opportunities) - 5)
+        
+        html_content = ALERT_MULTI.render(
+            count=len(opportunities),
+            opportunities_html=opportunities_html,
+            more_opportunities_html=more_opportunities_html,
+            cta_text="View All Opportunities & Start Betting",
+            frontend_url=EMAIL_FRONTEND_URL,
+        )
+        return subject, html_content
     
     async def send_notification_email(self, email: str, opportunities: List[Dict], subscription_status: str = "free") -> bool:
         """Send email notification about arbitrage opportunities"""
         try:
-            # Always use production domain for email links - ready for launch
-            base_url = "https://arbify.net"  # Production backend
-            frontend_url = "https://arbify.net"  # Production frontend - always use this for email links
-            
-            if len(opportunities) == 1:
-                opp = opportunities[0]
-                # Check if this is a test email
-                is_test = subscription_status == "test" or "[TEST]" in str(opp.get('match', {}).get('home_team', ''))
-                if is_test:
-                    subject = f"[TEST EMAIL] Arbify Notification Test - {opp.get('profit_percentage', 0):.2f}% Sample"
-                else:
-                    subject = f"New Arbitrage Opportunity: {opp.get('profit_percentage', 0):.2f}% Profit"
-                
-                # Single opportunity email with professional design
-                best_odds = opp.get('best_odds', {})
-                home_odds = best_odds.get('home', {})
-                away_odds = best_odds.get('away', {})
-                
-                # Add test header if it's a test email - matching website design
-                test_header = ""
-                if is_test:
-                    test_header = """
-                    <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); padding: 20px; text-align: center; margin-bottom: 0; border: 2px solid #d4af37; border-bottom: none;">
-                        <h2 style="margin: 0; color: #d4af37; font-size: 18px; font-weight: 700;">TEST EMAIL - NOT REAL DATA</h2>
-                        <p style="margin: 8px 0 0 0; color: #e5e5e5; font-size: 14px;">This is a test to verify your email notifications are working</p>
-                    </div>
-                    """
-                
-                header_text = "New Arbitrage Opportunity Found" if not is_test else "Email Notification Test"
-                
-                html_content = f"""
-                <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 0; background-color: #0f0f0f; border-radius: 12px; overflow: hidden;">
-                    {test_header}
-                    <!-- Header -->
-                    <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); padding: 30px 40px; text-align: center; border-bottom: 3px solid #d4af37;">
-                        <h1 style="color: #d4af37; margin: 0; font-size: 32px; font-weight: 700; letter-spacing: -0.5px;">Arbify Alert</h1>
-                        <p style="color: #e5e5e5; margin: 8px 0 0 0; font-size: 16px; font-weight: 400;">{header_text}</p>
-                    </div>
-                    
-                    <!-- Main Content -->
-                    <div style="padding: 40px;">
-                        <!-- Opportunity Card -->
-                        <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); border-radius: 12px; padding: 30px; margin-bottom: 30px; border: 1px solid #d4af37;">
-                            <h2 style="color: #d4af37; margin: 0 0 20px 0; font-size: 24px; font-weight: 600; text-align: center;">
-                                {opp.get('home_team', 'Team A')} vs {opp.get('away_team', 'Team B')}
-                            </h2>
-                            
-                            <div style="display: table; width: 100%; margin-bottom: 25px;">
-                                <div style="display: table-row;">
-                                    <div style="display: table-cell; padding: 8px 0; width: 30%; color: #b5b5b5; font-size: 14px; font-weight: 500;">Sport:</div>
-                                    <div style="display: table-cell; padding: 8px 0; color: #ffffff; font-size: 14px; font-weight: 600;">{opp.get('league', opp.get('sport', 'Unknown'))}</div>
-                                </div>
-                                <div style="display: table-row;">
-                                    <div style="display: table-cell; padding: 8px 0; width: 30%; color: #b5b5b5; font-size: 14px; font-weight: 500;">Match Time:</div>
-                                    <div style="display: table-cell; padding: 8px 0; color: #ffffff; font-size: 14px; font-weight: 600;">{self.format_match_time(opp.get('start_time', ''))}</div>
-                                </div>
-                                <div style="display: table-row;">
-                                    <div style="display: table-cell; padding: 8px 0; width: 30%; color: #b5b5b5; font-size: 14px; font-weight: 500;">Profit:</div>
-                                    <div style="display: table-cell; padding: 8px 0; color: #10b981; font-size: 18px; font-weight: 700;">{opp.get('profit_percentage', 0):.1f}%</div>
-                                </div>
-                            </div>
-                            
-                            <!-- Betting Details -->
-                            <div style="background-color: #0f0f0f; border-radius: 8px; padding: 20px; border: 1px solid #333333; margin-bottom: 20px;">
-                                <h4 style="color: #d4af37; margin: 0 0 15px 0; font-size: 16px; font-weight: 600;">How to Bet:</h4>
-                                <div style="margin-bottom: 15px;">
-                                    <div style="color: #ffffff; font-size: 14px; font-weight: 600; margin-bottom: 5px;">
-                                        {best_odds.get('side1', {}).get('team_name', 'Team 1')}: ${best_odds.get('side1', {}).get('stake', 50):.0f} at {best_odds.get('side1', {}).get('american_odds', 'N/A')}
-                                    </div>
-                                    <div style="color: #b5b5b5; font-size: 12px;">Bookmaker: {best_odds.get('side1', {}).get('bookmaker', 'N/A')}</div>
-                                </div>
-                                <div style="margin-bottom: 15px;">
-                                    <div style="color: #ffffff; font-size: 14px; font-weight: 600; margin-bottom: 5px;">
-                                        {best_odds.get('side2', {}).get('team_name', 'Team 2')}: ${best_odds.get('side2', {}).get('stake', 50):.0f} at {best_odds.get('side2', {}).get('american_odds', 'N/A')}
-                                    </div>
-                                    <div style="color: #b5b5b5; font-size: 12px;">Bookmaker: {best_odds.get('side2', {}).get('bookmaker', 'N/A')}</div>
-                                </div>
-                                <div style="border-top: 1px solid #333; padding-top: 15px; margin-top: 15px;">
-                                    <div style="color: #10b981; font-size: 14px; font-weight: 600;">
-                                        Total stake: $100 → Guaranteed profit: ${opp.get('profit_percentage', 0) * 1:.1f}
-                                    </div>
-                                </div>
-                            </div>
-                            
-                            <!-- Verification Tips -->
-                            <div style="background-color: #0f0f0f; border-radius: 8px; padding: 20px; border: 1px solid #333333;">
-                                <h4 style="color: #f59e0b; margin: 0 0 10px 0; font-size: 14px; font-weight: 600;">⚠️ Verification Required:</h4>
-                                <div style="color: #b5b5b5; font-size: 12px; line-height: 1.6;">
-                                    <div style="margin-bottom: 5px;">• Check odds are still available before betting</div>
-                                    <div style="margin-bottom: 5px;">• Verify {opp.get('market_description', 'market')} - {opp.get('verification_tips', 'check market details')}</div>
-                                    <div>• Place bets quickly - odds change frequently</div>
-                                </div>
-                            </div>
-                        </div>
-                        
-                        <!-- Call to Action -->
-                        <div style="text-align: center; margin: 40px 0;">
-                            <a href="{frontend_url}/dashboard?tab=arbitrage" 
-                               style="background: linear-gradient(135deg, #d4af37 0%, #f4c430 100%); 
-                                      color: #1a1a1a; 
-                                      padding: 18px 40px; 
-                                      border-radius: 8px; 
-                                      text-decoration: none; 
-                                      font-weight: 700; 
-                                      font-size: 16px; 
-                                      display: inline-block; 
-                                      box-shadow: 0 4px 12px rgba(212, 175, 55, 0.3);
-                                      transition: all 0.3s ease;">
-                                View Full Details & Start Betting
-                            </a>
-                        </div>
-                        
-                        <!-- Info Box -->
-                        <div style="background-color: #1a1a1a; border-radius: 8px; padding: 20px; margin: 30px 0; border-left: 4px solid #d4af37;">
-                            <p style="margin: 0; font-size: 14px; color: #e5e5e5; line-height: 1.6;">
-                                <strong style="color: #d4af37;">Ready to profit?</strong> Access your personalized dashboard to see complete odds breakdowns, 
-                                calculate optimal stakes, and track all opportunities in real-time.
-                            </p>
-                        </div>
-                    </div>
-                    
-                    <!-- Footer -->
-                    <div style="background-color: #1a1a1a; padding: 25px 40px; text-align: center; border-top: 1px solid #333333;">
-                        <p style="margin: 0; font-size: 13px; color: #888888;">
-                            <a href="{frontend_url}/subscription" style="color: #d4af37; text-decoration: none; font-weight: 500;">Upgrade Plan</a> | 
-                            <a href="{frontend_url}/profile" style="color: #d4af37; text-decoration: none; font-weight: 500;">Manage Notifications</a>
-                        </p>
-                        <p style="margin: 15px 0 0 0; font-size: 12px; color: #666666;">© 2025 Arbify - Professional Arbitrage Betting Platform</p>
-                    </div>
-                </div>
-                """
-            else:
-                # Multiple opportunities email with professional design
-                subject = f"{len(opportunities)} New Arbitrage Opportunities Found"
-                
-                opportunities_html = ""
-                for i, opp in enumerate(opportunities[:5]):  # Show top 5
-                    best_odds = opp.get('best_odds', {})
-                    home_odds = best_odds.get('home', {})
-                    away_odds = best_odds.get('away', {})
-                    
-                    opportunities_html += f"""
-                    <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); border-radius: 8px; padding: 20px; margin: 15px 0; border: 1px solid #d4af37;">
-                        <h3 style="color: #d4af37; margin: 0 0 15px 0; font-size: 18px; font-weight: 600;">{opp.get('home_team', 'Team A')} vs {opp.get('away_team', 'Team B')}</h3>
-                        <div style="display: table; width: 100%; margin-bottom: 15px;">
-                            <div style="display: table-row;">
-                                <div style="display: table-cell; padding: 4px 0; width: 25%; color: #b5b5b5; font-size: 13px;">Sport:</div>
-                                <div style="display: table-cell; padding: 4px 0; color: #ffffff; font-size: 13px; font-weight: 500;">{opp.get('league', opp.get('sport', 'Unknown'))}</div>
-                            </div>
-                            <div style="display: table-row;">
-                                <div style="display: table-cell; padding: 4px 0; width: 25%; color: #b5b5b5; font-size: 13px;">Match Time:</div>
-                                <div style="display: table-cell; padding: 4px 0; color: #ffffff; font-size: 13px; font-weight: 500;">{self.format_match_time(opp.get('start_time', ''))}</div>
-                            </div>
-                            <div style="display: table-row;">
-                                <div style="display: table-cell; padding: 4px 0; width: 25%; color: #b5b5b5; font-size: 13px;">Profit:</div>
-                                <div style="display: table-cell; padding: 4px 0; color: #10b981; font-size: 16px; font-weight: 700;">{opp.get('profit_percentage', 0):.1f}%</div>
-                            </div>
-                        </div>
-                        <div style="background-color: #0f0f0f; border-radius: 6px; padding: 12px; border: 1px solid #333333;">
-                            <div style="color: #b5b5b5; font-size: 11px; line-height: 1.4;">
-                                <span>• Arbitrage confirmed</span> • <span>Stakes calculated</span> • <span>Live tracking</span>
-                            </div>
-                        </div>
-                    </div>
-                    """
-                
-                # Add message if there are more opportunities available
-                more_opportunities_msg = ""
-                total_opportunities = len(opportunities)
-                if total_opportunities > 5:
-                    more_opportunities_msg = f"""
-                    <div style="background-color: #1a1a1a; border-radius: 8px; padding: 20px; margin: 25px 0; border: 2px solid #d4af37; text-align: center;">
-                        <p style="margin: 0; font-size: 16px; color: #d4af37; font-weight: 600;">
-                            Plus {total_opportunities - 5} more opportunities available!
-                        </p>
-                        <p style="margin: 8px 0 0 0; font-size: 13px; color: #e5e5e5;">View all opportunities and detailed analysis on your dashboard</p>
-                    </div>
-                    """
-                
-                html_content = f"""
-                <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 0; background-color: #0f0f0f; border-radius: 12px; overflow: hidden;">
-                    <!-- Header -->
-                    <div style="background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); padding: 30px 40px; text-align: center; border-bottom: 3px solid #d4af37;">
-                        <h1 style="color: #d4af37; margin: 0; font-size: 32px; font-weight: 700; letter-spacing: -0.5px;">Arbify Alert</h1>
-                        <p style="color: #e5e5e5; margin: 8px 0 0 0; font-size: 16px; font-weight: 400;">{len(opportunities)} New Arbitrage Opportunities!</p>
-                    </div>
-                    
-                    <!-- Main Content -->
-                    <div style="padding: 40px;">
-                        <!-- Opportunities List -->
-                        <div style="margin: 0 0 30px 0;">
-                            {opportunities_html}
-                        </div>
-                        
-                        {more_opportunities_msg}
-                        
-                        <!-- Call to Action -->
-                        <div style="text-align: center; margin: 40px 0;">
-                            <a href="{frontend_url}/dashboard?tab=arbitrage" 
-                               style="background: linear-gradient(135deg, #d4af37 0%, #f4c430 100%); 
-                                      color: #1a1a1a; 
-                                      padding: 18px 40px; 
-                                      border-radius: 8px; 
-                                      text-decoration: none; 
-                                      font-weight: 700; 
-                                      font-size: 16px; 
-                                      display: inline-block; 
-                                      box-shadow: 0 4px 12px rgba(212, 175, 55, 0.3);
-                                      transition: all 0.3s ease;">
-                                View All Opportunities & Start Betting
-                            </a>
-                        </div>
-                        
-                        <!-- Info Box -->
-                        <div style="background-color: #1a1a1a; border-radius: 8px; padding: 20px; margin: 30px 0; border-left: 4px solid #d4af37;">
-                            <p style="margin: 0; font-size: 14px; color: #e5e5e5; line-height: 1.6;">
-                                <strong style="color: #d4af37;">Ready to profit?</strong> Access your personalized dashboard to see complete odds breakdowns, 
-                                calculate optimal stakes, and track all opportunities in real-time.
-                            </p>
-                        </div>
-                    </div>
-                    
-                    <!-- Footer -->
-                    <div style="background-color: #1a1a1a; padding: 25px 40px; text-align: center; border-top: 1px solid #333333;">
-                        <p style="margin: 0; font-size: 13px; color: #888888;">
-                            <a href="{frontend_url}/subscription" style="color: #d4af37; text-decoration: none; font-weight: 500;">Upgrade Plan</a> | 
-                            <a href="{frontend_url}/profile" style="color: #d4af37; text-decoration: none; font-weight: 500;">Manage Notifications</a>
-                        </p>
-                        <p style="margin: 15px 0 0 0; font-size: 12px; color: #666666;">© 2025 Arbify - Professional Arbitrage Betting Platform</p>
-                    </div>
-                </div>
-                """
-            
-            # Send the email using the existing email service
-            success = send_email(
-                to_email=email,
-                subject=subject,
-                html_content=html_content
-            )
+            subject, html_content = self.render_notification_email(opportunities, subscription_status)
             
-            # Add rate limiting delay to prevent 429 errors (Resend limit: 2 requests/second)
-            await asyncio.sleep(1.0)  # Wait 1 second between emails to stay well under 2/second
+            # Async sender: pooled client, provider rate limit enforced by its token bucket
+            success = await email_sender.send(EmailMessage(email, subject, html_content, "arbitrage_alert"))
             
             if success:
                 logger.info(f"✅ Notification email sent successfully to {email}")
@@ -675,25 +574,27 @@ class ArbitrageNotificationService:
 notification_service = ArbitrageNotificationService()
 
 async def run_notification_checker():
-    """Background task that checks for opportunities and sends immediate notifications"""
+    """Background task that notifies users as soon as ingestion reports new/improved opportunities"""
     logger.info("🚀 Starting arbitrage notification service...")
-    logger.info("📧 IMMEDIATE NOTIFICATIONS: Emails sent as soon as opportunities are found")
+    logger.info("📧 EVENT-DRIVEN NOTIFICATIONS: Emails sent when ingestion finds new or improved opportunities")
     logger.info("⏰ RATE LIMITING: Basic (1/day, 24h cooldown) | Premium (3/day, 4h cooldown)")
     
     consecutive_failures = 0
     
     while True:
         try:
-            await notification_service.check_and_notify_users()
+            # Wake on the ingestion diff instead of a fixed polling interval
+            changes = await opportunity_feed.next_changes(timeout=NOTIFY_IDLE_LOG_SECONDS)
             
-            # Reset failure counter on success
-            consecutive_failures = 0
+            if not changes:
+                logger.info(f"💫 No new or improved opportunities in the last {NOTIFY_IDLE_LOG_SECONDS // 60} minutes - feed: {opportunity_feed.stats()}")
+                continue
             
-            # Check every 2 minutes for immediate notifications
-            wait_seconds = 120  # 2 minutes - frequent checks for immediate notifications
+            logger.info(f"📣 {len(changes)} new/improved opportunities from ingestion - evaluating subscribers")
+            await notification_service.check_and_notify_users(changes)
             
-            logger.info(f"💫 Checking every 2 minutes for new opportunities")
-            await asyncio.sleep(wait_seconds)
+            # Reset failure counter on success
+            consecutive_failures = 0
             
         except Exception as e:
             consecutive_failures += 1
@@ -716,15 +617,14 @@ async def run_notification_checker():
 async def send_test_notification(user_email: str):
     """Send a test notification to a specific user"""
     try:
-        db = SessionLocal()
-        user = db.query(User).filter(User.email == user_email).first()
-        
-        if not user:
-            logger.error(f"User with email {user_email} not found")
-            return False
-        
-        await notification_service.check_user_opportunities(user, db)
-        db.close()
+        async with AsyncSessionLocal() as db:
+            user = await db.scalar(select(User).where(User.email == user_email).limit(1))
+            
+            if not user:
+                logger.error(f"User with email {user_email} not found")
+                return False
+            
+            await notification_service.check_user_opportunities(user, db)
         return True
         
     except Exception as e:
@@ -0,0 +1,161 @@
+"""
+Security middleware microbenchmark.
+
+Drives a minimal Starlette app directly over ASGI (no sockets) and reports
+per-request time and overhead for:
+- bare:   no middleware
+- legacy: the previous stack shape - rate limiting, security checks/headers and
+          HTTPS redirect as three BaseHTTPMiddleware layers, each resolving the
+          client IP from its own Request, plus TrustedHostMiddleware
+- asgi:   the consolidated pure-ASGI SecurityMiddleware
+for a normal API path and for the /health fast path.
+
+Usage:
+    python scripts/benchmark_middleware.py
+    python scripts/benchmark_middleware.py --requests 50000 --json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.trustedhost import TrustedHostMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from app.core.rate_limiter import CATEGORY_RATES, GCRALimiter, GLOBAL_RATE, RateLimiter, endpoint_category
+from app.core.security_config import SECURITY_HEADERS, get_client_ip, is_suspicious_request
+from app.core.security_middleware import SecurityMiddleware
+
+HOSTS = ["bench", "localhost"]
+
+
+class LegacyRateLimit(BaseHTTPMiddleware):
+    def __init__(self, app, limiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in ("/", "/health"):
+            return await call_next(request)
+        client_ip = get_client_ip(request)
+        if not (await self.limiter.hit(("all", client_ip), GLOBAL_RATE)).allowed:
+            return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
+        return await call_next(request)
+
+
+class LegacySecurity(BaseHTTPMiddleware):
+    def __init__(self, app, limiter):
+        super().__init__(app)
+        self.limiter = limiter
+        self.headers = SECURITY_HEADERS["development"]
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in ("/status", "/health", "/healthz"):
+            return await call_next(request)
+        client_ip = get_client_ip(request)
+        if not request.url.path.startswith("/api/"):
+            is_suspicious_request(request)
+        category = endpoint_category(request.url.path, request.method)
+        if not (await self.limiter.hit((category, client_ip), CATEGORY_RATES[category])).allowed:
+            return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
+        response = await call_next(request)
+        for header, value in self.headers.items():
+            response.headers[header] = value
+        response.headers["Server"] = "Arbify/1.0"
+        return response
+
+
+class LegacyHTTPSRedirect(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.url.path in ("/status", "/health", "/healthz"):
+            return await call_next(request)
+        request.headers.get("user-agent", "").lower()
+        request.headers.get("x-forwarded-proto")
+        return await call_next(request)
+
+
+def build_app(stack: str):
+    app = Starlette(routes=[
+        Route("/api/odds", lambda request: PlainTextResponse("ok")),
+        Route("/health", lambda request: PlainTextResponse("ok")),
+    ])
+    limiter = RateLimiter(GCRALimiter())
+    if stack == "legacy":
+        app.add_middleware(LegacyRateLimit, limiter=limiter)
+        app.add_middleware(LegacySecurity, limiter=limiter)
+        app.add_middleware(LegacyHTTPSRedirect)
+        app.add_middleware(TrustedHostMiddleware, allowed_hosts=HOSTS)
+    elif stack == "asgi":
+        app.add_middleware(SecurityMiddleware, allowed_hosts=HOSTS, limiter=limiter)
+    return app
+
+async def drive(app, path: str, requests: int, clients: int = 1000) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scopes = [
+        {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+            "headers": [
+                (b"host", b"bench"), (b"user-agent", b"Mozilla/5.0 (benchmark)"), (b"accept", b"*/*"),
+                (b"x-forwarded-for", f"10.0.{i >> 8 & 255}.{i & 255}".encode()),
+            ],
+            "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+        }
+        for i in range(clients)
+    ]
+    # Warm up (route compilation, first-call caches)
+    for i in range(min(200, requests)):
+        await app(dict(scopes[i % clients]), receive, send)
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(dict(scopes[i % clients]), receive, send)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the security middleware stack")
+    parser.add_argument("--requests", type=int, default=20000, help="requests per scenario")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # Enough client IPs that none exceeds its burst (<= 50 requests each) - only overhead is measured
+    clients = max(1000, (args.requests + 200) // 50 + 1)
+
+    results = []
+    for path in ("/api/odds", "/health"):
+        row = {"path": path}
+        for stack in ("bare", "legacy", "asgi"):
+            elapsed = asyncio.run(drive(build_app(stack), path, args.requests, clients))
+            row[stack] = round(elapsed / args.requests * 1e6, 1)
+        row["legacy_overhead_us"] = round(row["legacy"] - row["bare"], 1)
+        row["asgi_overhead_us"] = round(row["asgi"] - row["bare"], 1)
+        results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n📊 Middleware overhead ({args.requests} requests per scenario, us/request)")
+    print(f"{'path':>12}{'bare':>10}{'legacy':>10}{'asgi':>10}{'legacy +us':>12}{'asgi +us':>10}")
+    for row in results:
+        print(f"{row['path']:>12}{row['bare']:>10}{row['legacy']:>10}{row['asgi']:>10}{row['legacy_overhead_us']:>12}{row['asgi_overhead_us']:>10}")
+
+
+if __name__ == "__main__":
+    main()
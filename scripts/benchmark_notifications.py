@@ -0,0 +1,334 @@
+"""
+Notification cycle benchmark.
+
+Seeds a throwaway SQLite database with synthetic opted-in users (profiles +
+subscriptions), feeds an opportunity snapshot to
+ArbitrageNotificationService.check_and_notify_users, then drains the email
+outbox against a local stand-in for the Resend API.
+
+Reports cycle wall time, DB queries (total and per user), delivery emails/sec
+and peak memory. Each population size runs in its own process so the app's
+engines bind to a fresh database.
+
+Usage:
+    python scripts/benchmark_notifications.py --users 1000,10000,100000
+    python scripts/benchmark_notifications.py --users 10000 --snapshot recorded.json
+    python scripts/benchmark_notifications.py --users 1000 --save-snapshot snapshot.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SPORTS = [
+    ("SOCCER", "EPL", "soccer_epl"),
+    ("SOCCER", "LA_LIGA", "soccer_la_liga"),
+    ("SOCCER", "UEFA_CHAMPIONS_LEAGUE", "soccer_uefa_champions_league"),
+    ("BASKETBALL", "NBA", "basketball_nba"),
+    ("FOOTBALL", "NFL", "americanfootball_nfl"),
+    ("HOCKEY", "NHL", "icehockey_nhl"),
+    ("BASEBALL", "MLB", "baseball_mlb"),
+]
+BOOKMAKERS = ["fanduel", "draftkings", "betmgm", "caesars", "espnbet", "pinnacle", "bet365", "betrivers", "fanatics"]
+SEED_CHUNK = 5000
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+def synthetic_snapshot(count: int, rng: random.Random) -> List[Dict]:
+    """Opportunities in the shape SGOProLiveService publishes"""
+    start = datetime.utcnow() + timedelta(hours=6)
+    snapshot = []
+    for i in range(count):
+        sport, league, _ = rng.choice(SPORTS)
+        books = rng.sample(BOOKMAKERS, 4)
+        profit = rng.uniform(0.5, 4.0)
+        # Even-money market priced so the headline books give `profit`; the
+        # ladder's fallback prices are slightly worse, as in real markets
+        headline = 2 * (1 + profit / 100)
+        ladder = {
+            side: [
+                {"bookmaker": book, "odds": round(headline - 0.03 * depth, 3), "american_odds": "", "line": 0}
+                for depth, book in enumerate(books[offset::2] + books[1 - offset::2][:1])
+            ]
+            for side, offset in (("side1", 0), ("side2", 1))
+        }
+        snapshot.append({
+            "id": f"bench-{i}",
+            "sport": sport,
+            "league": league,
+            "home_team": f"Home {i}",
+            "away_team": f"Away {i}",
+            "start_time": (start + timedelta(minutes=15 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "market_type": "moneyline",
+            "market_description": "Moneyline",
+            "profit_percentage": round(profit, 2),
+            "bookmakers": [ladder["side1"][0]["bookmaker"], ladder["side2"][0]["bookmaker"]],
+            "best_odds": {
+                side: dict(prices[0], team_name=f"{team} {i}", stake=50.0)
+                for (side, prices), team in zip(ladder.items(), ("Home", "Away"))
+            },
+            "price_ladder": ladder,
+        })
+    return snapshot
+
+
+def seed_database(engine, users: int, rng: random.Random):
+    """Bulk-insert users, profiles and subscriptions (about 5% without a subscription)"""
+    from app.core.database import Base
+    from app.models.user import User, UserProfile
+    from app.models.subscription import SubscriptionPlan, UserSubscription
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(SubscriptionPlan.__table__.insert(), [
+            {"id": 1, "name": "Basic", "price_monthly": 9.99},
+            {"id": 2, "name": "Premium", "price_monthly": 29.99},
+        ])
+        for offset in range(0, users, SEED_CHUNK):
+            ids = range(offset + 1, min(users, offset + SEED_CHUNK) + 1)
+            conn.execute(User.__table__.insert(), [
+                {"id": i, "username": f"bench{i}", "email": f"bench{i}@bench.local", "hashed_password": "x",
+                 "is_active": True, "is_verified": True, "created_at": now}
+                for i in ids
+            ])
+            conn.execute(UserProfile.__table__.insert(), [
+                {
+                    "user_id": i,
+                    "notification_email": True,
+                    "preferred_sports": ",".join(key for _, _, key in rng.sample(SPORTS, rng.randint(1, 3))),
+                    "preferred_bookmakers": "" if rng.random() < 0.5 else ",".join(rng.sample(BOOKMAKERS, rng.randint(3, 6))),
+                    "minimum_profit_threshold": rng.choice([0.5, 1.0, 1.5, 2.0]),
+                }
+                for i in ids
+            ])
+            subscriptions = []
+            for i in ids:
+                roll = rng.random()
+                if roll < 0.05:
+                    continue
+                subscriptions.append({
+                    "user_id": i,
+                    "plan_id": 2 if roll > 0.75 else 1,
+                    "status": "trialing" if roll > 0.95 else "active",
+                    "current_period_start": now,
+                    "current_period_end": now + timedelta(days=30),
+                })
+            conn.execute(UserSubscription.__table__.insert(), subscriptions)
+
+
+async def start_stub_mail_server(port: int, latency_ms: float, counters: Dict[str, int]):
+    """Local stand-in for the Resend single and batch endpoints"""
+    from aiohttp import web
+
+    async def single(request):
+        await request.read()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        counters["requests"] += 1
+        counters["emails"] += 1
+        return web.json_response({"id": "bench"})
+
+    async def batch(request):
+        payload = await request.json()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        counters["requests"] += 1
+        counters["emails"] += len(payload)
+        return web.json_response({"data": [{"id": "bench"} for _ in payload]})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/emails", single)
+    app.router.add_post("/emails/batch", batch)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def run_benchmark(args, port: int) -> Dict:
+    from sqlalchemy import event, func, select
+    from app.core.database import engine, async_engine, AsyncSessionLocal
+    from app.models.user import EmailOutbox
+    from app.services.email_dispatcher import email_sender
+    from app.services.email_outbox import OutboxWorker
+    from scripts.arbitrage_notifications import ArbitrageNotificationService
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    seed_start = time.perf_counter()
+    seed_database(engine, args.users, rng)
+    seed_seconds = time.perf_counter() - seed_start
+
+    if args.snapshot:
+        with open(args.snapshot) as f:
+            snapshot = json.load(f)
+    else:
+        snapshot = synthetic_snapshot(args.opportunities, rng)
+    if args.save_snapshot:
+        with open(args.save_snapshot, "w") as f:
+            json.dump(snapshot, f, indent=2)
+
+    queries = {"count": 0}
+    def count_query(*_):
+        queries["count"] += 1
+    event.listen(engine, "before_cursor_execute", count_query)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+
+    counters = {"requests": 0, "emails": 0}
+    runner = await start_stub_mail_server(port, args.stub_latency_ms, counters)
+    try:
+        service = ArbitrageNotificationService()
+        tracemalloc.start()
+
+        cycle_start = time.perf_counter()
+        await service.check_and_notify_users(snapshot)
+        cycle_seconds = time.perf_counter() - cycle_start
+        cycle_queries = queries["count"]
+        _, cycle_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        async with AsyncSessionLocal() as db:
+            queued = await db.scalar(select(func.count(EmailOutbox.id)))
+
+        worker = OutboxWorker(batch_size=args.outbox_batch)
+        delivery_start = time.perf_counter()
+        while await worker.drain_once():
+            pass
+        delivery_seconds = time.perf_counter() - delivery_start
+        _, delivery_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        await email_sender.close()
+        await runner.cleanup()
+
+    return {
+        "users": args.users,
+        "opportunities": len(snapshot),
+        "seed_seconds": round(seed_seconds, 2),
+        "cycle_seconds": round(cycle_seconds, 3),
+        "cycle_errors": service.consecutive_errors,
+        "queries": cycle_queries,
+        "queries_per_user": round(cycle_queries / args.users, 4),
+        "emails_queued": queued,
+        "emails_delivered": counters["emails"],
+        "mail_requests": counters["requests"],
+        "delivery_seconds": round(delivery_seconds, 3),
+        "emails_per_second": round(counters["emails"] / delivery_seconds, 1) if delivery_seconds else None,
+        "peak_cycle_mb": round(cycle_peak / 2**20, 1),
+        "peak_delivery_mb": round(delivery_peak / 2**20, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        **worker.stats(),
+    }
+
+
+def run_single(args) -> Dict:
+    """Point the app at a fresh database and the stub server, then benchmark one population size"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    workdir = tempfile.mkdtemp(prefix="notify-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "ENVIRONMENT": "benchmark",  # not development, so emails really go to the stub
+        "RESEND_API_KEY": "re_benchmark",
+        "RESEND_API_URL": f"http://127.0.0.1:{port}",
+        "EMAIL_RATE_LIMIT_PER_SECOND": str(args.email_rate),
+        "EMAIL_BATCH_SIZE": str(args.email_batch),
+    })
+    os.environ.pop("REDIS_URL", None)
+    return asyncio.run(run_benchmark(args, port))
+
+
+def print_report(results: List[Dict]):
+    columns = [
+        ("users", "users"), ("opportunities", "opps"), ("cycle_seconds", "cycle s"), ("queries", "queries"),
+        ("queries_per_user", "q/user"), ("emails_queued", "queued"), ("delivery_seconds", "deliver s"),
+        ("emails_per_second", "emails/s"), ("peak_cycle_mb", "peak MB"), ("max_rss_mb", "rss MB"),
+    ]
+    print("\n📊 Notification benchmark")
+    print("  ".join(f"{title:>10}" for _, title in columns))
+    for result in results:
+        print("  ".join(f"{str(result.get(key)):>10}" for key, _ in columns))
+
+
+def child_arguments(args) -> List[str]:
+    """Forward every option except --users to the per-size child process"""
+    forwarded = [
+        "--opportunities", str(args.opportunities),
+        "--email-rate", str(args.email_rate),
+        "--email-batch", str(args.email_batch),
+        "--outbox-batch", str(args.outbox_batch),
+        "--stub-latency-ms", str(args.stub_latency_ms),
+        "--seed", str(args.seed),
+    ]
+    if args.snapshot:
+        forwarded += ["--snapshot", args.snapshot]
+    if args.save_snapshot:
+        forwarded += ["--save-snapshot", args.save_snapshot]
+    if args.verbose:
+        forwarded.append("--verbose")
+    return forwarded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a notification cycle against synthetic users")
+    parser.add_argument("--users", default="1000", help="comma-separated population sizes, e.g. 1000,10000,100000")
+    parser.add_argument("--opportunities", type=int, default=200, help="synthetic snapshot size")
+    parser.add_argument("--snapshot", help="JSON file with a recorded opportunity snapshot (overrides --opportunities)")
+    parser.add_argument("--save-snapshot", help="write the snapshot used to this JSON file")
+    parser.add_argument("--email-rate", type=float, default=1000.0, help="dispatcher rate limit (emails/sec)")
+    parser.add_argument("--email-batch", type=int, default=100, help="messages per batch request")
+    parser.add_argument("--outbox-batch", type=int, default=500, help="outbox rows claimed per drain")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="simulated provider latency per request")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the notifier's INFO logs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.users.split(",") if size.strip()]
+    if args.child:
+        args.users = sizes[0]
+        print(RESULT_PREFIX + json.dumps(run_single(args)))
+        return
+
+    results = []
+    for size in sizes:
+        print(f"⏱️  Benchmarking {size} users...")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--users", str(size), *child_arguments(args)],
+            capture_output=True, text=True,
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if output.returncode != 0 or not lines:
+            print(f"❌ Benchmark for {size} users failed:\n{output.stderr[-2000:]}")
+            continue
+        results.append(json.loads(lines[-1][len(RESULT_PREFIX):]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
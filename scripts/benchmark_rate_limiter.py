@@ -0,0 +1,191 @@
+"""
+Rate limiter benchmark.
+
+1. Engine: replays a request stream from many client IPs through the previous
+   limiters (per-IP list rebuilt every request; per ip:endpoint deque with the
+   limit re-parsed every call) and through GCRALimiter, reporting checks/sec
+   and retained memory.
+2. Middleware: drives a minimal Starlette app directly over ASGI with and
+   without SecurityMiddleware and reports requests/sec and the per-request
+   overhead (see benchmark_middleware.py for the full stack comparison).
+
+Usage:
+    python scripts/benchmark_rate_limiter.py
+    python scripts/benchmark_rate_limiter.py --clients 100000 --requests 500000 --json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.rate_limiter import CATEGORY_RATES, GCRALimiter, RateLimiter, endpoint_category
+from app.core.security_config import RATE_LIMITS
+
+PATHS = ["/api/odds", "/api/arbitrage", "/api/subscription/status", "/api/auth/user/profile", "/api/auth/token", "/api/users/me"]
+
+
+class LegacyListLimiter:
+    """Previous RateLimitMiddleware state: a timestamp list per IP, rebuilt per request, never evicted"""
+
+    def __init__(self, limit=100):
+        self.limit = limit
+        self.request_history = defaultdict(list)
+
+    def hit(self, ip, path, now):
+        self.request_history[ip] = [t for t in self.request_history[ip] if now - t < 60]
+        if len(self.request_history[ip]) >= self.limit:
+            return False
+        self.request_history[ip].append(now)
+        return True
+
+
+class LegacyDequeLimiter:
+    """Previous SecurityMiddleware._check_rate_limit: a deque per ip:endpoint, limit parsed per call"""
+
+    def __init__(self):
+        self.rate_limit_storage = defaultdict(lambda: deque())
+
+    def hit(self, ip, path, now):
+        endpoint = endpoint_category(path, "GET")
+        rate_limit = RATE_LIMITS.get(endpoint, RATE_LIMITS["api_general"])
+        limit, period = rate_limit.split("/")
+        limit = int(limit)
+        window = {"minute": 60, "hour": 3600, "day": 86400}.get(period, 60)
+        key = f"{ip}:{endpoint}"
+        while self.rate_limit_storage[key] and self.rate_limit_storage[key][0] < now - window:
+            self.rate_limit_storage[key].popleft()
+        if len(self.rate_limit_storage[key]) >= limit:
+            return False
+        self.rate_limit_storage[key].append(now)
+        return True
+
+
+class GCRAAdapter:
+    def __init__(self, max_keys):
+        self.limiter = GCRALimiter(max_keys=max_keys)
+
+    def hit(self, ip, path, now):
+        category = endpoint_category(path, "GET")
+        return self.limiter.hit((category, ip), CATEGORY_RATES[category], now).allowed
+
+
+def request_stream(clients: int, requests: int, seconds: float, rng: random.Random):
+    """(ip, path, timestamp) with a few heavy clients and a long tail"""
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    step = seconds / requests
+    return [
+        (ips[min(int(rng.paretovariate(1.2)) - 1, clients - 1) if rng.random() < 0.5 else rng.randrange(clients)],
+         rng.choice(PATHS), i * step)
+        for i in range(requests)
+    ]
+
+def bench_engine(name, make_limiter, stream):
+    """Timed run, then a separate traced run for memory (tracemalloc skews timings)"""
+    limiter = make_limiter()
+    start = time.perf_counter()
+    allowed = sum(1 for ip, path, now in stream if limiter.hit(ip, path, now))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    limiter = make_limiter()
+    for ip, path, now in stream:
+        limiter.hit(ip, path, now)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "limiter": name,
+        "checks_per_second": round(len(stream) / elapsed),
+        "us_per_check": round(elapsed / len(stream) * 1e6, 2),
+        "allowed": allowed,
+        "retained_mb": round(retained / 1e6, 2),
+    }
+
+
+def build_app(with_limiter: bool):
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from app.core.security_middleware import SecurityMiddleware
+
+    app = Starlette(routes=[Route("/api/odds", lambda request: PlainTextResponse("ok"))])
+    if with_limiter:
+        app.add_middleware(SecurityMiddleware, limiter=RateLimiter(GCRALimiter()))
+    return app
+
+async def drive(app, requests: int, clients: int) -> float:
+    """Call the ASGI app directly - no sockets, so only app + middleware cost is measured"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scopes = [
+        {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/odds", "raw_path": b"/api/odds", "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"bench"), (b"user-agent", b"benchmark-client/1.0")],
+            "client": (f"10.0.{i >> 8 & 255}.{i & 255}", 50000), "server": ("bench", 80),
+        }
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(dict(scopes[i % clients]), receive, send)
+    return time.perf_counter() - start
+
+def bench_middleware(requests: int, clients: int):
+    results = {}
+    for label, with_limiter in (("bare", False), ("rate_limited", True)):
+        elapsed = asyncio.run(drive(build_app(with_limiter), requests, clients))
+        results[label] = {"requests_per_second": round(requests / elapsed), "us_per_request": round(elapsed / requests * 1e6, 1)}
+    results["overhead_us_per_request"] = round(results["rate_limited"]["us_per_request"] - results["bare"]["us_per_request"], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the request rate limiter")
+    parser.add_argument("--clients", type=int, default=20000, help="distinct client IPs")
+    parser.add_argument("--requests", type=int, default=200000, help="engine checks to replay")
+    parser.add_argument("--seconds", type=float, default=600, help="simulated time span of the stream")
+    parser.add_argument("--max-keys", type=int, default=100000, help="GCRA key capacity")
+    parser.add_argument("--http-requests", type=int, default=20000, help="requests driven through the ASGI app")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    stream = request_stream(args.clients, args.requests, args.seconds, random.Random(args.seed))
+    engines = [
+        bench_engine("legacy list (per IP)", LegacyListLimiter, stream),
+        bench_engine("legacy deque (per ip:endpoint)", LegacyDequeLimiter, stream),
+        bench_engine("gcra (per ip:endpoint)", lambda: GCRAAdapter(args.max_keys), stream),
+    ]
+    middleware = bench_middleware(args.http_requests, min(args.clients, 1000))
+
+    if args.json:
+        print(json.dumps({"engines": engines, "middleware": middleware}, indent=2))
+        return
+
+    print(f"\n📊 Rate limiter engines ({args.requests} checks, {args.clients} clients, {args.seconds:.0f}s simulated)")
+    print(f"{'limiter':>32}{'checks/s':>12}{'us/check':>10}{'allowed':>10}{'retained MB':>13}")
+    for row in engines:
+        print(f"{row['limiter']:>32}{row['checks_per_second']:>12}{row['us_per_check']:>10}{row['allowed']:>10}{row['retained_mb']:>13}")
+    print(f"\n📊 Middleware ({args.http_requests} requests over ASGI)")
+    for label in ("bare", "rate_limited"):
+        print(f"{label:>32}{middleware[label]['requests_per_second']:>12} req/s{middleware[label]['us_per_request']:>10} us/req")
+    print(f"{'overhead':>32}{middleware['overhead_us_per_request']:>12} us/req")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime, timedelta
@@ -13,6 +13,8 @@ from app.core.database import SessionLocal
 from app.models.user import User, EmailVerification
 from app.api.v1.auth import get_db
 from app.core.config import DEV_MODE, IS_RAILWAY_DEPLOYMENT
+from app.services.email_service import email_service
+from app.services.email_outbox import enqueue_email
 
 # Load environment variables
 load_dotenv()
@@ -161,8 +163,8 @@ def send_verification_email(email: str, token: str):
     return email_sent
 
 # Generate and send verification token
-def generate_verification_token(user_id: int, email: str, db: Session):
-    """Generate verification token with detailed logging"""
+def generate_verification_token(user_id: int, email: str, db: Session, commit: bool = True):
+    """Generate verification token with detailed logging (commit=False leaves the commit to the caller)"""
     # Generate token
     token = secrets.token_urlsafe(32)
     expires = datetime.utcnow() + timedelta(hours=24)
@@ -174,7 +176,8 @@ def generate_verification_token(user_id: int, email: str, db: Session):
         expires=expires
     )
     db.add(db_token)
-    db.commit()
+    if commit:
+        db.commit()
     
     # Log token info
     print(f"\n==== VERIFICATION TOKEN GENERATED ====")
@@ -394,7 +397,6 @@ async def dev_token_verify(token: str, db: Session = Depends(get_db)):
 @router.post("/resend-verification", status_code=status.HTTP_202_ACCEPTED)
 async def resend_verification(
     request: ResendVerificationRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     # Find user by email
@@ -408,16 +410,15 @@ async def resend_verification(
     if user.is_verified:
         return {"message": "This email is already verified."}
     
-    # Generate new token
-    token = generate_verification_token(user.id, user.email, db)
+    # Generate new token and queue the email in the same transaction
+    token = generate_verification_token(user.id, user.email, db, commit=False)
+    subject, html_content = email_service.render_verification_email(token)
+    enqueue_email(db, user.email, subject, html_content, "verification", user_id=user.id)
+    db.commit()
     
-    # Send email in background
     if DEV_MODE:
-        # In development, send immediately
+        # In development, print the verification links
         send_verification_email(user.email, token)
-    else:
-        # In production, use background task
-        background_tasks.add_task(send_verification_email, user.email, token)
     
     return {"message": "If this email exists and is not verified, a new verification link will be sent."}
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
@@ -35,17 +35,12 @@ class PasswordResetConfirm(BaseModel):
 
 # Import centralized email service
 from app.services.email_service import email_service
-
-# Background task to send password reset email
-def send_password_reset_email(email: str, token: str):
-    """Send password reset email using centralized email service"""
-    return email_service.send_password_reset_email(email, token)
+from app.services.email_outbox import enqueue_email
 
 # Request password reset
 @router.post("/request-reset", status_code=status.HTTP_202_ACCEPTED)
 async def request_password_reset(
     request: PasswordResetRequest, 
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     # Find user by email
@@ -65,6 +60,10 @@ async def request_password_reset(
         expires=expires
     )
     db.add(db_token)
+    
+    # Queue the email in the same transaction as the token
+    subject, html_content = email_service.render_password_reset_email(token)
+    enqueue_email(db, user.email, subject, html_content, "password_reset", user_id=user.id)
     db.commit()
     
     # Log token information for debugging and development
@@ -76,9 +75,6 @@ async def request_password_reset(
     print(f"Expires: {expires}")
     print(f"==========================================\n")
     
-    # Send email in background
-    background_tasks.add_task(send_password_reset_email, user.email, token)
-    
     return {"message": "If this email exists in our system, a password reset link will be sent."}
 
 # Confirm password reset
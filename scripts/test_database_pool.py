@@ -0,0 +1,46 @@
+
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import text
+
+from app.core.database import (
+    MeteredAsyncQueuePool, MeteredQueuePool, create_async_database_engine, create_database_engine,
+)
+
+async def check_async_pool():
+    # Non-SQLite async engines use the metered queue pool; force it here on aiosqlite
+    engine = create_async_database_engine("sqlite:///:memory:", poolclass=MeteredAsyncQueuePool,
+                                          pool_size=1, max_overflow=0)
+    try:
+        for _ in range(3):
+            async with engine.connect() as conn:
+                assert (await conn.execute(text("SELECT 1"))).scalar() == 1
+    finally:
+        await engine.dispose()
+
+def test_database_pool():
+    print("🧪 Testing metered connection pools...")
+
+    # Test Case 1: Sync pool checkouts are recorded
+    before = MeteredQueuePool.metrics.snapshot()["checkouts"]
+    engine = create_database_engine("sqlite:///:memory:", pool_size=1, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
+    assert MeteredQueuePool.metrics.snapshot()["checkouts"] - before == 3
+    print("✅ PASS: sync pool checkouts recorded")
+
+    # Test Case 2: Async pooled checkouts work and are recorded separately
+    before = MeteredAsyncQueuePool.metrics.snapshot()["checkouts"]
+    asyncio.run(check_async_pool())
+    assert MeteredAsyncQueuePool.metrics.snapshot()["checkouts"] - before == 3
+    print("✅ PASS: async pool checkouts recorded")
+
+if __name__ == "__main__":
+    test_database_pool()
@@ -0,0 +1,74 @@
+
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from aiohttp import web
+
+from app.services.email_dispatcher import AsyncEmailSender, EmailMessage
+
+async def run_stand_in_server(fail_first_batch=True):
+    """Local stand-in for the Resend API: records requests, rate-limits the first batch"""
+    received = {"single": [], "batch": [], "rejected": 0, "batch_keys": []}
+    
+    async def single(request):
+        received["single"].append(await request.json())
+        return web.json_response({"id": "email_1"})
+    
+    async def batch(request):
+        received["batch_keys"].append(request.headers.get("Idempotency-Key"))
+        if fail_first_batch and received["rejected"] == 0:
+            received["rejected"] += 1
+            return web.json_response({"message": "rate limited"}, status=429, headers={"Retry-After": "0"})
+        payload = await request.json()
+        received["batch"].append(payload)
+        return web.json_response({"data": [{"id": f"email_{i}"} for i in range(len(payload))]})
+    
+    app = web.Application()
+    app.router.add_post("/emails", single)
+    app.router.add_post("/emails/batch", batch)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", received
+
+async def _exercise_dispatcher():
+    runner, url, received = await run_stand_in_server()
+    sender = AsyncEmailSender(api_key="re_test", base_url=url, rate_per_second=50, batch_size=10, backoff_base=0.01)
+    try:
+        messages = [EmailMessage(f"user{i}@example.com", "Subject", "<p>Hi</p>", idempotency_key=f"outbox-{i}")
+                    for i in range(25)]
+        results = await sender.send_many(messages)
+        single = await sender.send(EmailMessage("solo@example.com", "Subject", "<p>Hi</p>"))
+    finally:
+        await sender.close()
+        await runner.cleanup()
+    return results, single, received, sender.stats()
+
+def test_email_dispatcher():
+    print("🧪 Testing AsyncEmailSender against a local stand-in server...")
+    results, single, received, stats = asyncio.run(_exercise_dispatcher())
+    
+    # Test Case 1: Burst is split into batch requests and every message succeeds
+    assert results == [True] * 25
+    assert sorted(len(b) for b in received["batch"]) == [5, 10, 10]
+    print("✅ PASS: 25 messages sent as 3 batch requests")
+    
+    # Test Case 2: 429 is retried
+    assert received["rejected"] == 1 and stats["retries"] == 1
+    keys = received["batch_keys"]
+    assert len(keys) == 4 and all(keys) and len(set(keys)) == 3 and keys[0] in keys[1:]
+    print("✅ PASS: rate-limited batch retried with the same Idempotency-Key")
+    
+    # Test Case 3: Single send uses the single-message endpoint
+    assert single and received["single"][0]["to"] == ["solo@example.com"]
+    print("✅ PASS: single message sent")
+    print(f"📊 Stats: {stats}")
+
+if __name__ == "__main__":
+    test_email_dispatcher()
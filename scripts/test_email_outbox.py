@@ -0,0 +1,74 @@
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User, EmailOutbox
+from app.models import subscription  # noqa: F401 - register mapped relationships
+from app.services import email_outbox
+from app.services.email_outbox import enqueue_email, claim_batch, complete_batch, get_outbox_metrics
+
+def test_email_outbox():
+    print("🧪 Testing email outbox...")
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine, tables=[User.__table__, EmailOutbox.__table__])
+    db = sessionmaker(bind=engine)()
+    now = datetime.utcnow() + timedelta(seconds=1)
+    
+    # Test Case 1: Rows only exist once the caller's transaction commits
+    enqueue_email(db, "a@example.com", "Hi", "<p>a</p>", "welcome")
+    db.rollback()
+    assert db.query(EmailOutbox).count() == 0
+    enqueue_email(db, "a@example.com", "Hi", "<p>a</p>", "welcome")
+    enqueue_email(db, "b@example.com", "Hi", "<p>b</p>", "password_reset")
+    db.commit()
+    assert db.query(EmailOutbox).count() == 2
+    print("✅ PASS: enqueue joins the caller's transaction")
+    
+    # Test Case 2: Claimed rows are leased and not claimed twice
+    claimed = claim_batch(db, limit=10, now=now)
+    assert [c.message.to for c in claimed] == ["a@example.com", "b@example.com"]
+    assert claim_batch(db, limit=10, now=now) == []
+    print("✅ PASS: claim leases due rows")
+    
+    # Test Case 3: Success marks sent, failure reschedules with backoff
+    counts = complete_batch(db, [(claimed[0], True), (claimed[1], False)], now=now)
+    assert counts == {"sent": 1, "pending": 1, "dead": 0}
+    retry = db.query(EmailOutbox).filter(EmailOutbox.to_email == "b@example.com").one()
+    assert retry.status == "pending" and retry.next_attempt_at > now
+    assert claim_batch(db, limit=10, now=now) == []
+    print("✅ PASS: failures are retried after a backoff delay")
+    
+    # Test Case 4: Exhausted rows are dead-lettered
+    later = now
+    for _ in range(email_outbox.EMAIL_OUTBOX_MAX_ATTEMPTS - 1):
+        later += timedelta(seconds=email_outbox.EMAIL_OUTBOX_BACKOFF_CAP_SECONDS + 1)
+        batch = claim_batch(db, limit=10, now=later)
+        assert len(batch) == 1
+        complete_batch(db, [(batch[0], False)], now=later)
+    db.refresh(retry)
+    assert retry.status == "dead" and retry.attempts == email_outbox.EMAIL_OUTBOX_MAX_ATTEMPTS
+    print("✅ PASS: rows are dead-lettered after max attempts")
+    
+    # Test Case 5: Expired leases are reclaimed
+    enqueue_email(db, "c@example.com", "Hi", "<p>c</p>", "verification")
+    db.commit()
+    assert len(claim_batch(db, limit=10, now=later)) == 1
+    stale = later + timedelta(seconds=email_outbox.EMAIL_OUTBOX_LEASE_SECONDS + 1)
+    assert len(claim_batch(db, limit=10, now=stale)) == 1
+    print("✅ PASS: rows from a crashed worker are reclaimed after the lease")
+    
+    metrics = get_outbox_metrics(db, now=stale)
+    assert metrics["depth"] == {"pending": 0, "sending": 1, "sent": 1, "dead": 1}
+    assert metrics["backlog"] == 1 and metrics["oldest_pending_age_seconds"] > 0
+    print(f"📊 Metrics: {metrics}")
+
+if __name__ == "__main__":
+    test_email_outbox()
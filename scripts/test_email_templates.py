@@ -0,0 +1,39 @@
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.services.email_templates import EmailTemplate, FragmentCache
+
+def test_email_templates():
+    print("🧪 Testing email templates...")
+    
+    # Test Case 1: Slots are substituted, CSS braces are left alone
+    template = EmailTemplate("<style>p { color: red; }</style><p>{{ name }} won ${{amount}}</p>")
+    assert template.slots == {"name", "amount"}
+    assert template.render(name="Ann", amount=5) == "<style>p { color: red; }</style><p>Ann won $5</p>"
+    print("✅ PASS: compiled template renders slots")
+    
+    # Test Case 2: Missing values fail loudly
+    try:
+        template.render(name="Ann")
+        assert False, "expected KeyError"
+    except KeyError:
+        pass
+    print("✅ PASS: missing slot raises KeyError")
+    
+    # Test Case 3: Fragments render once per batch
+    cache = FragmentCache()
+    renders = []
+    for _ in range(3):
+        with cache.timed():
+            cache.get_or_render(("row", "k1"), lambda: renders.append(1) or "<div>row</div>")
+    assert len(renders) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    print(f"✅ PASS: shared fragments are reused - {stats}")
+
+if __name__ == "__main__":
+    test_email_templates()
@@ -0,0 +1,86 @@
+
+import sys
+import os
+import random
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.ip_blocklist import IPBlocklist
+from app.core.security_monitor import SecurityMonitor
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+def test_ip_blocklist():
+    print("🧪 Testing IP blocklist...")
+
+    # Test Case 1: Exact addresses and CIDR ranges, IPv4 and IPv6
+    blocklist = IPBlocklist()
+    blocklist.block("203.0.113.7")
+    blocklist.block("10.0.0.0/8", reason="private")
+    blocklist.block("10.1.2.0/24", reason="narrow")
+    blocklist.block("2001:db8::/32")
+    assert blocklist.is_blocked("203.0.113.7") and not blocklist.is_blocked("203.0.113.8")
+    assert blocklist.lookup("10.1.2.3").reason == "narrow"
+    assert blocklist.lookup("10.9.9.9").reason == "private"
+    assert blocklist.is_blocked("2001:db8:1::1") and not blocklist.is_blocked("2001:db9::1")
+    assert blocklist.is_blocked("::ffff:203.0.113.7") and blocklist.is_blocked("::ffff:10.2.3.4")
+    assert not blocklist.is_blocked("unknown")
+    print("✅ PASS: exact, CIDR (longest match), IPv6 and IPv4-mapped lookups")
+
+    # Test Case 2: Unblocking uses the same normalization as blocking
+    assert blocklist.unblock("10.1.2.77/24") and blocklist.lookup("10.1.2.3").reason == "private"
+    assert blocklist.unblock("::ffff:203.0.113.7") and not blocklist.is_blocked("203.0.113.7")
+    assert not blocklist.unblock("198.51.100.1")
+    print("✅ PASS: unblock")
+
+    # Test Case 3: Temporary blocks expire from one queue; re-blocking supersedes the old expiry
+    clock = FakeClock()
+    blocklist = IPBlocklist(clock=clock)
+    blocklist.block("198.51.100.1", duration=60)
+    blocklist.block("198.51.100.2", duration=60)
+    blocklist.block("198.51.100.0/30", duration=30)
+    blocklist.block("198.51.100.2", duration=600)
+    clock.now += 45
+    assert not blocklist.is_blocked("198.51.100.3") and blocklist.is_blocked("198.51.100.1")
+    clock.now += 30
+    assert not blocklist.is_blocked("198.51.100.1") and blocklist.is_blocked("198.51.100.2")
+    blocklist.block("198.51.100.2")  # made permanent
+    clock.now += 1000
+    assert blocklist.expire() == 0 and blocklist.is_blocked("198.51.100.2")
+    assert blocklist.stats()["expired"] == 2 and blocklist.stats()["expiry_queue"] == 0
+    print("✅ PASS: temporary blocks expire without per-block tasks")
+
+    # Test Case 4: Thousands of feed ranges - lookups stay correct and cheap
+    rng = random.Random(7)
+    ranges = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.0/24" for _ in range(5000)]
+    blocklist = IPBlocklist()
+    loaded = blocklist.load_ranges(["# feed header", "not-an-ip", ""] + [f"{r}  # bad actor" for r in ranges])
+    assert loaded == 5000
+    prefixes = {r.rsplit(".", 1)[0] for r in ranges}
+    probes = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}" for _ in range(2000)]
+    probes += [r.replace(".0/24", ".77") for r in ranges[:500]]
+    start = time.perf_counter()
+    for ip in probes:
+        assert blocklist.is_blocked(ip) == (ip.rsplit(".", 1)[0] in prefixes), ip
+    per_lookup = (time.perf_counter() - start) / len(probes) * 1e6
+    print(f"✅ PASS: {len(prefixes)} feed ranges, {per_lookup:.1f}µs per lookup")
+
+    # Test Case 5: The monitor's temporary block works outside an event loop
+    blocklist = IPBlocklist()
+    monitor = SecurityMonitor(blocklist=blocklist)
+    assert monitor.blocklist is blocklist
+    monitor.temporary_block_ip("192.0.2.10", 3600)
+    monitor.block_ip("192.0.2.0/28", "scanner")
+    assert monitor.is_ip_blocked("192.0.2.10") and monitor.is_ip_blocked("192.0.2.5")
+    assert not monitor.is_ip_blocked("192.0.2.20")
+    print("✅ PASS: security monitor blocks through the shared blocklist")
+
+if __name__ == "__main__":
+    test_ip_blocklist()
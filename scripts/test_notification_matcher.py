@@ -0,0 +1,99 @@
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.services.notification_matcher import SubscriptionIndex
+
+def opp(league, books, profit):
+    return {"sport": "SOCCER", "league": league, "bookmakers": books, "profit_percentage": profit}
+
+def test_subscription_index():
+    print("🧪 Testing SubscriptionIndex...")
+    index = SubscriptionIndex(max_per_user=2)
+    index.add(1, ["soccer_epl"], ["fanduel", "draftkings"], 1.0)
+    index.add(2, [], ["fanduel", "draftkings", "betmgm"], 3.0)
+    index.add(3, ["basketball_nba"], [], 0.5)
+    
+    # Test Case 1: Sport, bookmaker and threshold rules all apply
+    assert index.match_opportunity(opp("EPL", ["FanDuel", "DraftKings"], 2.0)) == {1}
+    print("✅ PASS: preferred sport + selected books + min profit")
+    
+    # Test Case 2: Every bookmaker must be selected
+    assert index.match_opportunity(opp("EPL", ["FanDuel", "BetMGM"], 5.0)) == {2}
+    print("✅ PASS: opportunity with an unselected book is skipped")
+    
+    # Test Case 3: Users without preferred bookmakers fall back to the default list
+    nba = {"sport": "BASKETBALL", "league": "NBA", "bookmakers": ["pinnacle", "bet365"], "profit_percentage": 0.6}
+    assert index.match_opportunity(nba) == {3}
+    print("✅ PASS: default bookmakers used when none selected")
+    
+    # Test Case 4: Per-user batches keep input order and respect the cap
+    opps = [opp("EPL", ["fanduel", "draftkings"], p) for p in (4.0, 3.5, 1.5)]
+    batches = index.match(opps)
+    assert [o["profit_percentage"] for o in batches[1]] == [4.0, 3.5]
+    assert [o["profit_percentage"] for o in batches[2]] == [4.0, 3.5]
+    assert 3 not in batches
+    print("✅ PASS: batches are ordered and capped")
+
+def test_preferred_sport_keys():
+    print("🧪 Testing preferred sport key matching...")
+    index = SubscriptionIndex()
+    index.add(1, ["BRASILEIRO_SERIE_A"], ["fanduel", "draftkings"], 1.0)
+    index.add(2, ["INTERNATIONAL_SOCCER"], ["fanduel", "draftkings"], 1.0)
+    index.add(3, ["SERIE_A", "PREMIER_LEAGUE"], ["fanduel", "draftkings"], 1.0)
+    books = ["fanduel", "draftkings"]
+    
+    # Test Case 1: SGO keys are not split on their first underscore
+    assert index.match_opportunity(opp("IT_SERIE_A", books, 2.0)) == {3}
+    assert index.match_opportunity(opp("EPL", books, 2.0)) == {3}
+    print("✅ PASS: BRASILEIRO_SERIE_A and INTERNATIONAL_SOCCER skip Serie A and EPL")
+    
+    # Test Case 2: Full SGO keys and aliased leagueIDs still match
+    assert index.match_opportunity(opp("BR_SERIE_A", books, 2.0)) == {1}
+    assert index.match_opportunity(opp("INTERNATIONAL_SOCCER", books, 2.0)) == {2}
+    print("✅ PASS: SGO keys match their own league")
+
+def price(bookmaker, odds):
+    return {"bookmaker": bookmaker, "odds": odds, "american_odds": "", "line": 0}
+
+def test_price_ladder_repricing():
+    print("🧪 Testing bookmaker-subset re-pricing...")
+    # Headline: pinnacle 2.10 / fanduel 2.05 (~3.7%); next books still make an arb without pinnacle
+    arb = {
+        "id": "evt1_ml", "sport": "SOCCER", "league": "EPL", "profit_percentage": 3.7,
+        "best_odds": {"home": price("pinnacle", 2.10), "away": price("fanduel", 2.05)},
+        "bookmakers": ["pinnacle", "fanduel"],
+        "price_ladder": {
+            "home": [price("pinnacle", 2.10), price("draftkings", 2.06), price("fanduel", 2.02)],
+            "away": [price("fanduel", 2.05), price("betmgm", 2.00)],
+        },
+    }
+    index = SubscriptionIndex()
+    index.add(1, [], ["pinnacle", "fanduel"], 1.0)
+    index.add(2, [], ["draftkings", "fanduel"], 1.0)
+    index.add(3, [], ["fanduel", "caesars"], 0.5)
+    index.add(4, [], ["draftkings", "fanduel"], 5.0)
+    batches = index.match([arb])
+    
+    # Test Case 1: Users with the headline books get the opportunity unchanged
+    assert batches[1] == [arb]
+    print("✅ PASS: headline price kept when its books are selected")
+    
+    # Test Case 2: Excluding pinnacle falls back to the next allowed price
+    repriced = batches[2][0]
+    assert repriced["best_odds"]["home"]["bookmaker"] == "draftkings"
+    assert abs(repriced["profit_percentage"] - round((1 / (1 / 2.06 + 1 / 2.05) - 1) * 100, 2)) < 1e-9
+    assert repriced["id"] == arb["id"] and arb["best_odds"]["home"]["bookmaker"] == "pinnacle"
+    print("✅ PASS: re-priced from the ladder without touching the original")
+    
+    # Test Case 3: A single-book fallback is not an arb; re-priced profit is checked against the threshold
+    assert 3 not in batches and 4 not in batches
+    print("✅ PASS: same-book fallbacks and low re-priced profits are skipped")
+
+if __name__ == "__main__":
+    test_subscription_index()
+    test_preferred_sport_keys()
+    test_price_ladder_repricing()
@@ -0,0 +1,54 @@
+
+import sys
+import os
+import asyncio
+import hashlib
+import bcrypt
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.password_hasher import PasswordHasher, PasswordHashingBusy
+from app.core.security_utils import BCRYPT_ROUNDS, LEGACY_SECRET_KEY, needs_rehash
+
+async def run_checks():
+    hasher = PasswordHasher(workers=2, max_pending=4, executor="process")
+    try:
+        # Test Case 1: Hash and verify on the process pool
+        hashed = await hasher.hash("Sup3rSecret!")
+        assert hashed.startswith("$2b$") and not needs_rehash(hashed)
+        assert await hasher.verify_and_update("Sup3rSecret!", hashed) == (True, None)
+        assert await hasher.verify_and_update("wrong", hashed) == (False, None)
+        print(f"✅ PASS: hash/verify on the {hasher.executor_kind} pool")
+
+        # Test Case 2: Outdated cost and legacy SHA-256 hashes are upgraded on successful login
+        cheap = bcrypt.hashpw(b"Sup3rSecret!", bcrypt.gensalt(4)).decode()
+        valid, new_hash = await hasher.verify_and_update("Sup3rSecret!", cheap)
+        assert valid and new_hash and int(new_hash[4:6]) == BCRYPT_ROUNDS
+        legacy = hashlib.sha256(("Sup3rSecret!" + LEGACY_SECRET_KEY).encode()).hexdigest()
+        valid, new_hash = await hasher.verify_and_update("Sup3rSecret!", legacy)
+        assert valid and new_hash.startswith("$2b$")
+        assert await hasher.verify_and_update("wrong", cheap) == (False, None)
+        assert hasher.rehashed == 2
+        print("✅ PASS: outdated hashes are rehashed on login")
+    finally:
+        hasher.shutdown()
+
+    # Test Case 3: Requests beyond the pending cap are shed instead of queued
+    hasher = PasswordHasher(workers=1, max_pending=2, executor="thread")
+    try:
+        results = await asyncio.gather(*(hasher.verify_and_update("x", cheap) for _ in range(5)), return_exceptions=True)
+        shed = [r for r in results if isinstance(r, PasswordHashingBusy)]
+        assert len(shed) == 3 and all(r.retry_after >= 1 for r in shed)
+        stats = hasher.stats()
+        assert stats["shed"] == 3 and stats["pending"] == 0 and stats["latency"]["verify"]["completed"] == 2
+        print(f"✅ PASS: load shedding past the pending cap ({stats['latency']['verify']})")
+    finally:
+        hasher.shutdown()
+
+def test_password_hasher():
+    print("🧪 Testing password hashing executor...")
+    asyncio.run(run_checks())
+
+if __name__ == "__main__":
+    test_password_hasher()
@@ -0,0 +1,75 @@
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.rate_limiter import GCRALimiter, Rate, endpoint_category, parse_rate
+from app.core.security_config import is_suspicious_user_agent
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_gcra_limiter():
+    print("🧪 Testing GCRALimiter...")
+    clock = FakeClock()
+    limiter = GCRALimiter(max_keys=3, clock=clock)
+    rate = parse_rate("5/minute")
+    assert rate == Rate(5, 60)
+    
+    # Test Case 1: A burst of `limit` requests is allowed, the next one is not
+    assert all(limiter.hit("a", rate).allowed for _ in range(5))
+    decision = limiter.hit("a", rate)
+    assert not decision.allowed and abs(decision.retry_after - 12) < 1e-9
+    print("✅ PASS: burst of limit requests, then retry after one interval")
+    
+    # Test Case 2: One request per interval is admitted afterwards
+    clock.now += 12
+    assert limiter.hit("a", rate).allowed
+    assert not limiter.hit("a", rate).allowed
+    print("✅ PASS: steady rate of limit/window")
+    
+    # Test Case 3: Idle keys are evicted first, then least recently used ones
+    limiter.hit("b", rate)
+    clock.now += 120  # "a" and "b" are idle now
+    limiter.hit("c", rate)
+    assert len(limiter) == 1 and limiter.stats()["evictions"] == 2
+    limiter.hit("d", rate)
+    limiter.hit("e", rate)
+    limiter.hit("f", rate)
+    assert len(limiter) == 3
+    print(f"✅ PASS: memory stays bounded ({limiter.stats()})")
+    
+    # Test Case 4: Endpoint categories
+    assert endpoint_category("/api/auth/token", "POST") == "auth_login"
+    assert endpoint_category("/api/my-arbitrage", "GET") == "api_general"
+    assert endpoint_category("/api/my-arbitrage", "POST") == "api_save_arbitrage"
+    assert endpoint_category("/api/auth/password/verify-reset-token/abc", "GET") == "auth_password_reset"
+    assert endpoint_category("/api/subscriptions/plans", "GET") == "api_subscription"
+    assert endpoint_category("/api/admin/cache-stats", "GET") == "admin_metrics"
+    assert endpoint_category("/api/admin/cache-stats", "POST") == "admin"
+    assert endpoint_category("/api/admin/trigger-odds-update", "POST") == "admin"
+    assert endpoint_category("/API/ODDS", "GET") == "api_odds"
+    print("✅ PASS: endpoint categories")
+    
+    # Test Case 5: Categories match whole path segments, not substrings
+    assert endpoint_category("/api/oddsx", "GET") == "api_general"
+    assert endpoint_category("/static/admin.js", "GET") == "api_general"
+    assert endpoint_category("/api/matches/api/odds", "GET") == "api_general"
+    assert endpoint_category("/api/odds/", "GET") == endpoint_category("/api/odds", "GET") == "api_odds"
+    print("✅ PASS: categories are exact prefix matches")
+    
+    # Test Case 6: User agent classifier
+    assert is_suspicious_user_agent("sqlmap/1.7#stable (https://sqlmap.org)")
+    assert is_suspicious_user_agent("Mozilla/5.0 Nuclei - Open-source project")
+    assert is_suspicious_user_agent("curl/8") and is_suspicious_user_agent("")
+    assert not is_suspicious_user_agent("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0")
+    print("✅ PASS: user agent classifier")
+
+if __name__ == "__main__":
+    test_gcra_limiter()
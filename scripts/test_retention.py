@@ -0,0 +1,56 @@
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User, UserEmailNotificationLog, PasswordReset, EmailVerification, NotifiedOpportunity, EmailOutbox
+from app.models import subscription  # noqa: F401 - register mapped relationships
+from app.services.maintenance import run_retention_policies
+
+def test_retention():
+    print("🧪 Testing retention jobs...")
+    engine = create_engine("sqlite:///:memory:")
+    tables = [m.__table__ for m in (User, UserEmailNotificationLog, PasswordReset, EmailVerification, NotifiedOpportunity, EmailOutbox)]
+    Base.metadata.create_all(engine, tables=tables)
+    db = sessionmaker(bind=engine)()
+    now = datetime(2026, 1, 15, 12, 0)
+    
+    for days in (1, 8, 9, 10, 30):
+        db.add(UserEmailNotificationLog(user_id=1, email_type="arbitrage_alert", sent_at=now - timedelta(days=days), status="sent"))
+    for i, hours in enumerate((-2, -1, 1)):
+        db.add(PasswordReset(user_id=1, token=f"r{i}", expires=now + timedelta(hours=hours)))
+        db.add(EmailVerification(user_id=1, token=f"v{i}", expires=now + timedelta(hours=hours)))
+        db.add(NotifiedOpportunity(user_id=1, opportunity_key=f"k{i}", notified_at=now, expires_at=now + timedelta(hours=hours)))
+    db.add(EmailOutbox(email_type="welcome", to_email="a@x.com", subject="s", html="h", status="sent", sent_at=now - timedelta(days=30)))
+    db.add(EmailOutbox(email_type="welcome", to_email="b@x.com", subject="s", html="h", status="dead", created_at=now - timedelta(days=30)))
+    db.commit()
+    
+    # Test Case 1: Every policy removes exactly its expired rows, in batches
+    results = {r.name: r for r in run_retention_policies(db, now=now, batch_size=2)}
+    assert results["email_notification_logs"].deleted == 4 and results["email_notification_logs"].batches == 2
+    assert results["password_resets"].deleted == 2
+    assert results["email_verifications"].deleted == 2
+    assert results["notified_opportunities"].deleted == 2
+    assert results["email_outbox_sent"].deleted == 1
+    assert not any(r.error for r in results.values())
+    print("✅ PASS: expired rows removed in primary-key batches")
+    
+    # Test Case 2: Unexpired rows and dead letters survive
+    assert db.query(UserEmailNotificationLog).count() == 1
+    assert db.query(PasswordReset).one().token == "r2"
+    assert db.query(EmailOutbox).one().status == "dead"
+    print("✅ PASS: live rows are kept")
+    
+    # Test Case 3: A second run is a no-op
+    assert sum(r.deleted for r in run_retention_policies(db, now=now, batch_size=2)) == 0
+    print("✅ PASS: rerun deletes nothing")
+
+if __name__ == "__main__":
+    test_retention()
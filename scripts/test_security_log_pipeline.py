@@ -0,0 +1,79 @@
+
+import sys
+import os
+import json
+import logging
+import tempfile
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.security_logger import SecurityLogPipeline
+from app.core.security_monitor import SecurityMonitor, ThreatLevel
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def test_security_log_pipeline():
+    print("🧪 Testing queued security logging...")
+
+    # Test Case 1: A full queue drops and counts instead of blocking
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "security.jsonl")
+        pipeline = SecurityLogPipeline(max_queue=3, batch_size=2, path=path, autostart=False)
+        accepted = [pipeline.submit("security.test", logging.INFO, "API_CALL", {"n": i}) for i in range(5)]
+        assert accepted == [True, True, True, False, False]
+        assert pipeline.stats()["dropped"] == 2
+        print("✅ PASS: full queue drops records and counts them")
+
+        # Test Case 2: The writer drains in batches to JSON lines; datetimes and enums are encoded
+        pipeline.start()
+        pipeline.submit("security.test", logging.WARNING, "SECURITY_EVENT",
+                        {"timestamp": datetime(2026, 1, 1, 12, 0), "threat_level": ThreatLevel.HIGH})
+        pipeline.flush()
+        pipeline.stop()
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert [line.get("n") for line in lines[:3]] == [0, 1, 2]
+        assert lines[-1]["kind"] == "SECURITY_EVENT" and lines[-1]["level"] == "WARNING"
+        assert lines[-1]["timestamp"].startswith("2026-01-01T12:00") and lines[-1]["threat_level"] == "high"
+        stats = pipeline.stats()
+        assert stats["written"] == 4 and stats["batches"] >= 2 and stats["queued"] == 0
+        print(f"✅ PASS: writer batches records to the file ({stats['batches']} batches)")
+
+    # Test Case 3: Sampling keeps roughly the configured share of high-volume records
+    pipeline = SecurityLogPipeline(max_queue=10000, autostart=False)
+    kept = sum(pipeline.submit("security.test", logging.INFO, "API_CALL", {}, sample_rate=0.1) for _ in range(5000))
+    assert 300 < kept < 700 and pipeline.sampled_out == 5000 - kept
+    print(f"✅ PASS: sampling kept {kept}/5000 API_CALL records")
+
+    # Test Case 4: Without a file the records keep the "KIND: {json}" log format
+    handler = ListHandler()
+    channel = logging.getLogger("security.monitor")
+    channel.addHandler(handler)
+    try:
+        pipeline = SecurityLogPipeline(path=None)
+        monitor = SecurityMonitor()
+        import app.core.security_monitor as security_monitor
+        original, security_monitor.security_log = security_monitor.security_log, pipeline
+        try:
+            monitor.log_event("login_failed", "1.2.3.4", metadata={"username": "bob"})
+        finally:
+            security_monitor.security_log = original
+        pipeline.flush()
+        pipeline.stop()
+    finally:
+        channel.removeHandler(handler)
+    message = next(m for m in handler.messages if m.startswith("SECURITY_EVENT: "))
+    event = json.loads(message[len("SECURITY_EVENT: "):])
+    assert event["source_ip"] == "1.2.3.4" and event["metadata"] == {"username": "bob"}
+    print("✅ PASS: logger sink keeps the SECURITY_EVENT format")
+
+if __name__ == "__main__":
+    test_security_log_pipeline()
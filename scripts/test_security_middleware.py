@@ -0,0 +1,93 @@
+
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.ip_blocklist import IPBlocklist
+from app.core.rate_limiter import GCRALimiter, RateLimiter
+from app.core.security_config import TRUSTED_PROXY_COUNT, client_ip_from_headers
+from app.core.security_logger import SecurityLogger
+from app.core.security_middleware import SecurityMiddleware
+
+def request(app, path, host=b"testserver", ip="10.0.0.1"):
+    """Call the ASGI app directly; returns (status, headers dict)"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", host), (b"user-agent", b"Mozilla/5.0 (test client)"), (b"x-forwarded-for", ip.encode())],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}
+
+def test_security_middleware():
+    print("🧪 Testing SecurityMiddleware...")
+    app = Starlette(routes=[
+        Route("/api/auth/token", lambda r: PlainTextResponse("ok")),
+        Route("/health", lambda r: PlainTextResponse("ok")),
+    ])
+    blocklist = IPBlocklist()
+    app.add_middleware(SecurityMiddleware, allowed_hosts=["testserver", "*.railway.app"], limiter=RateLimiter(GCRALimiter()),
+                       blocklist=blocklist)
+    
+    # Test Case 1: Security headers are added once to normal responses
+    status, headers = request(app, "/api/auth/token")
+    assert status == 200 and headers["x-content-type-options"] == "nosniff" and headers["server"] == "Arbify/1.0"
+    print("✅ PASS: precomputed security headers added")
+    
+    # Test Case 2: Health checks bypass every check and header
+    status, headers = request(app, "/health", host=b"evil.example")
+    assert status == 200 and "x-content-type-options" not in headers
+    print("✅ PASS: health check fast path")
+    
+    # Test Case 3: Untrusted hosts are rejected, wildcard hosts accepted
+    assert request(app, "/api/auth/token", host=b"evil.example")[0] == 400
+    assert request(app, "/api/auth/token", host=b"web.railway.app", ip="10.0.0.2")[0] == 200
+    print("✅ PASS: trusted host check")
+    
+    # Test Case 4: Category limit (auth_login 5/minute) per client IP, with Retry-After
+    statuses = [request(app, "/api/auth/token", ip="10.0.0.3")[0] for _ in range(6)]
+    assert statuses == [200] * 5 + [429]
+    status, headers = request(app, "/api/auth/token", ip="10.0.0.3")
+    assert status == 429 and int(headers["retry-after"]) >= 1
+    assert request(app, "/api/auth/token", ip="10.0.0.4")[0] == 200
+    print("✅ PASS: per-IP category rate limit")
+    
+    # Test Case 5: The client IP is the hop our proxy appended, not the client-supplied leftmost entry
+    assert client_ip_from_headers({"x-forwarded-for": "6.6.6.6, 10.0.0.9"}, "127.0.0.1", trusted_proxies=1) == "10.0.0.9"
+    assert client_ip_from_headers({"x-forwarded-for": "6.6.6.6, 10.0.0.9, 10.1.1.1"}, "127.0.0.1", trusted_proxies=2) == "10.0.0.9"
+    assert client_ip_from_headers({"x-forwarded-for": "10.0.0.9"}, "127.0.0.1", trusted_proxies=2) == "127.0.0.1"
+    assert client_ip_from_headers({"x-forwarded-for": "6.6.6.6"}, "127.0.0.1", trusted_proxies=0) == "127.0.0.1"
+    login = Request({"type": "http", "headers": [(b"x-forwarded-for", b"6.6.6.6, 10.0.0.9")], "client": ("127.0.0.1", 1234)})
+    assert SecurityLogger.get_client_ip(login) == client_ip_from_headers(login.headers, "127.0.0.1", TRUSTED_PROXY_COUNT)
+    assert SecurityLogger.get_client_ip(login) != "6.6.6.6"
+    statuses = [request(app, "/api/auth/token", ip=f"6.6.6.{i}, 10.0.0.5")[0] for i in range(6)]
+    assert statuses == [200] * 5 + [429]
+    print("✅ PASS: rotating a spoofed X-Forwarded-For does not reset the limit")
+    
+    # Test Case 6: Repeated violations block the IP only temporarily
+    for _ in range(5 + 11):  # 5 allowed, then 11 violations
+        request(app, "/api/auth/token", ip="10.0.0.6")
+    entry = blocklist.lookup("10.0.0.6")
+    assert entry is not None and entry.source == "middleware" and entry.expires_at is not None
+    print("✅ PASS: middleware blocks expire")
+
+if __name__ == "__main__":
+    test_security_middleware()
@@ -0,0 +1,91 @@
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from fastapi import HTTPException
+
+from app.core.session_store import MemorySessionStore, RedisSessionStore
+from app.core.secure_sessions import SecureSessionManager
+
+def session(user, now):
+    return {"user": user, "created": now, "last_used": now, "ip": "1.2.3.4", "user_agent": "test"}
+
+def check_store(store, now):
+    # Per-user view and revocation touch only that user's sessions
+    for i in range(50):
+        store.add(f"jti-{i}", session(f"user{i % 5}", now), now + timedelta(minutes=10 + i))
+    assert set(store.user_sessions("user1")) == {f"jti-{i}" for i in range(1, 50, 5)}
+    assert store.remove_user("user1") == 10 and not store.user_sessions("user1")
+    assert store.get("jti-1") is None and store.get("jti-2")["user"] == "user2"
+    assert store.remove("jti-2") and not store.remove("jti-2")
+
+def test_session_store():
+    print("🧪 Testing session store...")
+    now = datetime(2026, 1, 1, 12, 0)
+
+    # Test Case 1: Per-user index
+    store = MemorySessionStore(bucket_seconds=60)
+    check_store(store, now)
+    print("✅ PASS: per-user listing and revocation")
+
+    # Test Case 2: Expiry visits only due slots and never drops a session early
+    assert store.expire(now + timedelta(minutes=5)) == 0
+    before = len(store)
+    expired = store.expire(now + timedelta(minutes=20))
+    remaining = store.all()
+    assert expired == before - len(remaining)
+    assert all(int(jti.split("-")[1]) + 10 > 20 for jti in remaining)
+    print(f"✅ PASS: expiry removes due sessions only ({expired} expired, {len(remaining)} kept)")
+
+    # Test Case 3: Touching a session moves it to a later slot
+    store = MemorySessionStore(bucket_seconds=60)
+    store.add("a", session("alice", now), now + timedelta(minutes=10))
+    store.touch("a", now + timedelta(minutes=9), now + timedelta(minutes=30))
+    assert store.expire(now + timedelta(minutes=15)) == 0 and store.get("a")
+    assert store.expire(now + timedelta(minutes=31)) == 1 and store.get("a") is None
+    assert store.stats()["expiry_slots"] == 0
+    print("✅ PASS: touched sessions are rescheduled")
+
+    # Test Case 4: Revoke-all rejects outstanding access tokens and refresh sessions
+    manager = SecureSessionManager()
+    manager.secret_key = "test-secret"
+    manager.sessions = MemorySessionStore()
+    refresh = manager.create_refresh_token({"sub": "alice", "ip": "1.2.3.4"})
+    access = manager.create_access_token({"sub": "alice"})
+    other = manager.create_access_token({"sub": "bob"})
+    assert manager.verify_token(access)["sub"] == "alice"
+    assert len(manager.get_active_sessions("alice")) == 1
+    assert manager.revoke_all_user_tokens("alice") == 1
+    for check in (lambda: manager.verify_token(access), lambda: manager.refresh_access_token(refresh, "1.2.3.4")):
+        try:
+            check()
+            assert False, "revoked token accepted"
+        except HTTPException as e:
+            assert e.status_code == 401
+    assert manager.verify_token(other)["sub"] == "bob"
+    print("✅ PASS: revoke-all invalidates the user's tokens only")
+
+    # Test Case 5: Logging in again right after revoke-all works (same-second iat)
+    manager.revoke_all_user_tokens("alice")
+    fresh = manager.create_access_token({"sub": "alice"})
+    assert manager.verify_token(fresh)["sub"] == "alice"
+    print("✅ PASS: tokens issued right after revoke-all are accepted")
+
+    # Test Case 6: Shared backend (only when a Redis server is configured)
+    if os.getenv("REDIS_URL"):
+        import redis
+        client = redis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+        store = RedisSessionStore(client, prefix="arbify:test-session")
+        check_store(store, datetime.utcnow())
+        for user in ("user0", "user2", "user3", "user4"):
+            store.remove_user(user)
+        print("✅ PASS: Redis session store")
+    else:
+        print("⚠️ SKIP: Redis session store (REDIS_URL not set)")
+
+if __name__ == "__main__":
+    test_session_store()
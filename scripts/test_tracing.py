@@ -0,0 +1,130 @@
+
+import sys
+import os
+import json
+import asyncio
+import contextvars
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.tracing import (
+    NOOP_SPAN, STATUS_ERROR, FileExporter, OTLPHttpExporter, Tracer, TracingMiddleware,
+)
+
+def read_spans(path):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    spans.extend(scope["spans"])
+    return {span["name"]: span for span in spans}
+
+def thread_work(tracer):
+    with tracer.span("thread.work"):
+        pass
+
+async def traced_request(tracer):
+    with tracer.start_trace("GET /arbitrage/sgo"):
+        async def fetch(sport):
+            with tracer.span("sgo.fetch", sport=sport):
+                await asyncio.sleep(0)
+        await asyncio.gather(*(fetch(sport) for sport in ("NBA", "NFL")))
+        with tracer.span("db.save_odds"):
+            pass
+        # Work handed to a thread keeps its parent when run in a copied context
+        context = contextvars.copy_context()
+        await asyncio.get_running_loop().run_in_executor(None, context.run, thread_work, tracer)
+        try:
+            with tracer.span("response.format"):
+                raise ValueError("bad row")
+        except ValueError:
+            pass
+
+async def asgi_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+async def call_asgi(app, headers):
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b""}
+    async def send(message):
+        messages.append(message)
+    await app({"type": "http", "method": "GET", "path": "/api/arbitrage/sgo", "headers": headers}, receive, send)
+    return dict(messages[0]["headers"])
+
+def test_tracing():
+    print("🧪 Testing request tracing...")
+
+    # Test Case 1: Head sampling - unsampled requests get the shared no-op span
+    tracer = Tracer(sample_rate=0.0, exporter=FileExporter(os.devnull))
+    assert tracer.start_trace("GET /") is NOOP_SPAN and tracer.span("child") is NOOP_SPAN
+    tracer = Tracer(sample_rate=0.25, exporter=FileExporter(os.devnull))
+    sampled = sum(tracer.start_trace("GET /") is not NOOP_SPAN for _ in range(4000))
+    assert 800 < sampled < 1200 and tracer.stats()["sampled_out"] == 4000 - sampled
+    print(f"✅ PASS: head sampling kept {sampled}/4000 requests")
+
+    # Test Case 2: Spans nest across gather and executor threads; file export is OTLP/JSON
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces.jsonl")
+        tracer = Tracer(sample_rate=1.0, exporter=FileExporter(path), interval=0.05)
+        asyncio.run(traced_request(tracer))
+        tracer.flush()
+        tracer.stop()
+        spans = read_spans(path)
+        root = spans["GET /arbitrage/sgo"]
+        assert "parentSpanId" not in root and len(root["traceId"]) == 32
+        assert {s["traceId"] for s in spans.values()} == {root["traceId"]}
+        for name in ("sgo.fetch", "db.save_odds", "thread.work", "response.format"):
+            assert spans[name]["parentSpanId"] == root["spanId"], name
+        assert spans["response.format"]["status"]["code"] == STATUS_ERROR
+        assert int(root["endTimeUnixNano"]) >= int(spans["response.format"]["endTimeUnixNano"])
+        assert tracer.stats()["spans_exported"] == 6
+        print(f"✅ PASS: {len(spans)} span names exported with parent links")
+
+    # Test Case 3: OTLP/HTTP export to a collector endpoint
+    received = []
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            self.send_response(200)
+            self.end_headers()
+        def log_message(self, *args):
+            pass
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        exporter = OTLPHttpExporter(f"http://127.0.0.1:{server.server_port}/v1/traces")
+        tracer = Tracer(sample_rate=1.0, exporter=exporter, interval=0.05)
+        with tracer.start_trace("GET /health"):
+            with tracer.span("db.ping"):
+                pass
+        tracer.flush()
+        tracer.stop()
+        assert received and received[0][0] == "/v1/traces"
+        names = [s["name"] for _, body in received for s in body["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+        assert sorted(names) == ["GET /health", "db.ping"]
+        print("✅ PASS: OTLP/HTTP export")
+    finally:
+        server.shutdown()
+
+    # Test Case 4: An upstream sampled traceparent is honoured only when trusted and tracing is on
+    upstream = [(b"traceparent", ("00-" + "ab" * 16 + "-" + "cd" * 8 + "-01").encode())]
+    tracer = Tracer(sample_rate=1e-9, exporter=FileExporter(os.devnull), trust_parent=True)
+    app = TracingMiddleware(asgi_app, tracer=tracer)
+    headers = asyncio.run(call_asgi(app, upstream))
+    assert headers[b"traceparent"].decode().startswith("00-" + "ab" * 16 + "-")
+    for tracer in (Tracer(sample_rate=0.0, exporter=FileExporter(os.devnull), trust_parent=True),
+                   Tracer(sample_rate=1e-9, exporter=FileExporter(os.devnull), trust_parent=False)):
+        app = TracingMiddleware(asgi_app, tracer=tracer)
+        assert all(b"traceparent" not in asyncio.run(call_asgi(app, upstream)) for _ in range(20))
+        assert tracer.stats()["traces_started"] == 0
+    print("✅ PASS: middleware propagates trusted traceparent; sample rate 0 disables tracing")
+
+if __name__ == "__main__":
+    test_tracing()
@@ -0,0 +1,50 @@
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_ttl_cache():
+    print("🧪 Testing TTLCache...")
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    
+    # Test Case 1: Hit within TTL, miss after expiry
+    cache.set(1, "premium")
+    assert cache.get(1) == "premium"
+    clock.now = 11
+    assert cache.get(1) is None
+    print("✅ PASS: entries expire after TTL")
+    
+    # Test Case 2: Least recently used entry is evicted first
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+    assert cache.get(2) is None and cache.get(1) == "a" and cache.get(3) == "c"
+    print("✅ PASS: LRU eviction keeps recently used entries")
+    
+    # Test Case 3: Explicit invalidation and loader on miss
+    cache.invalidate(1)
+    loads = []
+    assert cache.get_or_load(1, lambda: loads.append(1) or "basic") == "basic"
+    assert cache.get_or_load(1, lambda: loads.append(1) or "basic") == "basic"
+    assert len(loads) == 1
+    print("✅ PASS: invalidate forces exactly one reload")
+    
+    stats = cache.stats()
+    assert stats["invalidations"] == 1 and stats["evictions"] == 1
+    print(f"📊 Stats: {stats}")
+
+if __name__ == "__main__":
+    test_ttl_cache()